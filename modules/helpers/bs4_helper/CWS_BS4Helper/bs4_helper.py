@@ -1,9 +1,17 @@
 import os
+import re
+import time
+import codecs
+import importlib.util
 import requests
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
 
 # Use importlib.metadata for Python 3.8 and above
 from importlib.metadata import version
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
 
 # ------ CONFIGURE LOGGING ------
 import logging
@@ -26,9 +34,129 @@ log = logging.getLogger(__name__)
 if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
     log.info("Running in test mode.")
 
+from .light_document import LightDocument
+from .document_index import DocumentIndex
+from .extraction_schema import compile_schema
+from .fetch_timing import TimedHTTPAdapter, connection_timings
 
 BS4_VERSION = "4.12.3"
 
+# Some websites may block requests without a User-Agent header.
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+# "selectolax" parses into a LightDocument instead of a BeautifulSoup object
+PARSERS = ("lxml", "html.parser", "html5lib", "selectolax")
+
+# lxml builds the same tree as "html.parser" several times faster
+DEFAULT_PARSER = (
+    "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+)
+
+TARGET_KINDS = ("ids", "classes", "tags")
+
+# Responses with another Content-Type are rejected before their body is read
+HTML_CONTENT_TYPES = (
+    "text/html",
+    "application/xhtml+xml",
+    "application/xml",
+    "text/xml",
+)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# <meta charset="..."> or <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_PATTERN = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([\w.:-]+)", re.I)
+# Byte order marks, checked before the declared charset like browsers do
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+class UnsupportedContentTypeError(requests.exceptions.RequestException):
+    """
+    Raised when a URL doesn't return HTML. The body is not downloaded.
+    """
+
+
+class ResponseTooLargeError(requests.exceptions.RequestException):
+    """
+    Raised when a page is larger than the helper's `max_bytes`. The download
+    is stopped as soon as the limit is passed.
+    """
+
+
+def detect_encoding(content_type, body):
+    """
+    Returns the character encoding of an HTML body from its byte order mark,
+    the charset of the Content-Type header or a <meta> charset in the first
+    2 KB, in that order. Returns None if none of them names a known encoding,
+    in which case the parser detects it.
+    """
+    for byte_order_mark, encoding in BYTE_ORDER_MARKS:
+        if body.startswith(byte_order_mark):
+            return encoding
+    candidates = []
+    if content_type:
+        for parameter in content_type.split(";")[1:]:
+            name, _, value = parameter.strip().partition("=")
+            if name.lower() == "charset":
+                candidates.append(value.strip("\"' "))
+    match = META_CHARSET_PATTERN.search(body[:2048])
+    if match:
+        candidates.append(match.group(1).decode("ascii", errors="ignore"))
+    for candidate in candidates:
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+    return None
+
+
+def build_strainer(targets):
+    """
+    Builds a SoupStrainer that only keeps the elements named in `targets`,
+    together with everything inside them.
+
+    Args:
+        targets (dict or SoupStrainer): A dict with any of the keys "ids",
+        "classes" and "tags", each a string or a list of strings. An element is
+        kept if it matches any of them. A SoupStrainer is returned unchanged.
+
+    Returns:
+        SoupStrainer: The strainer, or None if `targets` is None.
+    """
+    if targets is None or isinstance(targets, SoupStrainer):
+        return targets
+    unknown_kinds = set(targets) - set(TARGET_KINDS)
+    if unknown_kinds:
+        raise ValueError(
+            f"Unknown targets {sorted(unknown_kinds)}. Supported targets are {TARGET_KINDS}."
+        )
+
+    def as_set(value):
+        if value is None:
+            return frozenset()
+        return frozenset([value] if isinstance(value, str) else value)
+
+    ids = as_set(targets.get("ids"))
+    classes = as_set(targets.get("classes"))
+    tags = as_set(targets.get("tags"))
+
+    # Called by the parser with the name and the raw attributes of every start
+    # tag, before a Tag object is created for it
+    def matches(name, attrs):
+        if name in tags or (ids and attrs.get("id") in ids):
+            return True
+        class_value = attrs.get("class") if classes else None
+        if not class_value:
+            return False
+        if isinstance(class_value, str):
+            class_value = class_value.split()
+        return not classes.isdisjoint(class_value)
+
+    return SoupStrainer(matches)
+
 
 class BS4Helper:
     """
@@ -36,11 +164,107 @@ class BS4Helper:
 
     This class provides methods to fetch HTML from a URL and to find specific
     elements within the HTML.
+
+    Requests go through one `requests.Session`, so connections to a host are
+    kept open and reused instead of paying for DNS, TCP and TLS setup on every
+    page.
+
+    The find methods use a `DocumentIndex` of the current soup. It is built in
+    one pass on the first lookup, so every further lookup on the same page only
+    touches the matching elements. Loading a new soup discards the index.
+
+    Args:
+        pool_maxsize (int, optional): The number of connections kept open per
+        host. `fetch_many()` raises it to its concurrency if needed. Defaults to
+        10.
+        parser (str, optional): The parser used for every page: "lxml",
+        "html.parser", "html5lib" or "selectolax". "selectolax" returns a
+        `LightDocument` instead of a BeautifulSoup object; it is much faster
+        for extraction-only work and supports the find methods of this class.
+        Defaults to "lxml" if it is installed and "html.parser" otherwise.
+        cache (HTTPCache, optional): An on-disk HTTP cache. Pages are then
+        revalidated with conditional requests instead of being downloaded and
+        parsed again. Defaults to no cache.
+        max_bytes (int, optional): The largest page body to download. Bigger
+        pages raise a `ResponseTooLargeError` as soon as the limit is passed.
+        Defaults to no limit.
+        timing_sink (Callable, optional): Called with a timing record for every
+        fetched page, e.g. a `FetchMetrics`. See `record_timing()`.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        pool_maxsize=10,
+        parser=None,
+        cache=None,
+        max_bytes=None,
+        timing_sink=None,
+    ):
         self.check_dependency_versions()
+        if parser is not None and parser not in PARSERS:
+            raise ValueError(f"parser must be one of {PARSERS}, got {parser!r}.")
+        self.parser = parser or DEFAULT_PARSER
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.timing_sink = timing_sink
+        self.index = None
         self.soup = None
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.pool_maxsize = 0
+        self.pool_connections = 0
+        self.ensure_pool_size(pool_maxsize)
+
+    @property
+    def soup(self):
+        return self.current_soup
+
+    @soup.setter
+    def soup(self, soup):
+        self.current_soup = soup
+        # The index belongs to the previous document
+        self.index = None
+
+    def get_index(self):
+        """
+        Returns the `DocumentIndex` of the current soup, building it on first
+        use. Call `clear_index()` after changing the soup's tree.
+
+        Raises:
+            AttributeError: If the soup object is None or not initialized.
+        """
+        if self.soup is None:
+            raise AttributeError(
+                "The BeautifulSoup object is not initialized. Please ensure you have fetched the HTML content with `get_soup()` method before calling this method."
+            )
+        if self.index is None:
+            self.index = DocumentIndex(self.soup)
+        return self.index
+
+    def clear_index(self):
+        self.index = None
+
+    def ensure_pool_size(self, pool_maxsize, pool_connections=10):
+        """
+        Makes sure the session keeps at least `pool_maxsize` connections per
+        host and the pools of at least `pool_connections` hosts open, so
+        concurrent requests don't discard pooled connections. Growing the pool
+        mounts a new adapter, so open connections are reopened on first use.
+        """
+        if (
+            pool_maxsize <= self.pool_maxsize
+            and pool_connections <= self.pool_connections
+        ):
+            return
+        self.pool_maxsize = max(pool_maxsize, self.pool_maxsize)
+        self.pool_connections = max(pool_connections, self.pool_connections)
+        # Only timed fetches go through connections that measure themselves
+        adapter_class = HTTPAdapter if self.timing_sink is None else TimedHTTPAdapter
+        adapter = adapter_class(
+            pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     def check_dependency_versions(self):
         current_bs4_version = version("beautifulsoup4")
@@ -59,7 +283,7 @@ class BS4Helper:
                 f"The 'BS4Helper' tool was created using Beautiful Soup version {BS4_VERSION}. The version you have installed in this project ({current_bs4_version}) may not be compatible with this tool. If you encounter any issues, either downgrade your BeautifulSoup version to 4.12.3 or email the creator at caseywschmid@gmail.com to have the package updated."
             )
 
-    def get_soup(self, url, timeout=5):
+    def get_soup(self, url, timeout=5, targets=None):
         """
         Fetches the HTML content from a specified URL and returns a
         BeautifulSoup object for parsing.
@@ -68,6 +292,11 @@ class BS4Helper:
             url (str): The URL from which to fetch the HTML content.
             timeout (int, optional): The number of seconds to wait for the server to send data
             before giving up. Defaults to 5.
+            targets (dict, optional): Only parse the elements you need, e.g.
+            `{"ids": ["price"], "classes": ["title"], "tags": ["table"]}`. The
+            matching elements are kept with everything inside them and the rest
+            of the page is skipped, which makes parsing big pages much faster
+            and lighter. See `build_strainer()`. Defaults to the whole page.
 
         Returns:
             BeautifulSoup: A BeautifulSoup object initialized with the fetched
@@ -79,24 +308,488 @@ class BS4Helper:
             Exception: If an unexpected exception occurred.
         """
         log.fine("BS4Helper.get_soup")
-        # Some websites may block requests without a User-Agent header.
-        headers = {"User-Agent": "Mozilla/5.0"}
+        self.soup = self.fetch_soup(url, timeout, targets)
+        return self.soup
+
+    def fetch_soup(self, url, timeout=5, targets=None):
+        """
+        Fetches and parses a URL like `get_soup()`, but returns the
+        BeautifulSoup object without making it the helper's current soup. Safe
+        to call from several threads at once.
+        """
+        started = time.perf_counter()
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            self.soup = BeautifulSoup(response.text, "html.parser")
-            return self.soup
+            if self.cache is not None:
+                return self.fetch_soup_with_cache(url, timeout, targets, started)
+            response, body, encoding = self.download(url, timeout)
+            parse_started = time.perf_counter()
+            document = self.parse(body, targets, encoding)
+            self.record_timing(url, started, response, parse_started)
+            return document
+        except (UnsupportedContentTypeError, ResponseTooLargeError):
+            raise
         except requests.exceptions.HTTPError as e:
-            raise requests.exceptions.HTTPError(f"HTTP Error: {e}")
-        except requests.exceptions.Timeout:
-            raise requests.exceptions.Timeout(
-                "The request timed out. The default timeout is 5 seconds. You can increase the timeout by passing a different value to the 'timeout' parameter of the `get_soup()` method."
-            )
+            # Keeps the response so callers can look at the status code
+            raise requests.exceptions.HTTPError(
+                f"HTTP Error: {e}", response=e.response
+            ) from e
+        # The original exception types are kept, so callers like the
+        # CrawlScheduler can tell connection problems from permanent errors
+        except requests.exceptions.Timeout as e:
+            raise type(e)(
+                f"The request timed out. The timeout was {timeout} seconds. You can increase the timeout by passing a different value to the 'timeout' parameter of the `get_soup()` method.",
+                request=e.request,
+                response=e.response,
+            ) from e
         except requests.exceptions.RequestException as e:
-            raise requests.exceptions.RequestException(f"Error: {e}")
+            raise type(e)(f"Error: {e}", request=e.request, response=e.response) from e
         except Exception as e:
             raise Exception(str(e))
 
+    def fetch_soup_with_cache(self, url, timeout, targets, started):
+        """
+        The `fetch_soup()` path used when the helper has an `HTTPCache`. A
+        fresh entry is used without a request; a stale one is revalidated and
+        reused if the server answers `304 Not Modified`. The stored body is
+        parsed again every time, so callers never share a document.
+        """
+        entry = self.cache.get(url)
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.record_hit(url)
+            parse_started = time.perf_counter()
+            document = self.parse(entry["body"], targets, entry["encoding"])
+            self.record_timing(url, started, None, parse_started)
+            return document
+
+        response, body, encoding = self.download(
+            url, timeout, self.cache.conditional_headers(entry)
+        )
+        if body is None and entry is not None:
+            self.cache.refresh(url, response.headers)
+            self.cache.record_hit(url, revalidated=True)
+            parse_started = time.perf_counter()
+            document = self.parse(entry["body"], targets, entry["encoding"])
+            self.record_timing(url, started, response, parse_started)
+            return document
+        self.cache.record_miss()
+
+        self.cache.store(url, response, body, encoding)
+        parse_started = time.perf_counter()
+        document = self.parse(body, targets, encoding)
+        self.record_timing(url, started, response, parse_started)
+        return document
+
+    def download(self, url, timeout=5, headers=None):
+        """
+        Streams the body of a page into memory.
+
+        The Content-Type is checked before anything is read, the body is read
+        in chunks and the download stops as soon as it passes `max_bytes`. The
+        character encoding is detected once from the raw bytes, and the bytes
+        are handed to the parser as they are instead of being decoded into a
+        second, larger copy first.
+
+        Args:
+            url (str): The URL to download.
+            timeout (float, optional): The timeout in seconds. Defaults to 5.
+            headers (dict, optional): Extra request headers.
+
+        Returns:
+            tuple: `(response, body, encoding)`. The body is None if the server
+            answered `304 Not Modified` to a conditional request. The encoding is None if the page
+            doesn't declare one.
+
+        Raises:
+            UnsupportedContentTypeError: If the response isn't HTML.
+            ResponseTooLargeError: If the body is larger than `max_bytes`.
+            requests.exceptions.HTTPError: If the HTTP request returned an
+            unsuccessful status code, or `304 Not Modified` without `headers`.
+        """
+        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+        headers_received = time.perf_counter()
+        timings, reused_connection = connection_timings(response)
+        # requests measures the time up to the response headers, including
+        # opening the connection
+        timings["ttfb"] = max(
+            0.0,
+            response.elapsed.total_seconds()
+            - sum(seconds for seconds in timings.values() if seconds),
+        )
+        timings["download"] = 0.0
+        timings["bytes"] = 0
+        timings["reused_connection"] = reused_connection
+        response.timings = timings
+        try:
+            if response.status_code == 304:
+                if headers:
+                    return response, None, None
+                # Without validators there is no stored page to fall back on
+                raise requests.exceptions.HTTPError(
+                    f"{url} answered 304 Not Modified to a request that wasn't conditional.",
+                    response=response,
+                )
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            mime_type = content_type.split(";")[0].strip().lower()
+            if mime_type and mime_type not in HTML_CONTENT_TYPES:
+                raise UnsupportedContentTypeError(
+                    f"{url} returned {mime_type} instead of HTML."
+                )
+            content_length = response.headers.get("Content-Length", "")
+            if (
+                self.max_bytes is not None
+                and content_length.isdigit()
+                and int(content_length) > self.max_bytes
+            ):
+                raise ResponseTooLargeError(
+                    f"{url} is {content_length} bytes, which is more than max_bytes ({self.max_bytes})."
+                )
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if self.max_bytes is not None and size > self.max_bytes:
+                    raise ResponseTooLargeError(
+                        f"{url} is larger than max_bytes ({self.max_bytes})."
+                    )
+                chunks.append(chunk)
+        finally:
+            # Returns the connection to the pool, or drops it if the body
+            # wasn't read to the end
+            response.close()
+        body = b"".join(chunks)
+        timings["download"] = time.perf_counter() - headers_received
+        timings["bytes"] = size
+        return response, body, detect_encoding(content_type, body)
+
+    def record_timing(self, url, started, response, parse_started):
+        """
+        Sends the timing record of a fetched page to the `timing_sink`.
+
+        The record is a dict with the keys "url", "host", "status", "cached",
+        "reused_connection" and "bytes", and the phases "dns", "connect",
+        "tls", "ttfb" (from sending the request to the response headers),
+        "download", "parse" and "total" in seconds. "connect" is the time it
+        took to open a new connection, including DNS and TLS, which aren't
+        measured on their own and are always None. A reused connection has no
+        connect time. A page served from the cache without a
+        request only has "parse" and "total".
+        """
+        if self.timing_sink is None:
+            return
+        finished = time.perf_counter()
+        timings = getattr(response, "timings", None) or {}
+        record = {
+            "url": url,
+            "host": urlsplit(url).netloc,
+            "status": None if response is None else response.status_code,
+            "cached": response is None or response.status_code == 304,
+            "reused_connection": timings.get("reused_connection"),
+            "bytes": timings.get("bytes", 0),
+            "dns": timings.get("dns"),
+            "connect": timings.get("connect"),
+            "tls": timings.get("tls"),
+            "ttfb": timings.get("ttfb"),
+            "download": timings.get("download"),
+            "parse": finished - parse_started,
+            "total": finished - started,
+        }
+        try:
+            self.timing_sink(record)
+        except Exception as e:
+            # A broken sink must not fail the crawl
+            log.warning(f"BS4Helper: the timing sink failed: {e}")
+
+    def parse(self, html, targets=None, encoding=None):
+        """
+        Parses HTML with the helper's parser and returns the document without
+        making it the helper's current soup. `targets` limits parsing to the
+        matching elements like in `get_soup()`. `encoding` is the character
+        encoding of `html` if it is bytes; if it is None, the parser detects
+        it.
+        """
+        if self.parser == "selectolax":
+            if isinstance(html, bytes):
+                html = html.decode(encoding or "utf-8", errors="replace")
+            # lexbor always builds the whole document, which is cheap enough
+            return LightDocument(html)
+        if targets is not None and self.parser == "html5lib":
+            log.warning(
+                "The html5lib parser doesn't support targets. The whole page is parsed."
+            )
+            targets = None
+        return BeautifulSoup(
+            html,
+            self.parser,
+            parse_only=build_strainer(targets),
+            from_encoding=encoding if isinstance(html, bytes) else None,
+        )
+
+    def load_html(self, html, targets=None):
+        """
+        Parses HTML that is already available, e.g. a saved page, and makes it
+        the helper's current soup so the find methods can be used on it.
+
+        Args:
+            html (str or bytes): The HTML to parse.
+            targets (dict, optional): Only parse the matching elements. See
+            `get_soup()`.
+
+        Returns:
+            BeautifulSoup or LightDocument: The parsed document.
+        """
+        log.fine("BS4Helper.load_html")
+        self.soup = self.parse(html, targets)
+        return self.soup
+
+    def extract(self, schema):
+        """
+        Reads every field of an extraction schema from the current soup in a
+        single pass.
+
+        Args:
+            schema (dict or ExtractionSchema): The fields to read. A dict is
+            compiled once and the compiled schema is reused for later calls.
+            See `ExtractionSchema`.
+
+        Returns:
+            dict: The value of every field.
+        """
+        log.fine("BS4Helper.extract")
+        return compile_schema(schema).extract(self.soup)
+
+    def fetch_many(
+        self,
+        urls,
+        concurrency=10,
+        per_host_limit=2,
+        timeout=5,
+        per_host_delay=0,
+        targets=None,
+        schema=None,
+    ):
+        """
+        Fetches and parses many URLs concurrently and yields each result as
+        soon as it is ready.
+
+        The requests share the helper's connection pool. URLs are queued per
+        host and started in the order they were given, but a host never has
+        more than `per_host_limit` requests in flight, so a long list of pages
+        from one site doesn't hammer it or hold up the other hosts. URLs are
+        read from `urls` as requests finish, so it can be a generator of any
+        length. The helper's current soup is not changed.
+
+        Args:
+            urls (Iterable[str]): The URLs to fetch.
+            concurrency (int, optional): The maximum number of requests in
+            flight. Defaults to 10.
+            per_host_limit (int, optional): The maximum number of requests in
+            flight to the same host. Defaults to 2.
+            timeout (float, optional): The timeout of each request in seconds.
+            Defaults to 5.
+            per_host_delay (float, optional): The minimum number of seconds
+            between the starts of two requests to the same host. Defaults to 0.
+            targets (dict, optional): Only parse the matching elements of every
+            page. See `get_soup()`.
+            schema (dict or ExtractionSchema, optional): Yield the fields of
+            this schema for every page instead of its soup. See `extract()`.
+
+        Yields:
+            tuple: `(url, soup)` for every fetched page, or `(url, exception)`
+            if fetching or parsing it failed. Results come in the order they
+            finish, not in the order of `urls`.
+        """
+        log.fine("BS4Helper.fetch_many")
+        # Built once instead of for every page
+        targets = build_strainer(targets)
+        if schema is not None:
+            schema = compile_schema(schema)
+
+        def fetch(url):
+            soup = self.fetch_soup(url, timeout, targets)
+            return soup if schema is None else schema.extract(soup)
+
+        yield from self.schedule_requests(
+            urls,
+            fetch,
+            concurrency,
+            per_host_limit,
+            per_host_delay,
+        )
+
+    def extract_many(
+        self,
+        urls,
+        extract,
+        pool,
+        concurrency=10,
+        per_host_limit=2,
+        timeout=5,
+        per_host_delay=0,
+    ):
+        """
+        Downloads many URLs concurrently like `fetch_many()`, but parses them
+        and runs `extract` on them in the worker processes of a `ParsePool`, so
+        parsing uses every core instead of one.
+
+        The downloads run on threads and hand the raw bytes to the pool. Only
+        the results of `extract` come back to this process.
+
+        Args:
+            urls (Iterable[str]): The URLs to fetch.
+            extract (Callable or dict): A top-level function that takes a
+            `BS4Helper` whose soup is the parsed page and returns a small
+            picklable result, or an extraction schema.
+            pool (ParsePool): The worker processes to parse with. Its parser
+            and targets are used.
+            concurrency (int, optional): The maximum number of downloads in
+            flight. Defaults to 10.
+            per_host_limit (int, optional): The maximum number of downloads in
+            flight to the same host. Defaults to 2.
+            timeout (float, optional): The timeout of each request in seconds.
+            Defaults to 5.
+            per_host_delay (float, optional): The minimum number of seconds
+            between the starts of two requests to the same host. Defaults to 0.
+
+        Yields:
+            tuple: `(url, result)` for every page, or `(url, exception)` if
+            downloading, parsing or extracting it failed.
+        """
+        log.fine("BS4Helper.extract_many")
+        failures = deque()
+
+        def downloaded_pages():
+            for url, result in self.schedule_requests(
+                urls,
+                lambda url: self.download(url, timeout)[1:],
+                concurrency,
+                per_host_limit,
+                per_host_delay,
+            ):
+                if isinstance(result, Exception):
+                    failures.append((url, result))
+                else:
+                    body, encoding = result
+                    yield url, body, encoding
+
+        for result in pool.map(extract, downloaded_pages()):
+            while failures:
+                yield failures.popleft()
+            yield result
+        yield from failures
+
+    def schedule_requests(
+        self,
+        urls,
+        fetch,
+        concurrency=10,
+        per_host_limit=2,
+        per_host_delay=0,
+        max_queued=100,
+    ):
+        """
+        Runs `fetch(url)` for every URL on a thread pool with the per-host
+        limits of `fetch_many()` and yields `(url, result)` or
+        `(url, exception)` as each call finishes.
+
+        URLs are read from `urls` only when a request can start, so it may be
+        a generator of any length. URLs of hosts that are at their limit wait
+        in a queue while the next URLs are read, up to `max_queued` of them.
+        """
+        if concurrency < 1 or per_host_limit < 1:
+            raise ValueError("concurrency and per_host_limit must be at least 1.")
+        urls = iter(urls)
+        exhausted = False
+        queued = 0
+        host_queues = OrderedDict()
+        in_flight = {}
+        last_started = {}
+        pending = {}
+        # Sized once up front: no more than `concurrency` hosts have requests
+        # in flight at the same time
+        self.ensure_pool_size(min(concurrency, per_host_limit), concurrency)
+        executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="BS4Helper"
+        )
+
+        def start_requests(host, now):
+            # Starts as many queued requests to the host as the limits allow
+            # and returns when it may start the next one if it has to wait for
+            # its per_host_delay
+            nonlocal queued
+            queue = host_queues[host]
+            ready_at = None
+            while (
+                queue
+                and len(pending) < concurrency
+                and in_flight.get(host, 0) < per_host_limit
+            ):
+                if host in last_started and last_started[host] + per_host_delay > now:
+                    ready_at = last_started[host] + per_host_delay
+                    break
+                url = queue.popleft()
+                queued -= 1
+                pending[executor.submit(fetch, url)] = (url, host)
+                in_flight[host] = in_flight.get(host, 0) + 1
+                last_started[host] = now
+            if not queue:
+                del host_queues[host]
+            return ready_at
+
+        try:
+            while True:
+                now = time.monotonic()
+                next_start = None
+                for host in list(host_queues):
+                    ready_at = start_requests(host, now)
+                    if ready_at is not None:
+                        next_start = min(next_start or ready_at, ready_at)
+                # Reads more URLs only while there are free slots, holding
+                # back at most max_queued URLs of busy hosts
+                while not exhausted and len(pending) < concurrency:
+                    if queued >= max_queued:
+                        break
+                    url = next(urls, None)
+                    if url is None:
+                        exhausted = True
+                        break
+                    host = urlsplit(url).netloc
+                    host_queues.setdefault(host, deque()).append(url)
+                    queued += 1
+                    ready_at = start_requests(host, now)
+                    if ready_at is not None:
+                        next_start = min(next_start or ready_at, ready_at)
+
+                if not pending:
+                    if exhausted and not host_queues:
+                        return
+                    # Every queued host is waiting for its per_host_delay
+                    time.sleep(max(0, next_start - time.monotonic()))
+                    continue
+                done, _ = wait(
+                    pending,
+                    timeout=(
+                        None
+                        if next_start is None
+                        else max(0, next_start - time.monotonic())
+                    ),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    url, host = pending.pop(future)
+                    in_flight[host] -= 1
+                    if not in_flight[host]:
+                        del in_flight[host]
+                    error = future.exception()
+                    if error is not None:
+                        log.debug(f"BS4Helper: {url} failed: {error}")
+                        yield url, error
+                    else:
+                        yield url, future.result()
+        finally:
+            # Runs when the caller stops iterating early, too
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def find_div_with_class_name(self, class_name):
         """
         Finds and returns the first <div> element with the specified class name
@@ -107,7 +800,8 @@ class BS4Helper:
 
         Returns:
             bs4.element.Tag: The first <div> element with the specified class
-            name, or None if no such element is found.
+            name, or None if no such element is found. With the "selectolax"
+            parser, a selectolax node.
 
         Raises:
             AttributeError: If the soup object is None or not initialized.
@@ -118,7 +812,7 @@ class BS4Helper:
                 "The BeautifulSoup object is not initialized. Please ensure you have fetched the HTML content with `get_soup()` method before calling this method."
             )
         try:
-            return self.soup.find("div", class_=class_name)
+            return self.get_index().find_by_class(class_name, "div")
         except AttributeError as e:
             raise AttributeError(
                 "An error occurred while finding the div with the specified class name. Please ensure the class name is correct."
@@ -133,6 +827,7 @@ class BS4Helper:
 
         Returns:
             bs4.element.Tag: The element with the specified ID, or None if no such element is found.
+            With the "selectolax" parser, a selectolax node.
 
         Raises:
             AttributeError: If the soup object is None or not initialized.
@@ -143,8 +838,59 @@ class BS4Helper:
                 "The BeautifulSoup object is not initialized. Please ensure you have fetched the HTML content with `get_soup()` method before calling this method."
             )
         try:
-            return self.soup.find(id=element_id)
+            return self.get_index().find_by_id(element_id)
         except AttributeError as e:
             raise AttributeError(
                 "An error occurred while finding the element with the specified ID. Please ensure the ID is correct."
-            ) from e
\ No newline at end of file
+            ) from e
+
+    def find_all_divs_with_class_name(self, class_name):
+        """
+        Finds all <div> elements with the specified class name in the parsed
+        HTML.
+
+        Args:
+            class_name (str): The class attribute of the <div> elements to find.
+
+        Returns:
+            list: The matching <div> elements in document order.
+
+        Raises:
+            AttributeError: If the soup object is None or not initialized.
+        """
+        log.fine("BS4Helper.find_all_divs_with_class_name")
+        return self.get_index().find_all_by_class(class_name, "div")
+
+    def find_all_elements_with_class_name(self, class_name):
+        """
+        Finds all elements with the specified class name in the parsed HTML,
+        whatever their tag.
+
+        Args:
+            class_name (str): The class attribute of the elements to find.
+
+        Returns:
+            list: The matching elements in document order.
+
+        Raises:
+            AttributeError: If the soup object is None or not initialized.
+        """
+        log.fine("BS4Helper.find_all_elements_with_class_name")
+        return self.get_index().find_all_by_class(class_name)
+
+    def find_all_elements_with_tag_name(self, tag_name):
+        """
+        Finds all elements with the specified tag name, e.g. "a" or "table", in
+        the parsed HTML.
+
+        Args:
+            tag_name (str): The tag name of the elements to find.
+
+        Returns:
+            list: The matching elements in document order.
+
+        Raises:
+            AttributeError: If the soup object is None or not initialized.
+        """
+        log.fine("BS4Helper.find_all_elements_with_tag_name")
+        return self.get_index().find_all_by_tag(tag_name)
@@ -0,0 +1,482 @@
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+import requests
+
+from .bs4_helper import build_strainer
+from .extraction_schema import compile_schema
+
+# Status codes that mean the host wants fewer requests
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+class RobotsDisallowedError(requests.exceptions.RequestException):
+    """
+    Raised for a URL that the host's robots.txt doesn't allow the helper to
+    fetch. No request is made for it.
+    """
+
+
+def parse_retry_after(value):
+    """
+    Returns the seconds of a `Retry-After` header, or None. HTTP dates are
+    ignored.
+    """
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_crawl_delay(lines, user_agent):
+    """
+    Returns the `Crawl-delay` of robots.txt for the user agent in seconds, or
+    None. Unlike `RobotFileParser.crawl_delay()`, fractional delays such as
+    "0.5" are supported. The group naming the user agent wins over the "*"
+    group.
+    """
+    product = user_agent.split("/")[0].lower()
+    delays = {}
+    agents = []
+    in_rules = False
+    for line in lines:
+        name, _, value = line.split("#")[0].partition(":")
+        name = name.strip().lower()
+        value = value.strip()
+        if name == "user-agent":
+            if in_rules:
+                agents = []
+                in_rules = False
+            agents.append(value.lower())
+        elif name:
+            in_rules = True
+            if name == "crawl-delay":
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
+                for agent in agents:
+                    delays.setdefault(agent, delay)
+    for agent, delay in delays.items():
+        if agent != "*" and agent in product:
+            return delay
+    return delays.get("*")
+
+
+class HostState:
+    """
+    The queue, the concurrency limit and the statistics of one host.
+    """
+
+    def __init__(self, limit, max_limit):
+        self.queue = deque()
+        self.limit = float(limit)
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.delay = 0.0
+        self.robots_ready = False
+        self.latency = None
+        self.completed = 0
+        self.errors = 0
+        self.throttled = 0
+
+
+class CrawlScheduler:
+    """
+    Crawls many URLs across many hosts as fast as the hosts allow.
+
+    Every host has its own queue and its own concurrency limit, which adapts
+    to the host like TCP congestion control (AIMD): every successful response
+    faster than `target_latency` raises the limit by about one request per
+    round of responses, and a throttling response (`429` or `503`), a timeout,
+    a connection error or a response slower than twice `target_latency` halves
+    it. A `Retry-After` header pauses the host for that long and the URL is
+    retried. Fast hosts quickly get many parallel requests while slow or
+    struggling hosts are backed off, and `max_in_flight` caps the requests
+    across all hosts.
+
+    Before the first request to a host, its robots.txt is fetched and cached
+    for `robots_ttl` seconds. Disallowed URLs are not fetched and yield a
+    `RobotsDisallowedError`, and the host's `Crawl-delay` (or `Request-rate`)
+    becomes the minimum time between two requests to it.
+
+    Pages are fetched with `BS4Helper.fetch_soup()`, so the helper's parser,
+    cache and `max_bytes` apply and the requests share its connection pool.
+
+    Args:
+        helper (BS4Helper): The helper that fetches the pages.
+
+        max_in_flight (int, optional): The maximum number of requests in flight
+        across all hosts. Defaults to 16.
+
+        initial_host_limit (int, optional): The concurrency limit of a new
+        host. Defaults to 1.
+
+        max_host_limit (int, optional): The highest concurrency limit of a
+        host. Defaults to 8.
+
+        target_latency (float, optional): The response time in seconds above
+        which a host's limit stops growing. None grows it on every success.
+        Defaults to 1.
+
+        respect_robots (bool, optional): Whether to obey robots.txt. Defaults
+        to True.
+
+        robots_ttl (float, optional): The seconds a robots.txt is cached.
+        Defaults to one hour.
+
+        min_delay (float, optional): The minimum number of seconds between the
+        starts of two requests to the same host, if robots.txt doesn't ask for
+        more. Defaults to 0.
+
+        max_retries (int, optional): How often a throttled or timed out URL is
+        retried. Defaults to 2.
+
+        timeout (float, optional): The timeout of each request in seconds.
+        Defaults to 5.
+
+        targets (dict, optional): Only parse the matching elements of every
+        page. See `BS4Helper.get_soup()`.
+
+        schema (dict or ExtractionSchema, optional): Yield the fields of this
+        schema instead of the soup. See `BS4Helper.extract()`.
+    """
+
+    def __init__(
+        self,
+        helper,
+        max_in_flight=16,
+        initial_host_limit=1,
+        max_host_limit=8,
+        target_latency=1,
+        respect_robots=True,
+        robots_ttl=3600,
+        min_delay=0,
+        max_retries=2,
+        timeout=5,
+        targets=None,
+        schema=None,
+    ):
+        if max_in_flight < 1 or initial_host_limit < 1 or max_host_limit < 1:
+            raise ValueError(
+                "max_in_flight, initial_host_limit and max_host_limit must be at least 1."
+            )
+        self.helper = helper
+        self.max_in_flight = max_in_flight
+        self.initial_host_limit = min(initial_host_limit, max_host_limit)
+        self.max_host_limit = max_host_limit
+        self.target_latency = target_latency
+        self.respect_robots = respect_robots
+        self.robots_ttl = robots_ttl
+        self.min_delay = min_delay
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.targets = build_strainer(targets)
+        self.schema = None if schema is None else compile_schema(schema)
+        self.hosts = OrderedDict()
+        self.retries = {}
+        # robots.txt parsers and crawl delays by robots.txt URL, kept across
+        # crawls
+        self.robots = {}
+        self.crawl_delays = {}
+        self.lock = threading.Lock()
+
+    def add(self, url):
+        """
+        Queues a URL. Can be called while `crawl()` is running, e.g. for the
+        links found on a crawled page.
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            state = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = HostState(
+                    self.initial_host_limit, self.max_host_limit
+                )
+                if not self.respect_robots:
+                    state.robots_ready = True
+                    state.delay = self.min_delay
+            state.queue.append(url)
+
+    def crawl(self, urls=()):
+        """
+        Crawls the given URLs and the URLs added with `add()` and yields each
+        result as soon as it is ready.
+
+        Args:
+            urls (Iterable[str], optional): The URLs to crawl.
+
+        Yields:
+            tuple: `(url, soup)` for every fetched page (or the extracted dict
+            with a `schema`), or `(url, exception)` if the page failed or
+            robots.txt disallows it.
+        """
+        log.fine("CrawlScheduler.crawl")
+        for url in urls:
+            self.add(url)
+        self.helper.ensure_pool_size(self.max_host_limit, max(len(self.hosts), 1))
+        pending = {}
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight, thread_name_prefix="CrawlScheduler"
+        )
+        try:
+            while True:
+                now = time.monotonic()
+                next_start = None
+                skipped = []
+                with self.lock:
+                    for host, state in self.hosts.items():
+                        if not state.queue:
+                            continue
+                        if state.robots_ready and self.robots_expired(state.queue[0]):
+                            # Loaded again before the next request, so a changed
+                            # robots.txt or crawl delay takes effect
+                            state.robots_ready = False
+                        if not state.robots_ready:
+                            if (
+                                state.in_flight == 0
+                                and len(pending) < self.max_in_flight
+                            ):
+                                url = state.queue[0]
+                                future = executor.submit(self.load_robots, url)
+                                pending[future] = ("robots", host, url, now)
+                                state.in_flight += 1
+                            continue
+                        while (
+                            state.queue
+                            and len(pending) < self.max_in_flight
+                            and state.in_flight < int(state.limit)
+                        ):
+                            if state.next_start > now:
+                                next_start = min(
+                                    next_start or state.next_start, state.next_start
+                                )
+                                break
+                            url = state.queue.popleft()
+                            if not self.is_allowed(url):
+                                skipped.append(url)
+                                continue
+                            future = executor.submit(self.fetch, url)
+                            pending[future] = ("page", host, url, now)
+                            state.in_flight += 1
+                            state.next_start = now + state.delay
+                    queued = any(state.queue for state in self.hosts.values())
+                for url in skipped:
+                    yield url, RobotsDisallowedError(
+                        f"robots.txt doesn't allow fetching {url}."
+                    )
+                if not pending:
+                    if not queued:
+                        return
+                    time.sleep(max(0, (next_start or now) - time.monotonic()))
+                    continue
+                done, _ = wait(
+                    pending,
+                    timeout=(
+                        None
+                        if next_start is None
+                        else max(0, next_start - time.monotonic())
+                    ),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    kind, host, url, started = pending.pop(future)
+                    latency = time.monotonic() - started
+                    state = self.hosts[host]
+                    with self.lock:
+                        state.in_flight -= 1
+                        if kind == "robots":
+                            self.configure_host(state, url)
+                            continue
+                    error = future.exception()
+                    if self.record_response(state, url, latency, error):
+                        continue
+                    yield url, future.result() if error is None else error
+        finally:
+            # Runs when the caller stops iterating early, too
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch(self, url):
+        soup = self.helper.fetch_soup(url, self.timeout, self.targets)
+        return soup if self.schema is None else self.schema.extract(soup)
+
+    def record_response(self, state, url, latency, error):
+        """
+        Adapts the host's concurrency limit to a finished request. Returns True
+        if the URL was queued again to be retried.
+        """
+        status_code = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            status_code = response.status_code
+        # Certificate errors are connection errors too, but retrying them
+        # doesn't help
+        throttled = status_code in THROTTLING_STATUS_CODES or (
+            isinstance(
+                error,
+                (requests.exceptions.Timeout, requests.exceptions.ConnectionError),
+            )
+            and not isinstance(error, requests.exceptions.SSLError)
+        )
+        with self.lock:
+            state.latency = (
+                latency
+                if state.latency is None
+                else 0.8 * state.latency + 0.2 * latency
+            )
+            if throttled or (
+                self.target_latency is not None
+                and error is None
+                and latency > 2 * self.target_latency
+            ):
+                state.limit = max(1.0, state.limit / 2)
+            elif error is None and (
+                self.target_latency is None or latency <= self.target_latency
+            ):
+                state.limit = min(
+                    float(state.max_limit), state.limit + 1 / int(state.limit)
+                )
+            if error is None:
+                state.completed += 1
+                self.retries.pop(url, None)
+                return False
+            if throttled:
+                state.throttled += 1
+                retry_after = parse_retry_after(
+                    response.headers.get("Retry-After")
+                    if response is not None
+                    else None
+                )
+                if retry_after is not None:
+                    state.next_start = max(
+                        state.next_start, time.monotonic() + retry_after
+                    )
+                retries = self.retries.get(url, 0)
+                if retries < self.max_retries:
+                    self.retries[url] = retries + 1
+                    state.queue.appendleft(url)
+                    log.debug(
+                        f"CrawlScheduler: retrying {url}, limit {state.limit:.1f}"
+                    )
+                    return True
+            state.errors += 1
+            self.retries.pop(url, None)
+            return False
+
+    def robots_url(self, url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}/robots.txt"
+
+    def load_robots(self, url):
+        """
+        Fetches and parses the robots.txt of the URL's host unless a cached
+        copy is still current. Runs on a worker thread.
+        """
+        robots_url = self.robots_url(url)
+        with self.lock:
+            robots = self.robots.get(robots_url)
+        if robots is not None and time.time() - robots.mtime() < self.robots_ttl:
+            return
+        robots = RobotFileParser(robots_url)
+        crawl_delay = None
+        try:
+            response = self.helper.session.get(robots_url, timeout=self.timeout)
+            if response.status_code >= 500:
+                # An unreachable robots.txt means the whole site is off limits
+                robots.disallow_all = True
+            elif response.status_code >= 400:
+                robots.allow_all = True
+            else:
+                lines = response.text.splitlines()
+                robots.parse(lines)
+                crawl_delay = parse_crawl_delay(lines, self.user_agent())
+        except requests.exceptions.RequestException as e:
+            log.debug(f"CrawlScheduler: couldn't load {robots_url}: {e}")
+            robots.disallow_all = True
+        robots.modified()
+        with self.lock:
+            self.robots[robots_url] = robots
+            self.crawl_delays[robots_url] = crawl_delay
+
+    def robots_expired(self, url):
+        # Called with the lock held
+        if not self.respect_robots:
+            return False
+        robots = self.robots.get(self.robots_url(url))
+        return robots is not None and time.time() - robots.mtime() >= self.robots_ttl
+
+    def configure_host(self, state, url):
+        # Called with the lock held
+        state.robots_ready = True
+        state.delay = self.min_delay
+        # A crawl delay of an earlier robots.txt may have been lifted
+        state.max_limit = self.max_host_limit
+        robots_url = self.robots_url(url)
+        robots = self.robots.get(robots_url)
+        if robots is None:
+            return
+        crawl_delay = self.crawl_delays.get(robots_url)
+        if crawl_delay is not None:
+            state.delay = max(state.delay, crawl_delay)
+        request_rate = robots.request_rate(self.user_agent())
+        if request_rate is not None and request_rate.requests:
+            state.delay = max(state.delay, request_rate.seconds / request_rate.requests)
+        if state.delay > 0:
+            # A crawl delay asks for one request at a time
+            state.limit = 1.0
+            state.max_limit = 1
+        state.limit = min(state.limit, float(state.max_limit))
+
+    def user_agent(self):
+        return self.helper.session.headers.get("User-Agent", "*")
+
+    def is_allowed(self, url):
+        # Called with the lock held
+        if not self.respect_robots:
+            return True
+        robots = self.robots.get(self.robots_url(url))
+        return robots is None or robots.can_fetch(self.user_agent(), url)
+
+    def stats(self):
+        """
+        Returns the concurrency limit, the average latency in seconds and the
+        counters of every host.
+        """
+        with self.lock:
+            return {
+                host: {
+                    "limit": int(state.limit),
+                    "in_flight": state.in_flight,
+                    "queued": len(state.queue),
+                    "latency": state.latency,
+                    "delay": state.delay,
+                    "completed": state.completed,
+                    "errors": state.errors,
+                    "throttled": state.throttled,
+                }
+                for host, state in self.hosts.items()
+            }
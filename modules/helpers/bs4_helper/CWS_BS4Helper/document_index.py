@@ -0,0 +1,116 @@
+import os
+from collections import defaultdict
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from bs4 import Tag
+
+from .light_document import LightDocument
+
+
+class DocumentIndex:
+    """
+    Id, class and tag name indexes of a parsed document, built in a single
+    pass over its elements.
+
+    After the index is built, a lookup by id is a dict access and a lookup by
+    class or tag name only touches the matching elements instead of walking
+    the whole tree again. Every list is in document order, so the first match
+    is the same element `soup.find()` returns. The index reflects the document
+    at the time it was built; rebuild it after changing the tree.
+
+    Args:
+        document (BeautifulSoup or LightDocument): The document to index.
+    """
+
+    def __init__(self, document):
+        self.by_id = {}
+        self.by_class = defaultdict(list)
+        self.by_tag = defaultdict(list)
+        for element, name, element_id, classes in self.iter_elements(document):
+            if element_id is not None and element_id not in self.by_id:
+                self.by_id[element_id] = element
+            for class_name in classes:
+                self.by_class[class_name].append(element)
+            self.by_tag[name].append(element)
+        log.debug(
+            f"DocumentIndex: {sum(len(e) for e in self.by_tag.values())} elements, {len(self.by_id)} ids, {len(self.by_class)} classes"
+        )
+
+    @staticmethod
+    def iter_elements(document):
+        """
+        Yields `(element, tag name, id, classes)` for every element of the
+        document in document order.
+        """
+        if isinstance(document, LightDocument):
+            for node in document.tree.root.traverse():
+                # Comments and other non-element nodes
+                if node.tag.startswith("-"):
+                    continue
+                attributes = node.attributes
+                yield node, node.tag, attributes.get("id"), (
+                    attributes.get("class") or ""
+                ).split()
+            return
+        for element in document.descendants:
+            if isinstance(element, Tag):
+                classes = element.get("class") or []
+                if isinstance(classes, str):
+                    classes = classes.split()
+                yield element, element.name, element.get("id"), classes
+
+    def find_by_id(self, element_id):
+        return self.by_id.get(element_id)
+
+    def iter_by_class(self, class_name, tag_name=None):
+        """
+        Yields the elements with the class, optionally only those with the tag
+        name. Like in BeautifulSoup, a class name with spaces has to match the
+        element's whole class attribute.
+        """
+        tokens = class_name.split()
+        if not tokens:
+            return
+        for element in self.by_class.get(tokens[0], []):
+            if len(tokens) > 1 and self.class_list(element) != tokens:
+                continue
+            if tag_name is not None and self.tag_name(element) != tag_name:
+                continue
+            yield element
+
+    def find_by_class(self, class_name, tag_name=None):
+        return next(self.iter_by_class(class_name, tag_name), None)
+
+    def find_all_by_class(self, class_name, tag_name=None):
+        return list(self.iter_by_class(class_name, tag_name))
+
+    def find_all_by_tag(self, tag_name):
+        return list(self.by_tag.get(tag_name, []))
+
+    @staticmethod
+    def tag_name(element):
+        return element.name if isinstance(element, Tag) else element.tag
+
+    @staticmethod
+    def class_list(element):
+        if isinstance(element, Tag):
+            classes = element.get("class") or []
+            return classes.split() if isinstance(classes, str) else list(classes)
+        return (element.attributes.get("class") or "").split()
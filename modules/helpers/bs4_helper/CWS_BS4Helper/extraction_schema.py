@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+import soupsieve
+from bs4 import Tag
+
+from .light_document import LightDocument, quote_attribute_value
+
+LOCATOR_KEYS = ("selector", "id", "class", "tag")
+FIELD_KEYS = LOCATOR_KEYS + ("attribute", "many", "strip", "default", "transform")
+
+# A selector made only of a tag name, classes and an id, e.g. "div.price#main",
+# is matched directly instead of through the CSS engine
+SIMPLE_SELECTOR_PATTERN = re.compile(r"^(\*|[a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$")
+
+# The number of schemas compile_schema() keeps, least recently used first out
+COMPILED_SCHEMAS_SIZE = 256
+
+# Schemas compiled by compile_schema(), by their JSON representation
+compiled_schemas = OrderedDict()
+compiled_schemas_lock = threading.Lock()
+
+
+class Field:
+    """
+    One compiled field of an `ExtractionSchema`. Simple locators are kept as a
+    tag name, an id and a set of classes; anything else is a CSS selector.
+    """
+
+    def __init__(self, name, spec):
+        if isinstance(spec, str):
+            spec = {"selector": spec}
+        unknown_keys = set(spec) - set(FIELD_KEYS)
+        if unknown_keys:
+            raise ValueError(
+                f"Unknown keys {sorted(unknown_keys)} in field {name!r}. Supported keys are {FIELD_KEYS}."
+            )
+        locators = [key for key in LOCATOR_KEYS if key in spec]
+        if len(locators) != 1:
+            raise ValueError(
+                f"Field {name!r} needs exactly one of {LOCATOR_KEYS}, got {locators}."
+            )
+        self.name = name
+        self.attribute = spec.get("attribute")
+        self.many = spec.get("many", False)
+        self.strip = spec.get("strip", True)
+        self.default = spec.get("default", [] if self.many else None)
+        self.transform = spec.get("transform")
+        if self.transform is not None and not callable(self.transform):
+            raise ValueError(f"The transform of field {name!r} must be callable.")
+
+        self.tag = None
+        self.id = spec.get("id")
+        self.classes = frozenset()
+        self.selector = None
+        if "class" in spec:
+            self.classes = frozenset(spec["class"].split())
+        elif "tag" in spec:
+            self.tag = spec["tag"]
+        elif "selector" in spec:
+            match = SIMPLE_SELECTOR_PATTERN.match(spec["selector"].strip())
+            if match is None or not spec["selector"].strip():
+                self.selector = spec["selector"]
+            else:
+                tag, parts = match.groups()
+                self.tag = None if tag in (None, "*") else tag
+                for part in re.findall(r"[.#][\w-]+", parts):
+                    if part[0] == "#":
+                        self.id = part[1:]
+                    else:
+                        self.classes |= {part[1:]}
+        # Compiled when first needed, so the schema pickles cheaply
+        self.pattern = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["pattern"] = None
+        return state
+
+    def css_selector(self):
+        """
+        Returns the field's locator as a CSS selector.
+        """
+        if self.selector is not None:
+            return self.selector
+        selector = LightDocument.build_selector(self.tag, self.id)
+        return selector + "".join(
+            f"[class~={quote_attribute_value(class_name)}]"
+            for class_name in sorted(self.classes)
+        )
+
+    def matches(self, element, name, element_id, classes):
+        """
+        Returns whether a BeautifulSoup element matches the field's locator.
+        """
+        if self.selector is not None:
+            if self.pattern is None:
+                self.pattern = soupsieve.compile(self.selector)
+            return self.pattern.match(element)
+        return (
+            (self.tag is None or name == self.tag)
+            and (self.id is None or element_id == self.id)
+            and self.classes.issubset(classes)
+        )
+
+    def value(self, element):
+        """
+        Returns the attribute or the text of a matching element, after the
+        transform.
+        """
+        if isinstance(element, Tag):
+            if self.attribute is None:
+                value = (
+                    element.get_text(" ", strip=True)
+                    if self.strip
+                    else element.get_text()
+                )
+            else:
+                value = element.get(self.attribute)
+                if isinstance(value, list):
+                    value = " ".join(value)
+        elif self.attribute is None:
+            value = (
+                " ".join(
+                    text
+                    for text in (
+                        node.text(deep=False).strip()
+                        for node in element.traverse(include_text=True)
+                        if node.tag == "-text"
+                    )
+                    if text
+                )
+                if self.strip
+                else element.text()
+            )
+        else:
+            value = element.attributes.get(self.attribute)
+        if value is not None and self.transform is not None:
+            value = self.transform(value)
+        return value
+
+
+class ExtractionSchema:
+    """
+    Maps field names to the elements their values are read from, and reads
+    every field of a document at once.
+
+    Each field is a CSS selector string or a dict with exactly one locator:
+
+    - "selector": A CSS selector.
+    - "id": An element id.
+    - "class": A class name. With spaces, the element needs all the classes.
+    - "tag": A tag name.
+
+    and optionally:
+
+    - "attribute": The attribute to read. Defaults to the element's text.
+    - "many": Read every matching element into a list instead of the first
+      one. Defaults to False.
+    - "strip": Strip the whitespace around every piece of text and join the
+      pieces with single spaces. Defaults to True.
+    - "default": The value if nothing matches. Defaults to None, or [] for
+      "many" fields.
+    - "transform": A function applied to every value, e.g. `int`.
+
+    The fields are compiled once. For a BeautifulSoup document, all fields are
+    then matched in a single pass over its elements instead of one `find()`
+    walk per field, and the pass stops as soon as every single-value field has
+    been found and there are no "many" fields. Selectors that are only a tag,
+    classes and an id are matched without the CSS engine. A selectolax
+    document runs each field as one native CSS query instead, which is faster
+    than walking its tree in Python.
+
+    A schema is callable with a `BS4Helper`, so it can be passed as the
+    extraction function of `ParsePool.map()` and `BS4Helper.extract_many()`.
+    It is picklable if its transforms are top-level functions.
+
+    Args:
+        fields (dict): The field names and their specs.
+    """
+
+    def __init__(self, fields):
+        if not fields:
+            raise ValueError("An extraction schema needs at least one field.")
+        self.fields = [Field(name, spec) for name, spec in fields.items()]
+        self.has_many_fields = any(field.many for field in self.fields)
+
+    def __call__(self, helper):
+        return self.extract(helper.soup)
+
+    def extract(self, document):
+        """
+        Returns a dict with the value of every field in the document.
+        """
+        if document is None:
+            raise ValueError("There is no document to extract from.")
+        if isinstance(document, LightDocument):
+            return self.extract_light_document(document)
+        matches = {field.name: [] for field in self.fields}
+        remaining = len(self.fields)
+        for element in document.descendants:
+            if not isinstance(element, Tag):
+                continue
+            classes = element.get("class") or []
+            if isinstance(classes, str):
+                classes = classes.split()
+            element_id = element.get("id")
+            for field in self.fields:
+                found = matches[field.name]
+                if found and not field.many:
+                    continue
+                if field.matches(element, element.name, element_id, classes):
+                    found.append(element)
+                    if not field.many:
+                        remaining -= 1
+            if remaining == 0 and not self.has_many_fields:
+                break
+        return {
+            field.name: self.field_value(field, matches[field.name])
+            for field in self.fields
+        }
+
+    def extract_light_document(self, document):
+        values = {}
+        for field in self.fields:
+            selector = field.css_selector()
+            if field.many:
+                elements = document.select(selector)
+            else:
+                element = document.select_one(selector)
+                elements = [] if element is None else [element]
+            values[field.name] = self.field_value(field, elements)
+        return values
+
+    @staticmethod
+    def field_value(field, elements):
+        if not elements:
+            # A copy, so changing one result doesn't change the next
+            return list(field.default) if field.many else field.default
+        if field.many:
+            return [field.value(element) for element in elements]
+        return field.value(elements[0])
+
+
+def compile_schema(fields):
+    """
+    Returns the compiled `ExtractionSchema` for a dict of fields. The last
+    `COMPILED_SCHEMAS_SIZE` schemas are cached, so compiling the same fields
+    again for every page is free.
+
+    Fields with a transform are only found again if it is the same function
+    object. Define transforms once, or compile the schema once with
+    `ExtractionSchema(fields)` and reuse it, instead of passing a new lambda
+    for every page.
+    """
+    if isinstance(fields, ExtractionSchema):
+        return fields
+    # Transforms are keyed by their identity. A cached schema keeps its
+    # transforms alive, so their ids can't be reused while it is cached.
+    key = json.dumps(fields, sort_keys=True, default=lambda value: f"{id(value)}")
+    with compiled_schemas_lock:
+        schema = compiled_schemas.get(key)
+        if schema is not None:
+            compiled_schemas.move_to_end(key)
+            return schema
+    schema = ExtractionSchema(fields)
+    with compiled_schemas_lock:
+        compiled_schemas[key] = schema
+        while len(compiled_schemas) > COMPILED_SCHEMAS_SIZE:
+            compiled_schemas.popitem(last=False)
+    log.debug(f"compile_schema: compiled {len(schema.fields)} fields")
+    return schema
@@ -0,0 +1,218 @@
+import os
+import time
+import bisect
+import threading
+from collections import defaultdict
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# The phases of a fetch, in the order they happen
+PHASES = ("dns", "connect", "tls", "ttfb", "download", "parse", "total")
+
+# Upper bounds of the histogram buckets in seconds. The last bucket takes
+# everything slower.
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    float("inf"),
+)
+
+
+class TimedConnectionMixin:
+    """
+    Measures how long opening a new connection takes, from resolving the host
+    name to the end of the TLS handshake. urllib3 has no public hook between
+    those steps, so the whole time is reported as "connect" and "dns" and
+    "tls" are None. The times are kept in `timings` until the first response
+    on the connection takes them, so a reused connection reports none.
+    """
+
+    timings = None
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        self.timings = {
+            "dns": None,
+            "connect": time.perf_counter() - start,
+            "tls": None,
+        }
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    An `HTTPAdapter` whose connections measure how long they took to open.
+    See `connection_timings()`.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def connection_timings(response):
+    """
+    Takes the connect time of the connection a streamed response arrived on, before the body is read and the connection goes back to the
+    pool.
+
+    Returns:
+        tuple: `(timings, reused)`. The times are None and `reused` is True if
+        the connection was reused or isn't timed, e.g. behind a proxy.
+    """
+    connection = getattr(response.raw, "connection", None)
+    timings = getattr(connection, "timings", None)
+    if timings is None:
+        return {"dns": None, "connect": None, "tls": None}, True
+    connection.timings = None
+    return timings, False
+
+
+class FetchMetrics:
+    """
+    Collects the timing records of `BS4Helper` into a histogram per host and
+    phase.
+
+    Pass an instance as the helper's `timing_sink`. The phases are "dns",
+    "connect", "tls", "ttfb", "download", "parse" and "total", all in seconds.
+    Only the bucket counts are kept, so memory use doesn't grow with the number
+    of requests.
+
+    Args:
+        buckets (tuple, optional): The upper bounds of the buckets in seconds,
+        in ascending order. Defaults to 1 ms to 10 s and above.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        if list(buckets) != sorted(buckets):
+            raise ValueError("The bucket bounds must be in ascending order.")
+        self.buckets = tuple(buckets)
+        if self.buckets[-1] != float("inf"):
+            self.buckets += (float("inf"),)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def __call__(self, record):
+        self.record(record)
+
+    def record(self, record):
+        """
+        Adds the phases of one timing record to the histograms of its host.
+        """
+        with self.lock:
+            phases = self.hosts[record["host"]]
+            for phase in PHASES:
+                seconds = record.get(phase)
+                if seconds is None:
+                    continue
+                histogram = phases[phase]
+                histogram["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+                histogram["count"] += 1
+                histogram["sum"] += seconds
+
+    def reset(self):
+        with self.lock:
+            self.hosts = defaultdict(
+                lambda: defaultdict(
+                    lambda: {"counts": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+                )
+            )
+
+    def histograms(self):
+        """
+        Returns the histograms as
+        `{host: {phase: {"buckets": [(upper bound, count), ...], "count": n, "sum": seconds}}}`.
+        The counts are per bucket, not cumulative.
+        """
+        with self.lock:
+            return {
+                host: {
+                    phase: {
+                        "buckets": list(zip(self.buckets, histogram["counts"])),
+                        "count": histogram["count"],
+                        "sum": histogram["sum"],
+                    }
+                    for phase, histogram in phases.items()
+                }
+                for host, phases in self.hosts.items()
+            }
+
+    def summary(self):
+        """
+        Returns the count, the mean and the estimated 50th, 90th and 99th
+        percentiles of every phase per host. A percentile is the upper bound
+        of the bucket it falls into.
+        """
+        with self.lock:
+            return {
+                host: {
+                    phase: {
+                        "count": histogram["count"],
+                        "mean": histogram["sum"] / histogram["count"],
+                        "p50": self.percentile(histogram, 0.5),
+                        "p90": self.percentile(histogram, 0.9),
+                        "p99": self.percentile(histogram, 0.99),
+                    }
+                    for phase, histogram in phases.items()
+                    if histogram["count"]
+                }
+                for host, phases in self.hosts.items()
+            }
+
+    def percentile(self, histogram, fraction):
+        rank = fraction * histogram["count"]
+        seen = 0
+        for bound, count in zip(self.buckets, histogram["counts"]):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
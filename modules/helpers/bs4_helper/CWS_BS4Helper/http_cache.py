@@ -0,0 +1,317 @@
+import os
+import time
+import sqlite3
+import threading
+from email.utils import parsedate_to_datetime
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+
+def parse_cache_control(value):
+    """
+    Parses a Cache-Control header into a dict of lowercase directives. Value-less
+    directives such as "no-store" map to True.
+    """
+    directives = {}
+    for directive in (value or "").split(","):
+        name, _, argument = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else True
+    return directives
+
+
+def parse_http_date(value):
+    """
+    Returns an HTTP date header as a Unix timestamp, or None if it can't be
+    parsed.
+    """
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers, now):
+    """
+    Returns the Unix time until which a response may be used without asking
+    the server again, from `Cache-Control: max-age` or `Expires`. Returns None
+    if the response has to be revalidated every time.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if "no-cache" in directives:
+        return None
+    if "max-age" in directives:
+        try:
+            age = float(headers.get("Age") or 0)
+            return now + float(directives["max-age"]) - age
+        except ValueError:
+            return None
+    expires = parse_http_date(headers.get("Expires"))
+    if expires is not None:
+        date = parse_http_date(headers.get("Date")) or now
+        return now + (expires - date)
+    return None
+
+
+class HTTPCache:
+    """
+    An on-disk HTTP cache for `BS4Helper`, stored in a local SQLite database.
+
+    Responses are stored with their `ETag` and `Last-Modified` validators and
+    the freshness lifetime from `Cache-Control: max-age` or `Expires`. A fresh
+    entry is used without a request. A stale entry is revalidated with
+    `If-None-Match` / `If-Modified-Since`, so an unchanged page costs a
+    `304 Not Modified` instead of the whole body. Responses marked `no-store`,
+    responses that vary on request headers and responses with no validators
+    and no freshness lifetime are not stored.
+
+    Only the raw bodies are cached. A fresh or `304` page is parsed again from
+    its stored body, so every caller gets its own document and can change it
+    freely.
+
+    Args:
+        path (str, optional): The SQLite database file. Defaults to
+        "bs4_helper_cache.sqlite3" in the working directory.
+
+        max_bytes (int, optional): The maximum total size of the stored bodies.
+        The least recently used entries are evicted first. Defaults to 256 MB.
+
+        max_entries (int, optional): The maximum number of stored responses.
+        None for no limit.
+    """
+
+    def __init__(
+        self,
+        path="bs4_helper_cache.sqlite3",
+        max_bytes=256 * 1024 * 1024,
+        max_entries=None,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    encoding TEXT,
+                    content_type TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL,
+                    size INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+            self.connection.commit()
+
+    def get(self, url):
+        """
+        Returns the stored entry for `url` as a dict, or None. The entry has
+        the keys "body", "encoding", "content_type", "etag", "last_modified",
+        "expires_at" and "stored_at".
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT body, encoding, content_type, etag, last_modified, expires_at, stored_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = (
+            "body",
+            "encoding",
+            "content_type",
+            "etag",
+            "last_modified",
+            "expires_at",
+            "stored_at",
+        )
+        return dict(zip(keys, row))
+
+    @staticmethod
+    def is_fresh(entry, now=None):
+        now = time.time() if now is None else now
+        return entry["expires_at"] is not None and entry["expires_at"] > now
+
+    @staticmethod
+    def conditional_headers(entry):
+        """
+        Returns the headers that ask the server to answer with `304 Not
+        Modified` if the stored response is still current.
+        """
+        headers = {}
+        if entry is None:
+            return headers
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_miss(self):
+        self.misses += 1
+
+    def record_hit(self, url, revalidated=False):
+        if revalidated:
+            self.revalidations += 1
+        else:
+            self.hits += 1
+        with self.lock:
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE url = ?",
+                (time.time(), url),
+            )
+            self.connection.commit()
+
+    def store(self, url, response, body=None, encoding=None):
+        """
+        Stores a `200` response if it may be cached. Returns the time it was
+        stored at, which identifies this version of the page, or None if the
+        response can't be cached.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The response.
+            body (bytes, optional): The body if it was read separately from the
+            response. Defaults to `response.content`.
+            encoding (str, optional): The character encoding the body was
+            decoded with.
+        """
+        headers = response.headers
+        directives = parse_cache_control(headers.get("Cache-Control"))
+        if "no-store" in directives:
+            return None
+        vary = {value.strip().lower() for value in headers.get("Vary", "").split(",")}
+        if vary - {"", "accept-encoding"}:
+            return None
+        now = time.time()
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        expires_at = freshness_lifetime(headers, now)
+        if etag is None and last_modified is None and expires_at is None:
+            return None
+        body = response.content if body is None else body
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (url, body, encoding, content_type, etag, last_modified, expires_at, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    sqlite3.Binary(body),
+                    encoding,
+                    headers.get("Content-Type"),
+                    etag,
+                    last_modified,
+                    expires_at,
+                    len(body),
+                    now,
+                    now,
+                ),
+            )
+            self.evict()
+            self.connection.commit()
+        return now
+
+    def refresh(self, url, headers):
+        """
+        Updates a stored entry from the headers of a `304 Not Modified`
+        response.
+        """
+        now = time.time()
+        expires_at = freshness_lifetime(headers, now)
+        with self.lock:
+            self.connection.execute(
+                "UPDATE responses SET expires_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), accessed_at = ? WHERE url = ?",
+                (
+                    expires_at,
+                    headers.get("ETag"),
+                    headers.get("Last-Modified"),
+                    now,
+                    url,
+                ),
+            )
+            self.connection.commit()
+
+    def evict(self):
+        # Called with the lock held
+        if self.max_entries is not None:
+            self.connection.execute(
+                "DELETE FROM responses WHERE url IN (SELECT url FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            total_size = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total_size > self.max_bytes:
+                rows = self.connection.execute(
+                    "SELECT url, size FROM responses ORDER BY accessed_at ASC"
+                ).fetchall()
+                evicted_urls = []
+                for url, size in rows:
+                    if total_size <= self.max_bytes:
+                        break
+                    evicted_urls.append((url,))
+                    total_size -= size
+                self.connection.executemany(
+                    "DELETE FROM responses WHERE url = ?", evicted_urls
+                )
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.hits = self.revalidations = self.misses = 0
+
+    def stats(self):
+        """
+        Returns the hit, revalidation and miss counters of this instance
+        together with the number of stored responses and their total size in
+        bytes.
+        """
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,97 @@
+import os
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ModuleNotFoundError:
+    # selectolax is only needed for the "selectolax" parser
+    LexborHTMLParser = None
+
+
+def quote_attribute_value(value):
+    """
+    Returns `value` as a double-quoted CSS attribute value.
+    """
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class LightDocument:
+    """
+    A lightweight parsed HTML document backed by selectolax's lexbor engine.
+
+    Parsing with lexbor is many times faster than building a BeautifulSoup tree
+    and uses far less memory, which pays off when pages are only parsed to pull
+    a few values out of them. The document offers the subset of the
+    BeautifulSoup API that `BS4Helper` uses (`find()`, `find_all()`,
+    `select()`, `select_one()`), so `find_div_with_class_name()` and
+    `find_element_with_id()` work on it unchanged. The elements it returns are
+    selectolax nodes: use `node.text()` and `node.attributes` instead of
+    `tag.text` and `tag.attrs`.
+
+    Args:
+        html (str or bytes): The HTML to parse.
+    """
+
+    def __init__(self, html):
+        if LexborHTMLParser is None:
+            raise ModuleNotFoundError(
+                "The 'selectolax' parser needs the selectolax package. Please install it by running 'pip install selectolax'."
+            )
+        self.tree = LexborHTMLParser(html)
+
+    @staticmethod
+    def build_selector(name=None, id=None, class_=None):
+        """
+        Builds the CSS selector for a BeautifulSoup-style `find()` query. Like
+        in BeautifulSoup, a `class_` with spaces has to match the whole class
+        attribute, otherwise it matches any one of the element's classes.
+        """
+        selector = name or ""
+        if id is not None:
+            selector += f"[id={quote_attribute_value(id)}]"
+        if class_ is not None:
+            operator = "=" if " " in class_ else "~="
+            selector += f"[class{operator}{quote_attribute_value(class_)}]"
+        return selector or "*"
+
+    def find(self, name=None, id=None, class_=None):
+        """
+        Returns the first element matching the tag name, id and class, or None.
+        """
+        return self.tree.css_first(self.build_selector(name, id, class_))
+
+    def find_all(self, name=None, id=None, class_=None):
+        """
+        Returns every element matching the tag name, id and class.
+        """
+        return self.tree.css(self.build_selector(name, id, class_))
+
+    def select_one(self, selector):
+        return self.tree.css_first(selector)
+
+    def select(self, selector):
+        return self.tree.css(selector)
+
+    def get_text(self, separator=""):
+        return self.tree.text(separator=separator)
+
+    @property
+    def html(self):
+        return self.tree.html
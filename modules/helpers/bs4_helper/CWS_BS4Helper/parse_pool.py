@@ -0,0 +1,171 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("BS4_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from .bs4_helper import BS4Helper, build_strainer
+from .extraction_schema import compile_schema
+
+# The helper and strainer of a worker process, created once by
+# initialize_worker() and reused for every page the worker parses
+worker_helper = None
+worker_targets = None
+
+
+def initialize_worker(parser, targets):
+    global worker_helper, worker_targets
+    worker_helper = BS4Helper(pool_maxsize=1, parser=parser)
+    worker_targets = build_strainer(targets)
+
+
+def extract_chunk(extract, pages):
+    """
+    Parses a chunk of pages in a worker process and runs `extract` on each.
+    Returns `(key, result)` or `(key, exception)` for every page.
+    """
+    results = []
+    for key, html, encoding in pages:
+        try:
+            worker_helper.soup = worker_helper.parse(html, worker_targets, encoding)
+            results.append((key, extract(worker_helper)))
+        except Exception as e:
+            results.append((key, e))
+        finally:
+            # Frees the tree before the next page is parsed
+            worker_helper.soup = None
+    return results
+
+
+class ParsePool:
+    """
+    A pool of worker processes that parse HTML and extract data from it.
+
+    Parsing is CPU-bound and holds the GIL, so threads only ever keep one core
+    busy with it. The pool sends the raw HTML bytes to other processes instead.
+    Each worker creates one `BS4Helper` when it starts and reuses it for every
+    page: it parses the page, makes it the helper's soup and calls
+    `extract(helper)`, so the extraction function can use the helper's find
+    methods. Only the return value of `extract` is sent back, never the soup,
+    and pages are sent in chunks to keep the cost of passing data between
+    processes low.
+
+    `extract` has to be picklable, i.e. a function defined at the top level of
+    a module, and should return a small picklable value such as a dict.
+
+    Args:
+        processes (int, optional): The number of worker processes. Defaults to
+        the number of CPUs.
+
+        parser (str, optional): The parser the workers use. See `BS4Helper`.
+
+        targets (dict, optional): Only parse the matching elements of every
+        page. See `BS4Helper.get_soup()`.
+
+        chunk_size (int, optional): The number of pages sent to a worker at a
+        time. Defaults to 8.
+    """
+
+    def __init__(self, processes=None, parser=None, targets=None, chunk_size=8):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+        if isinstance(targets, dict):
+            # Fails here instead of in every worker
+            build_strainer(targets)
+        elif targets is not None:
+            raise ValueError("ParsePool targets must be a dict.")
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            initializer=initialize_worker,
+            initargs=(parser, targets),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, extract, pages):
+        """
+        Sends one chunk of pages to a worker and returns a future of the list
+        of `(key, result)` tuples.
+
+        Args:
+            extract (Callable or dict): The extraction function or schema.
+            pages (list): `(key, html, encoding)` tuples.
+        """
+        if isinstance(extract, dict):
+            extract = compile_schema(extract)
+        return self.executor.submit(extract_chunk, extract, pages)
+
+    def map(self, extract, pages):
+        """
+        Parses the pages in the worker processes and yields the result of
+        `extract` for each page as its chunk finishes.
+
+        Pages are read from `pages` as workers become free, so it can be a
+        generator that downloads them.
+
+        Args:
+            extract (Callable or dict): Called with a `BS4Helper` whose soup is
+            the parsed page. An extraction schema can be given instead; see
+            `ExtractionSchema`.
+            pages (Iterable): `(key, html)` or `(key, html, encoding)` tuples.
+            The key identifies the page in the results, e.g. its URL. The HTML
+            can be bytes or str.
+
+        Yields:
+            tuple: `(key, result)` for every page, or `(key, exception)` if
+            parsing or extracting failed. Results come in the order they
+            finish.
+        """
+        log.fine("ParsePool.map")
+        if isinstance(extract, dict):
+            # Compiled once here instead of for every chunk
+            extract = compile_schema(extract)
+        pages = iter(pages)
+        pending = set()
+        chunk = []
+        exhausted = False
+        while not exhausted or pending:
+            # Two chunks per worker keep the workers busy without reading
+            # every page into memory
+            while not exhausted and len(pending) < 2 * self.processes:
+                page = next(pages, None)
+                if page is None:
+                    exhausted = True
+                else:
+                    key, html, *encoding = page
+                    chunk.append((key, html, encoding[0] if encoding else None))
+                if len(chunk) >= self.chunk_size or (exhausted and chunk):
+                    pending.add(self.submit(extract, chunk))
+                    chunk = []
+            if not pending:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+    def close(self):
+        """
+        Shuts the worker processes down.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,98 @@
+"""
+Compares fetching the pages of a local static site one by one with
+`get_soup()` against `fetch_many()`.
+
+Every response is delayed to stand in for the network. Run it from the root of
+the repository:
+
+    python modules/helpers/bs4_helper/benchmarks/bench_fetch_many.py
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("BS4_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_BS4_HELPER_WARNING", "true")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.bs4_helper.CWS_BS4Helper.bs4_helper import BS4Helper
+
+PAGE = (
+    "<html><head><title>Page</title></head><body>"
+    + "".join(f"<div class='item'><p>Item {i}</p></div>" for i in range(200))
+    + "</body></html>"
+).encode("utf-8")
+
+
+def serve(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--hosts", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--per-host-limit", type=int, default=4)
+    args = parser.parse_args()
+
+    servers = [serve(args.latency) for _ in range(args.hosts)]
+    urls = [
+        f"http://127.0.0.1:{servers[i % args.hosts].server_address[1]}/page-{i}"
+        for i in range(args.pages)
+    ]
+
+    helper = BS4Helper(parser="html.parser")
+    started = time.perf_counter()
+    for url in urls:
+        helper.get_soup(url)
+    sequential = time.perf_counter() - started
+
+    helper = BS4Helper(parser="html.parser")
+    started = time.perf_counter()
+    failures = sum(
+        isinstance(result, Exception)
+        for _, result in helper.fetch_many(
+            (url for url in urls),
+            concurrency=args.concurrency,
+            per_host_limit=args.per_host_limit,
+        )
+    )
+    concurrent = time.perf_counter() - started
+
+    for server in servers:
+        server.shutdown()
+
+    print(f"{'':>14}{'total s':>10}{'pages/s':>10}")
+    for name, seconds in (("get_soup()", sequential), ("fetch_many()", concurrent)):
+        print(f"{name:>14}{seconds:>10.2f}{args.pages / seconds:>10.1f}")
+    if failures:
+        print(f"{failures} pages failed")
+
+
+if __name__ == "__main__":
+    main()
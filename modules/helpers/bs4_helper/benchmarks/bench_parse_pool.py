@@ -0,0 +1,92 @@
+"""
+Measures `ParsePool.map()` with different numbers of worker processes against
+parsing the same generated pages in the main process.
+
+Run it from the root of the repository:
+
+    python modules/helpers/bs4_helper/benchmarks/bench_parse_pool.py
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("BS4_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_BS4_HELPER_WARNING", "true")
+# Keeps the log line of every page out of the results
+os.environ.setdefault("LOG_LEVEL", "20")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.bs4_helper.CWS_BS4Helper.bs4_helper import BS4Helper
+from modules.helpers.bs4_helper.CWS_BS4Helper.parse_pool import ParsePool
+from bench_parsers import build_page
+
+
+# Must be defined at the top level so it can be sent to the workers
+def extract_cards(helper):
+    return {
+        "price": helper.find_div_with_class_name("price").get_text(),
+        "cards": len(helper.find_all_divs_with_class_name("card")),
+    }
+
+
+def parse_in_process(parser, pages):
+    helper = BS4Helper(parser=parser)
+    started = time.perf_counter()
+    for _, html in pages:
+        helper.load_html(html)
+        extract_cards(helper)
+    return time.perf_counter() - started
+
+
+def parse_in_pool(parser, pages, processes, chunk_size):
+    with ParsePool(processes=processes, parser=parser, chunk_size=chunk_size) as pool:
+        # Starts the workers before the clock does
+        list(pool.map(extract_cards, pages[:processes]))
+        started = time.perf_counter()
+        failures = sum(
+            isinstance(result, Exception)
+            for _, result in pool.map(extract_cards, pages)
+        )
+        seconds = time.perf_counter() - started
+    if failures:
+        raise RuntimeError(f"{failures} pages failed.")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--items", type=int, default=200, help="Page size")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=8)
+    parser.add_argument("--parser", default="html.parser")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [(i, build_page(args.items, rng)) for i in range(args.pages)]
+    baseline = parse_in_process(args.parser, pages)
+    results = [("in process", baseline)] + [
+        (
+            f"{processes} processes",
+            parse_in_pool(args.parser, pages, processes, args.chunk_size),
+        )
+        for processes in args.processes
+    ]
+
+    print(f"{os.cpu_count()} CPUs, {args.parser}")
+    print(f"{'':>14}{'total s':>10}{'pages/s':>10}{'speedup':>10}")
+    for name, seconds in results:
+        print(
+            f"{name:>14}{seconds:>10.2f}{args.pages / seconds:>10.1f}"
+            f"{baseline / seconds:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
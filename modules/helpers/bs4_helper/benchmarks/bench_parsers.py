@@ -0,0 +1,113 @@
+"""
+Compares the parsers of `BS4Helper` on a corpus of generated pages: "lxml",
+"html.parser", "html5lib" and "selectolax".
+
+Every page is parsed and then searched for one element, the way the helper is
+used for extraction. Parsers that aren't installed are skipped. Run it from the
+root of the repository:
+
+    python modules/helpers/bs4_helper/benchmarks/bench_parsers.py
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import sys
+import time
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("BS4_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_BS4_HELPER_WARNING", "true")
+# Keeps the log line of every page out of the results
+os.environ.setdefault("LOG_LEVEL", "20")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.bs4_helper.CWS_BS4Helper.bs4_helper import PARSERS, BS4Helper
+
+# The package each parser needs, or None for the built-in one
+PARSER_PACKAGES = {
+    "lxml": "lxml",
+    "html.parser": None,
+    "html5lib": "html5lib",
+    "selectolax": "selectolax",
+}
+
+
+def build_page(items, rng):
+    rows = "".join(
+        f"<tr><td class='name'>Item {i}</td><td>{rng.randint(1, 999)}</td>"
+        f"<td><a href='/item/{i}?ref=list'>Details</a></td></tr>"
+        for i in range(items)
+    )
+    cards = "".join(
+        f"<div class='card' data-id='{i}'><h2>Title {i}</h2>"
+        f"<p>{' '.join(rng.choice(('lorem', 'ipsum', 'dolor', 'sit')) for _ in range(30))}"
+        f"<br><img src='/img/{i}.png' alt=''></p></div>"
+        for i in range(items)
+    )
+    return (
+        "<!doctype html><html><head><title>Listing</title>"
+        "<script>var config = {'a': 1};</script></head><body>"
+        f"<nav><ul>{''.join(f'<li><a href=/{i}>{i}</a></li>' for i in range(20))}</ul></nav>"
+        f"<table>{rows}</table>{cards}"
+        "<div class='price'>42.00</div></body></html>"
+    ).encode("utf-8")
+
+
+def build_corpus(pages, sizes, seed=0):
+    rng = random.Random(seed)
+    return {size: [build_page(size, rng) for _ in range(pages)] for size in sizes}
+
+
+def time_parser(parser, bodies):
+    helper = BS4Helper(parser=parser)
+    started = time.perf_counter()
+    for body in bodies:
+        helper.load_html(body)
+        if helper.find_div_with_class_name("price") is None:
+            raise RuntimeError(f"{parser} didn't find the price.")
+    return (time.perf_counter() - started) / len(bodies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument(
+        "--items", type=int, nargs="+", default=[20, 200, 2000], help="Page sizes"
+    )
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.pages, args.items)
+    parsers = [
+        name
+        for name in PARSERS
+        if PARSER_PACKAGES[name] is None
+        or importlib.util.find_spec(PARSER_PACKAGES[name]) is not None
+    ]
+    skipped = sorted(set(PARSERS) - set(parsers))
+
+    print(f"{'':>12}" + "".join(f"{f'{size} items ms':>16}" for size in args.items))
+    print(
+        f"{'page KB':>12}"
+        + "".join(
+            f"{sum(map(len, corpus[size])) / len(corpus[size]) / 1024:>16.1f}"
+            for size in args.items
+        )
+    )
+    for name in parsers:
+        print(
+            f"{name:>12}"
+            + "".join(
+                f"{time_parser(name, corpus[size]) * 1000:>16.2f}"
+                for size in args.items
+            )
+        )
+    if skipped:
+        print(f"Not installed: {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from setuptools import setup, find_packages
 
 setup(
     name="CWS_BS4Helper",
-    version="0.0.2",
+    version="0.0.12",
     packages=find_packages(),
     author="Casey Schmid",
     author_email="caseywschmid@gmail.com",
@@ -12,5 +12,11 @@ setup(
         "requests",
         # add other dependencies as needed
     ],
+    extras_require={
+        # The fast default parser
+        "lxml": ["lxml"],
+        # LightDocument, the parser="selectolax" backend
+        "selectolax": ["selectolax"],
+    },
     # Add other metadata as needed
 )
@@ -0,0 +1,96 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeHost:
+    """
+    A local web site that stands in for one host of a crawl.
+
+    Every page is answered after `latency` seconds with `status`. A `429` or
+    `503` carries `retry_after` as its `Retry-After` header if it is set.
+    `robots` is served as /robots.txt, or a `404` if it is None. The times the
+    page requests arrived at and the number of robots.txt requests are
+    recorded, so tests can check how the crawler treated the host.
+    """
+
+    def __init__(self, latency=0, status=200, retry_after=None, robots=None):
+        self.latency = latency
+        self.status = status
+        self.retry_after = retry_after
+        self.robots = robots
+        self.requests = []
+        self.robots_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path="/"):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def request_gaps(self):
+        """
+        Returns the seconds between the arrivals of consecutive page requests.
+        """
+        with self.lock:
+            times = [arrived for _, arrived in self.requests]
+        return [later - earlier for earlier, later in zip(times, times[1:])]
+
+    def handler(self):
+        host = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, status, data, content_type, headers=()):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/robots.txt":
+                    with host.lock:
+                        host.robots_requests += 1
+                    if host.robots is None:
+                        self.send_body(404, b"Not found", "text/plain")
+                    else:
+                        self.send_body(200, host.robots.encode("utf-8"), "text/plain")
+                    return
+                with host.lock:
+                    host.requests.append((self.path, time.monotonic()))
+                    host.in_flight += 1
+                    host.max_in_flight = max(host.max_in_flight, host.in_flight)
+                try:
+                    time.sleep(host.latency)
+                    headers = []
+                    if host.status in (429, 503) and host.retry_after is not None:
+                        headers.append(("Retry-After", str(host.retry_after)))
+                    page = f"<html><body><h1>{self.path}</h1></body></html>"
+                    self.send_body(
+                        host.status,
+                        page.encode("utf-8"),
+                        "text/html; charset=utf-8",
+                        headers,
+                    )
+                finally:
+                    with host.lock:
+                        host.in_flight -= 1
+
+        return Handler
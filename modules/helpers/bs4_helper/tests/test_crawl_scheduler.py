@@ -0,0 +1,165 @@
+import time
+
+import pytest
+import requests
+
+from fake_hosts import FakeHost
+from modules.helpers.bs4_helper.CWS_BS4Helper.bs4_helper import BS4Helper
+from modules.helpers.bs4_helper.CWS_BS4Helper.crawl_scheduler import (
+    CrawlScheduler,
+    RobotsDisallowedError,
+)
+
+
+@pytest.fixture
+def hosts():
+    started = []
+
+    def start(**settings):
+        host = FakeHost(**settings).start()
+        started.append(host)
+        return host
+
+    yield start
+    for host in started:
+        host.stop()
+
+
+def crawl(scheduler, urls=()):
+    return dict(scheduler.crawl(urls))
+
+
+def host_stats(scheduler, host):
+    return scheduler.stats()[host.url().split("/")[2]]
+
+
+def test_fast_host_limit_grows_to_the_maximum(hosts):
+    fast = hosts()
+    scheduler = CrawlScheduler(
+        BS4Helper(parser="html.parser"), initial_host_limit=1, max_host_limit=4
+    )
+
+    results = crawl(scheduler, [fast.url(f"/page-{i}") for i in range(40)])
+
+    assert len(results) == 40
+    assert all(result.h1.text.startswith("/page-") for result in results.values())
+    stats = host_stats(scheduler, fast)
+    assert stats["limit"] == 4
+    assert stats["completed"] == 40
+    assert stats["errors"] == stats["throttled"] == 0
+    assert fast.robots_requests == 1
+
+
+def test_slow_host_limit_is_halved(hosts):
+    slow = hosts(latency=0.3)
+    scheduler = CrawlScheduler(
+        BS4Helper(parser="html.parser"),
+        initial_host_limit=4,
+        max_host_limit=4,
+        target_latency=0.1,
+    )
+
+    results = crawl(scheduler, [slow.url(f"/page-{i}") for i in range(8)])
+
+    assert not any(isinstance(result, Exception) for result in results.values())
+    stats = host_stats(scheduler, slow)
+    assert stats["limit"] == 1
+    assert stats["completed"] == 8
+    # The first round ran in parallel, the rest one at a time
+    assert slow.max_in_flight == 4
+
+
+def test_slow_host_doesnt_hold_up_a_fast_host(hosts):
+    slow = hosts(latency=0.5)
+    fast = hosts()
+    scheduler = CrawlScheduler(BS4Helper(parser="html.parser"), max_host_limit=4)
+    urls = [slow.url(f"/page-{i}") for i in range(2)]
+    urls += [fast.url(f"/page-{i}") for i in range(20)]
+
+    order = [url for url, _ in scheduler.crawl(urls)]
+
+    assert len(order) == 22
+    assert all(url.startswith(fast.url()) for url in order[:20])
+
+
+def test_throttled_host_is_retried_after_retry_after(hosts):
+    throttled = hosts(status=429, retry_after=0.2)
+    scheduler = CrawlScheduler(
+        BS4Helper(parser="html.parser"), initial_host_limit=2, max_retries=2
+    )
+
+    results = crawl(scheduler, [throttled.url(f"/page-{i}") for i in range(2)])
+
+    for result in results.values():
+        assert isinstance(result, requests.exceptions.HTTPError)
+        assert result.response.status_code == 429
+    # Every URL is tried once and retried max_retries times
+    assert len(throttled.requests) == 6
+    stats = host_stats(scheduler, throttled)
+    assert stats["limit"] == 1
+    assert stats["throttled"] == 6
+    assert stats["errors"] == 2
+    assert stats["completed"] == 0
+    # The retries wait for Retry-After, the first two requests don't
+    assert all(gap >= 0.18 for gap in throttled.request_gaps()[1:])
+
+
+def test_throttling_recovers_once_the_host_answers_again(hosts):
+    host = hosts(status=503)
+    scheduler = CrawlScheduler(
+        BS4Helper(parser="html.parser"),
+        initial_host_limit=4,
+        max_host_limit=4,
+        max_retries=0,
+    )
+    crawl(scheduler, [host.url(f"/busy-{i}") for i in range(4)])
+    assert host_stats(scheduler, host)["limit"] == 1
+
+    host.status = 200
+    results = crawl(scheduler, [host.url(f"/page-{i}") for i in range(20)])
+
+    assert not any(isinstance(result, Exception) for result in results.values())
+    assert host_stats(scheduler, host)["limit"] == 4
+
+
+def test_crawl_delay_spaces_out_the_requests(hosts):
+    polite = hosts(robots="User-agent: *\nCrawl-delay: 0.2\nDisallow: /private\n")
+    scheduler = CrawlScheduler(BS4Helper(parser="html.parser"), max_host_limit=4)
+    urls = [polite.url(f"/page-{i}") for i in range(4)] + [polite.url("/private/a")]
+
+    results = crawl(scheduler, urls)
+
+    assert isinstance(results[polite.url("/private/a")], RobotsDisallowedError)
+    assert [path for path, _ in polite.requests] == [f"/page-{i}" for i in range(4)]
+    assert all(gap >= 0.18 for gap in polite.request_gaps())
+    stats = host_stats(scheduler, polite)
+    assert stats["delay"] == 0.2
+    assert stats["limit"] == 1
+    assert polite.max_in_flight == 1
+
+
+def test_robots_txt_is_loaded_again_after_it_expires(hosts):
+    host = hosts(robots="User-agent: *\nDisallow:\n")
+    scheduler = CrawlScheduler(BS4Helper(parser="html.parser"), robots_ttl=0.5)
+
+    crawl(scheduler, [host.url("/page-0")])
+    crawl(scheduler, [host.url("/page-1")])
+    assert host.robots_requests == 1
+
+    host.robots = "User-agent: *\nDisallow: /\n"
+    time.sleep(0.6)
+    results = crawl(scheduler, [host.url("/page-2")])
+
+    assert host.robots_requests == 2
+    assert isinstance(results[host.url("/page-2")], RobotsDisallowedError)
+    assert [path for path, _ in host.requests] == ["/page-0", "/page-1"]
+
+
+def test_robots_txt_is_ignored_when_asked(hosts):
+    host = hosts(robots="User-agent: *\nDisallow: /\nCrawl-delay: 10\n")
+    scheduler = CrawlScheduler(BS4Helper(parser="html.parser"), respect_robots=False)
+
+    results = crawl(scheduler, [host.url(f"/page-{i}") for i in range(3)])
+
+    assert not any(isinstance(result, Exception) for result in results.values())
+    assert host.robots_requests == 0
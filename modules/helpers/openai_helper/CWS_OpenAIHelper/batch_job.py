@@ -0,0 +1,461 @@
+import os
+import json
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from .openai_helper import OpenAIHelper
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+STATE_FILE_NAME = "batch_job.json"
+
+
+class BatchJobError(Exception):
+    """
+    The result of a request that failed inside a batch, or that never ran
+    because its batch failed, expired or was cancelled.
+    """
+
+
+class BatchJob:
+    """
+    Runs large numbers of chat completions through the OpenAI Batch API, which
+    is cheaper than individual requests and doesn't count against the regular
+    rate limits.
+
+    The job works in three steps:
+    1. `write_requests()` streams the prompts into chunked JSONL files, building
+       every request the same way as `OpenAIHelper.create_chat_completion()`.
+    2. `submit()` uploads the chunks and creates one batch per chunk.
+    3. `results()` waits for the batches and yields the results in the order of
+       the prompts.
+
+    All progress is checkpointed to `batch_job.json` in `work_dir`. Creating a
+    `BatchJob` on the same directory after a crash or restart picks up where the
+    previous run stopped: chunks that were already uploaded aren't uploaded
+    again and results that were already delivered are skipped.
+
+    Args:
+        helper (OpenAIHelper): The helper whose client and message building are
+        used.
+
+        work_dir (str): The directory for the chunk files, the downloaded
+        results and the checkpoint. It is created if it doesn't exist.
+
+        chunk_size (int, optional): The maximum number of requests per batch.
+        Defaults to 50,000, the Batch API limit.
+
+        max_chunk_bytes (int, optional): The maximum size of a chunk file.
+        Defaults to 100 MB, the Batch API limit.
+
+        max_chunk_tokens (int, optional): The maximum number of tokens per
+        batch, counted with the helper's `TokenCounter` (prompt plus
+        `max_tokens * n`). Set it to your enqueued token limit so no batch is
+        rejected for being too large. None doesn't limit tokens.
+
+        completion_window (str, optional): The time frame within which the
+        batches should be processed. Defaults to "24h".
+
+        metadata (dict, optional): Metadata attached to every batch.
+
+        checkpoint_every (int, optional): How many delivered results are
+        recorded at once while `results()` runs. After a restart, at most this
+        many results are delivered a second time. Defaults to 1000.
+    """
+
+    def __init__(
+        self,
+        helper: OpenAIHelper,
+        work_dir: str,
+        chunk_size: int = 50_000,
+        max_chunk_bytes: int = 100 * 1024 * 1024,
+        max_chunk_tokens: Optional[int] = None,
+        completion_window: str = "24h",
+        metadata: Optional[Dict[str, str]] = None,
+        checkpoint_every: int = 1000,
+    ):
+        self.helper = helper
+        self.work_dir = work_dir
+        self.chunk_size = chunk_size
+        self.max_chunk_bytes = max_chunk_bytes
+        self.max_chunk_tokens = max_chunk_tokens
+        self.completion_window = completion_window
+        self.metadata = metadata
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(work_dir, exist_ok=True)
+        self.state_path = os.path.join(work_dir, STATE_FILE_NAME)
+        self.state = self.load_state()
+
+    # ------------------------------------------------------
+    #                     Checkpoints
+    # ------------------------------------------------------
+    def load_state(self) -> Dict[str, Any]:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            log.info(
+                f"Resuming batch job in {self.work_dir}: {state['total']} requests in {len(state['chunks'])} chunks, {state['next_result_index']} results delivered."
+            )
+            return state
+        return {
+            "written": False,
+            "json_mode": False,
+            "total": 0,
+            "next_result_index": 0,
+            "chunks": [],
+        }
+
+    def save_state(self):
+        # Write to a temporary file first so a crash can't leave a broken
+        # checkpoint behind
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    # ------------------------------------------------------
+    #                   Writing requests
+    # ------------------------------------------------------
+    def write_requests(
+        self,
+        prompts: Iterable[Union[str, Dict[str, Any]]],
+        **kwargs,
+    ) -> int:
+        """
+        Streams the prompts into chunked JSONL request files. The prompts can be
+        any iterable, e.g. a generator reading from a database, so they never
+        have to be in memory at the same time.
+
+        Args:
+            prompts (iterable): Each item is either a prompt string or a dict of
+            `create_chat_completion()` arguments for that item. Per-item
+            arguments override `kwargs`.
+
+            **kwargs: Arguments shared by every request, such as `model`,
+            `system_message` or `json_mode`.
+
+        Returns:
+            int: The number of requests that were written.
+
+        Raises:
+            ValueError: If the requests of this job were already written.
+        """
+        log.fine("BatchJob.write_requests")
+        if self.state["written"]:
+            raise ValueError(
+                f"The requests of the batch job in {self.work_dir} were already written. Use a new work_dir for a new job."
+            )
+        # Start over if a previous run was interrupted while writing
+        for chunk in self.state["chunks"]:
+            if os.path.exists(chunk["path"]):
+                os.remove(chunk["path"])
+        self.state["chunks"] = []
+        self.state["json_mode"] = bool(kwargs.get("json_mode", False))
+
+        index = 0
+        chunk_file = None
+        chunk: Optional[Dict[str, Any]] = None
+        try:
+            for item in prompts:
+                item_kwargs = dict(kwargs)
+                if isinstance(item, dict):
+                    item_kwargs.update(item)
+                else:
+                    item_kwargs["prompt"] = item
+                item_kwargs.pop("stream", None)
+                item_kwargs.pop("cache", None)
+                json_mode = bool(item_kwargs.get("json_mode", False))
+                line, tokens = self.build_request_line(index, item_kwargs)
+
+                if chunk is None or (
+                    chunk["count"] >= self.chunk_size
+                    or chunk["bytes"] + len(line) > self.max_chunk_bytes
+                    or (
+                        self.max_chunk_tokens is not None
+                        and chunk["tokens"] + tokens > self.max_chunk_tokens
+                    )
+                ):
+                    if chunk_file is not None:
+                        chunk_file.close()
+                    chunk = self.new_chunk(index)
+                    chunk_file = open(chunk["path"], "wb")
+                chunk_file.write(line)
+                if json_mode != self.state["json_mode"]:
+                    # Only the requests that differ from the shared json_mode
+                    # are recorded, to keep the checkpoint small
+                    chunk["json_mode_overrides"][self.custom_id(index)] = json_mode
+                chunk["count"] += 1
+                chunk["bytes"] += len(line)
+                chunk["tokens"] += tokens
+                index += 1
+        finally:
+            if chunk_file is not None:
+                chunk_file.close()
+
+        self.state["total"] = index
+        self.state["written"] = True
+        self.save_state()
+        log.info(f"Wrote {index} batch requests in {len(self.state['chunks'])} chunks.")
+        return index
+
+    def build_request_line(
+        self, index: int, item_kwargs: Dict[str, Any]
+    ) -> Tuple[bytes, int]:
+        """
+        Returns the JSONL line of a request and its estimated token count.
+        """
+        completion_params = self.helper.build_completion_params(**item_kwargs)
+        tokens = self.helper.token_counter.estimate_request_tokens(completion_params)
+        request = {
+            "custom_id": self.custom_id(index),
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": completion_params,
+        }
+        # Iterables such as generators of tools are written as lists
+        return (json.dumps(request, default=list) + "\n").encode("utf-8"), tokens
+
+    def new_chunk(self, first_index: int) -> Dict[str, Any]:
+        chunk_number = len(self.state["chunks"])
+        chunk = {
+            "path": os.path.join(self.work_dir, f"requests_{chunk_number:05d}.jsonl"),
+            "first_index": first_index,
+            "count": 0,
+            "bytes": 0,
+            "tokens": 0,
+            "json_mode_overrides": {},
+            "input_file_id": None,
+            "batch_id": None,
+            "status": None,
+            "output_file_id": None,
+            "error_file_id": None,
+        }
+        self.state["chunks"].append(chunk)
+        return chunk
+
+    @staticmethod
+    def custom_id(index: int) -> str:
+        return f"request-{index}"
+
+    # ------------------------------------------------------
+    #                 Submitting and polling
+    # ------------------------------------------------------
+    def submit(self) -> List[str]:
+        """
+        Uploads every chunk that hasn't been uploaded yet and creates its batch.
+        Each step is checkpointed, so calling this again after an interruption
+        only submits what is missing.
+
+        Returns:
+            list: The batch IDs of all chunks.
+        """
+        log.fine("BatchJob.submit")
+        if not self.state["written"]:
+            raise ValueError("Call write_requests() before submit().")
+        client = self.helper.client
+        for chunk in self.state["chunks"]:
+            if chunk["input_file_id"] is None:
+                with open(chunk["path"], "rb") as f:
+                    uploaded_file = client.files.create(
+                        file=f, purpose="batch"  # type: ignore[arg-type]
+                    )
+                chunk["input_file_id"] = uploaded_file.id
+                self.save_state()
+            if chunk["batch_id"] is None:
+                batch_params: Dict[str, Any] = {
+                    "input_file_id": chunk["input_file_id"],
+                    "endpoint": BATCH_ENDPOINT,
+                    "completion_window": self.completion_window,
+                }
+                if self.metadata:
+                    batch_params["metadata"] = self.metadata
+                batch = client.batches.create(**batch_params)
+                chunk["batch_id"] = batch.id
+                chunk["status"] = batch.status
+                self.save_state()
+                log.info(f"Submitted batch {batch.id} ({chunk['count']} requests).")
+        return [chunk["batch_id"] for chunk in self.state["chunks"]]
+
+    def refresh(self, chunk: Dict[str, Any]) -> str:
+        """
+        Retrieves the current status of a chunk's batch and records it.
+        """
+        batch = self.helper.client.batches.retrieve(chunk["batch_id"])
+        if batch.status != chunk["status"]:
+            log.info(f"Batch {batch.id} is {batch.status}.")
+        chunk["status"] = batch.status
+        chunk["output_file_id"] = batch.output_file_id
+        chunk["error_file_id"] = batch.error_file_id
+        self.save_state()
+        return batch.status
+
+    def poll(
+        self, interval: float = 60, timeout: Optional[float] = None
+    ) -> Dict[str, str]:
+        """
+        Waits until every batch is completed, failed, expired or cancelled.
+
+        Args:
+            interval (float, optional): Seconds between status checks. Defaults
+            to 60.
+
+            timeout (float, optional): The maximum number of seconds to wait.
+            None waits until all batches are done.
+
+        Returns:
+            dict: The status of every batch by batch ID.
+
+        Raises:
+            TimeoutError: If the batches aren't done within `timeout`.
+        """
+        log.fine("BatchJob.poll")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pending = [
+                chunk
+                for chunk in self.state["chunks"]
+                if chunk["status"] not in TERMINAL_STATUSES
+            ]
+            for chunk in pending:
+                self.refresh(chunk)
+            if all(
+                chunk["status"] in TERMINAL_STATUSES for chunk in self.state["chunks"]
+            ):
+                return {
+                    chunk["batch_id"]: chunk["status"] for chunk in self.state["chunks"]
+                }
+            if deadline is not None and time.monotonic() + interval > deadline:
+                raise TimeoutError(
+                    f"The batches were not done within {timeout} seconds."
+                )
+            time.sleep(interval)
+
+    # ------------------------------------------------------
+    #                       Results
+    # ------------------------------------------------------
+    def results(
+        self, poll_interval: float = 60
+    ) -> Iterator[Tuple[int, Union[Dict[str, Any], str, BatchJobError]]]:
+        """
+        Yields `(index, result)` for every request in the order the prompts were
+        written, starting after the last checkpointed result. The result is the
+        same as `create_chat_completion()` would return (a dict in JSON mode),
+        or a `BatchJobError` if the request failed.
+
+        The results of each chunk are yielded as soon as its batch is done, so
+        this can be called right after `submit()`.
+
+        Args:
+            poll_interval (float, optional): Seconds between status checks
+            while a batch is still running. Defaults to 60.
+        """
+        log.fine("BatchJob.results")
+        if any(chunk["batch_id"] is None for chunk in self.state["chunks"]):
+            raise ValueError("Call submit() before results().")
+        for chunk_number, chunk in enumerate(self.state["chunks"]):
+            chunk_end = chunk["first_index"] + chunk["count"]
+            if self.state["next_result_index"] >= chunk_end:
+                continue
+            while chunk["status"] not in TERMINAL_STATUSES:
+                if self.refresh(chunk) not in TERMINAL_STATUSES:
+                    time.sleep(poll_interval)
+
+            responses = self.load_responses(chunk, chunk_number)
+            delivered_since_checkpoint = 0
+            for index in range(self.state["next_result_index"], chunk_end):
+                custom_id = self.custom_id(index)
+                json_mode = chunk.get("json_mode_overrides", {}).get(
+                    custom_id, self.state["json_mode"]
+                )
+                yield index, self.parse_result(
+                    responses.get(custom_id), chunk, json_mode
+                )
+                self.state["next_result_index"] = index + 1
+                delivered_since_checkpoint += 1
+                if delivered_since_checkpoint >= self.checkpoint_every:
+                    self.save_state()
+                    delivered_since_checkpoint = 0
+            self.save_state()
+
+    def load_responses(
+        self, chunk: Dict[str, Any], chunk_number: int
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Downloads the output and error files of a finished chunk (once) and
+        returns their lines by custom ID.
+        """
+        responses: Dict[str, Dict[str, Any]] = {}
+        for kind in ("output", "error"):
+            file_id = chunk[f"{kind}_file_id"]
+            if not file_id:
+                continue
+            path = os.path.join(self.work_dir, f"{kind}_{chunk_number:05d}.jsonl")
+            if not os.path.exists(path):
+                temp_path = path + ".tmp"
+                with self.helper.client.files.with_streaming_response.content(
+                    file_id
+                ) as response:
+                    response.stream_to_file(temp_path)
+                os.replace(temp_path, path)
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        result = json.loads(line)
+                        responses[result["custom_id"]] = result
+        return responses
+
+    @staticmethod
+    def parse_result(
+        line: Optional[Dict[str, Any]], chunk: Dict[str, Any], json_mode: bool
+    ) -> Union[Dict[str, Any], str, BatchJobError]:
+        if line is None:
+            return BatchJobError(
+                f"No result for this request. Batch {chunk['batch_id']} is {chunk['status']}."
+            )
+        if line.get("error"):
+            return BatchJobError(str(line["error"]))
+        response = line.get("response") or {}
+        if response.get("status_code") != 200:
+            return BatchJobError(
+                f"Status {response.get('status_code')}: {response.get('body')}"
+            )
+        try:
+            return OpenAIHelper.parse_content(
+                response["body"]["choices"][0]["message"]["content"], json_mode
+            )
+        except (KeyError, IndexError, ValueError) as e:
+            return BatchJobError(f"Could not parse the result: {e}")
+
+    def run(
+        self,
+        prompts: Iterable[Union[str, Dict[str, Any]]],
+        poll_interval: float = 60,
+        **kwargs,
+    ) -> Iterator[Tuple[int, Union[Dict[str, Any], str, BatchJobError]]]:
+        """
+        Writes, submits and collects a whole job, resuming it if `work_dir`
+        already has a checkpoint. Takes the same arguments as
+        `write_requests()` and yields the same items as `results()`.
+        """
+        if not self.state["written"]:
+            self.write_requests(prompts, **kwargs)
+        self.submit()
+        yield from self.results(poll_interval=poll_interval)
@@ -0,0 +1,186 @@
+import os
+import asyncio
+import threading
+import importlib.util
+from typing import Any, Dict, Optional, Tuple
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+import httpx
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    DefaultHttpxClient,
+    DefaultAsyncHttpxClient,
+)
+
+# The connection pool settings used when a helper doesn't pass its own.
+# Connections are kept open longer than httpx's default so bursts of requests a
+# few seconds apart don't pay for a new TLS handshake.
+DEFAULT_HTTP_OPTIONS: Dict[str, Any] = {
+    "max_connections": 1000,
+    "max_keepalive_connections": 100,
+    "keepalive_expiry": 30.0,
+    "http2": False,
+}
+
+ClientKey = Tuple[str, Optional[str], Optional[str]]
+
+lock = threading.Lock()
+sync_clients: Dict[ClientKey, Tuple[OpenAI, Dict[str, Any]]] = {}
+# Async clients can only be used on the event loop they were created on, so
+# they are kept per loop
+async_clients: Dict[
+    asyncio.AbstractEventLoop, Dict[ClientKey, Tuple[AsyncOpenAI, Dict[str, Any]]]
+] = {}
+
+
+def resolve_http_options(http_options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    options = dict(DEFAULT_HTTP_OPTIONS)
+    if http_options:
+        unknown_options = set(http_options) - set(DEFAULT_HTTP_OPTIONS)
+        if unknown_options:
+            raise ValueError(
+                f"Unknown http_options {sorted(unknown_options)}. Supported options are {sorted(DEFAULT_HTTP_OPTIONS)}."
+            )
+        options.update(http_options)
+    if options["http2"] and importlib.util.find_spec("h2") is None:
+        log.warning(
+            "HTTP/2 needs the 'h2' package ('pip install httpx[http2]'). Falling back to HTTP/1.1."
+        )
+        options["http2"] = False
+    return options
+
+
+def build_http_client_kwargs(options: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=options["max_connections"],
+            max_keepalive_connections=options["max_keepalive_connections"],
+            keepalive_expiry=options["keepalive_expiry"],
+        ),
+        "http2": options["http2"],
+    }
+
+
+def check_options(key: ClientKey, existing: Dict[str, Any], requested: Dict[str, Any]):
+    if existing != requested:
+        log.warning(
+            f"A shared client for {key[2] or 'the default base URL'} already exists with http_options {existing}. The requested options {requested} are ignored."
+        )
+
+
+def get_openai_client(
+    api_key: str,
+    organization: Optional[str] = None,
+    base_url: Optional[str] = None,
+    http_options: Optional[Dict[str, Any]] = None,
+) -> OpenAI:
+    """
+    Returns the process-wide `OpenAI` client for the given credentials and base
+    URL, creating it on first use. Every helper that uses the same
+    (api_key, organization, base_url) shares one connection pool, so creating a
+    helper per task doesn't pay for new TCP and TLS handshakes.
+
+    Args:
+        http_options (dict, optional): Connection pool settings for a new
+        client: `max_connections`, `max_keepalive_connections`,
+        `keepalive_expiry` (seconds) and `http2`. See DEFAULT_HTTP_OPTIONS.
+        They are ignored with a warning if the shared client already exists
+        with different settings.
+    """
+    key = (api_key, organization, base_url)
+    options = resolve_http_options(http_options)
+    with lock:
+        if key in sync_clients:
+            client, existing_options = sync_clients[key]
+            if http_options is not None:
+                check_options(key, existing_options, options)
+            return client
+        client = OpenAI(
+            api_key=api_key,
+            organization=organization,
+            base_url=base_url,
+            http_client=DefaultHttpxClient(**build_http_client_kwargs(options)),
+        )
+        sync_clients[key] = (client, options)
+        log.debug(
+            f"Created a shared OpenAI client for {base_url or 'the default base URL'}"
+        )
+        return client
+
+
+def get_async_openai_client(
+    api_key: str,
+    organization: Optional[str] = None,
+    base_url: Optional[str] = None,
+    http_options: Optional[Dict[str, Any]] = None,
+) -> AsyncOpenAI:
+    """
+    The async version of `get_openai_client()`. The client is shared by
+    everything running on the current event loop. Must be called from a
+    coroutine.
+    """
+    loop = asyncio.get_running_loop()
+    key = (api_key, organization, base_url)
+    options = resolve_http_options(http_options)
+    with lock:
+        # Drop the clients of event loops that have been closed since
+        for closed_loop in [
+            other_loop for other_loop in async_clients if other_loop.is_closed()
+        ]:
+            del async_clients[closed_loop]
+        loop_clients = async_clients.setdefault(loop, {})
+        if key in loop_clients:
+            client, existing_options = loop_clients[key]
+            if http_options is not None:
+                check_options(key, existing_options, options)
+            return client
+        client = AsyncOpenAI(
+            api_key=api_key,
+            organization=organization,
+            base_url=base_url,
+            http_client=DefaultAsyncHttpxClient(**build_http_client_kwargs(options)),
+        )
+        loop_clients[key] = (client, options)
+        return client
+
+
+async def close_async_clients():
+    """
+    Closes and forgets the shared async clients of the current event loop. Call
+    it before the loop is closed, e.g. at the end of the coroutine passed to
+    `asyncio.run()`.
+    """
+    loop = asyncio.get_running_loop()
+    with lock:
+        loop_clients = async_clients.pop(loop, {})
+    for client, _ in loop_clients.values():
+        await client.close()
+
+
+def close_clients():
+    """
+    Closes and forgets all shared sync clients.
+    """
+    with lock:
+        clients = list(sync_clients.values())
+        sync_clients.clear()
+    for client, _ in clients:
+        client.close()
@@ -0,0 +1,279 @@
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from .token_counter import TokenCounter, REPLY_PRIMING_TOKENS, get_encoding
+
+TRIMMING_STRATEGIES = ("sliding_window", "summarize")
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+class Conversation:
+    """
+    A multi-turn chat history that is built incrementally.
+
+    Messages are kept in a fixed order: the system message and the
+    `prefix_messages` (e.g. instructions, reference documents or few-shot
+    examples) come first and never change, then the summary of trimmed turns if
+    there is one, then the recent turns. Keeping the start of every request
+    identical lets the API reuse its prompt cache for it.
+
+    The token count of every message is computed once, when the message is
+    added, so a new turn only costs the work for the new messages instead of
+    the whole history. `OpenAIHelper.continue_conversation()` checks the
+    context window with `prompt_tokens()` instead of counting again.
+
+    When the history grows past `max_history_tokens` or `max_history_messages`,
+    it is trimmed. "sliding_window" drops the oldest turns. "summarize" replaces
+    the older turns with a summary written by `summarizer` and keeps the last
+    `keep_last_messages` messages as they are. The prefix is never trimmed.
+
+    Args:
+        system_message (str, optional): The system message of the conversation.
+
+        prefix_messages (list, optional): Messages that are sent after the
+        system message in every request and never trimmed.
+
+        model (str, optional): The model used to count tokens. Defaults to
+        "gpt-4-turbo".
+
+        max_history_tokens (int, optional): The token budget of the history
+        (everything after the prefix). None only trims when a request wouldn't
+        fit the model's context window.
+
+        max_history_messages (int, optional): The largest number of history
+        messages to keep.
+
+        trimming (str, optional): "sliding_window" or "summarize". Defaults to
+        "sliding_window".
+
+        summarizer (Callable, optional): Takes the messages to condense and
+        returns the summary text. Required for "summarize", e.g.
+        `OpenAIHelper.summarize_messages`.
+
+        keep_last_messages (int, optional): The number of recent messages that
+        "summarize" never condenses. Defaults to 4.
+
+        token_counter (TokenCounter, optional): Counts the tokens of each
+        message. Defaults to a new `TokenCounter`.
+    """
+
+    def __init__(
+        self,
+        system_message: Optional[str] = None,
+        prefix_messages: Optional[List[Dict[str, Any]]] = None,
+        model: str = "gpt-4-turbo",
+        max_history_tokens: Optional[int] = None,
+        max_history_messages: Optional[int] = None,
+        trimming: str = "sliding_window",
+        summarizer: Optional[Callable[[List[Dict[str, Any]]], str]] = None,
+        keep_last_messages: int = 4,
+        token_counter: Optional[TokenCounter] = None,
+    ):
+        if trimming not in TRIMMING_STRATEGIES:
+            raise ValueError(
+                f"trimming must be one of {TRIMMING_STRATEGIES}, got {trimming!r}."
+            )
+        if trimming == "summarize" and summarizer is None:
+            raise ValueError("The 'summarize' trimming strategy needs a summarizer.")
+        self.model = model
+        self.max_history_tokens = max_history_tokens
+        self.max_history_messages = max_history_messages
+        self.trimming = trimming
+        self.summarizer = summarizer
+        self.keep_last_messages = keep_last_messages
+        self.token_counter = token_counter or TokenCounter()
+
+        self.prefix: List[Dict[str, Any]] = []
+        if system_message:
+            self.prefix.append({"role": "system", "content": system_message})
+        self.prefix.extend(prefix_messages or [])
+        self.prefix_tokens = sum(
+            self.token_counter.count_message(message, model) for message in self.prefix
+        )
+
+        self.summary: Optional[Dict[str, Any]] = None
+        self.summary_tokens = 0
+        self.history: List[Dict[str, Any]] = []
+        self.history_message_tokens: List[int] = []
+        self.history_tokens = 0
+        # The message list returned by messages(), rebuilt after a change
+        self.message_list: Optional[List[Dict[str, Any]]] = None
+
+    def __len__(self) -> int:
+        return len(self.history)
+
+    def add_message(self, message: Dict[str, Any]):
+        """
+        Appends a message to the history and trims the history if it is over
+        its limits.
+        """
+        tokens = self.token_counter.count_message(message, self.model)
+        self.history.append(message)
+        self.history_message_tokens.append(tokens)
+        self.history_tokens += tokens
+        self.message_list = None
+        if (
+            self.max_history_tokens is not None
+            and self.history_tokens + self.summary_tokens > self.max_history_tokens
+        ) or (
+            self.max_history_messages is not None
+            and len(self.history) > self.max_history_messages
+        ):
+            self.trim()
+
+    def add_user_message(self, content: Any):
+        """
+        Appends a user message. `content` is a string or a list of content
+        parts.
+        """
+        self.add_message({"role": "user", "content": content})
+
+    def add_assistant_message(
+        self,
+        content: Optional[str],
+        tool_calls: Optional[List[Dict[str, Any]]] = None,
+    ):
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        self.add_message(message)
+
+    def add_tool_message(self, tool_call_id: str, content: str):
+        self.add_message(
+            {"role": "tool", "tool_call_id": tool_call_id, "content": content}
+        )
+
+    def messages(self) -> List[Dict[str, Any]]:
+        """
+        Returns the messages to send: the prefix, the summary of trimmed turns
+        and the history, in that order.
+        """
+        if self.message_list is None:
+            self.message_list = (
+                self.prefix
+                + ([self.summary] if self.summary is not None else [])
+                + self.history
+            )
+        return list(self.message_list)
+
+    def prompt_tokens(self, model: Optional[str] = None) -> int:
+        """
+        Returns the prompt tokens of `messages()` without counting them again.
+        They are only counted again if `model` uses a different tokenizer than
+        the conversation's model.
+        """
+        if model is not None and get_encoding(model) is not get_encoding(self.model):
+            return self.token_counter.count_messages(self.messages(), model)
+        return (
+            REPLY_PRIMING_TOKENS
+            + self.prefix_tokens
+            + self.summary_tokens
+            + self.history_tokens
+        )
+
+    def trim(self, max_history_tokens: Optional[int] = None) -> int:
+        """
+        Trims the history to `max_history_tokens` (or the conversation's own
+        limit if that is lower) and `max_history_messages`. Returns the number
+        of messages that were removed. The newest message is always kept.
+        """
+        budgets = [
+            budget
+            for budget in (max_history_tokens, self.max_history_tokens)
+            if budget is not None
+        ]
+        token_budget = min(budgets) if budgets else None
+        if not self.is_over_budget(token_budget):
+            return 0
+        removed = 0
+        if self.trimming == "summarize":
+            removed = self.summarize_older_messages()
+        if self.is_over_budget(token_budget):
+            removed += self.drop_oldest_messages(token_budget)
+        log.debug(
+            f"Conversation: trimmed {removed} messages, {self.history_tokens + self.summary_tokens} history tokens left"
+        )
+        return removed
+
+    def is_over_budget(self, token_budget: Optional[int]) -> bool:
+        if (
+            token_budget is not None
+            and self.history_tokens + self.summary_tokens > token_budget
+        ):
+            return True
+        return (
+            self.max_history_messages is not None
+            and len(self.history) > self.max_history_messages
+        )
+
+    def remove_oldest(self, count: int):
+        self.history_tokens -= sum(self.history_message_tokens[:count])
+        del self.history[:count]
+        del self.history_message_tokens[:count]
+        self.message_list = None
+
+    def drop_oldest_messages(self, token_budget: Optional[int]) -> int:
+        count = 0
+        tokens = self.history_tokens + self.summary_tokens
+        while count < len(self.history) - 1 and (
+            (token_budget is not None and tokens > token_budget)
+            or (
+                self.max_history_messages is not None
+                and len(self.history) - count > self.max_history_messages
+            )
+        ):
+            tokens -= self.history_message_tokens[count]
+            count += 1
+        # A tool result can't be sent without the assistant message that
+        # called the tool
+        while count < len(self.history) - 1 and self.history[count]["role"] == "tool":
+            count += 1
+        self.remove_oldest(count)
+        if token_budget is not None and self.summary is not None:
+            if self.history_tokens + self.summary_tokens > token_budget:
+                self.summary = None
+                self.summary_tokens = 0
+        return count
+
+    def summarize_older_messages(self) -> int:
+        count = len(self.history) - self.keep_last_messages
+        while count > 0 and self.history[count]["role"] == "tool":
+            count -= 1
+        if count <= 0:
+            return 0
+        # The previous summary is condensed together with the older messages
+        messages = ([self.summary] if self.summary is not None else []) + self.history[
+            :count
+        ]
+        summary_text = self.summarizer(messages)
+        self.summary = {"role": "system", "content": SUMMARY_PREFIX + summary_text}
+        self.summary_tokens = self.token_counter.count_message(self.summary, self.model)
+        self.remove_oldest(count)
+        return count
+
+    def clear(self):
+        """
+        Removes the history and the summary. The prefix is kept.
+        """
+        self.summary = None
+        self.summary_tokens = 0
+        self.remove_oldest(len(self.history))
@@ -0,0 +1,240 @@
+import os
+import io
+import base64
+import mimetypes
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+try:
+    from PIL import Image
+except ModuleNotFoundError:
+    # Pillow is only needed to resize or recompress images
+    Image = None
+
+
+# The largest size the API processes an image at for each detail level. The API
+# scales larger images down itself, so sending them at this size loses nothing.
+# "high" first fits the image into 2048x2048 and then scales its shortest side
+# down to 768.
+LOW_DETAIL_MAX_SIDE = 512
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_MAX_SHORT_SIDE = 768
+
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+PIL_FORMATS = {
+    "image/png": "PNG",
+    "image/jpeg": "JPEG",
+    "image/gif": "GIF",
+    "image/webp": "WEBP",
+}
+
+
+def detect_mime_type(data: bytes, image_path: Optional[str] = None) -> str:
+    """
+    Returns the MIME type of an image from its leading bytes. Falls back to the
+    file extension and then to "image/jpeg".
+    """
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if image_path:
+        guessed_type, _ = mimetypes.guess_type(image_path)
+        if guessed_type and guessed_type.startswith("image/"):
+            return guessed_type
+    return "image/jpeg"
+
+
+class ImageEncoder:
+    """
+    Prepares local images for multimodal prompts.
+
+    The encoder detects the real MIME type of each image and can downscale and
+    recompress it before it is base64-encoded, which keeps large screenshots
+    from inflating the request. Encoded results are kept in an LRU cache keyed
+    by the file's path, modification time, size and the encoding settings, and
+    `encode_many()` encodes the images of a prompt on a thread pool.
+
+    Args:
+        detail (str, optional): The default detail level ("low", "high" or
+        "auto"). Images are scaled down to the largest size the API uses for
+        that level. None sends images at their original size.
+
+        max_dimension (int, optional): Scales images down so neither side is
+        larger than this.
+
+        output_format (str, optional): Re-encodes images to this format, e.g.
+        "JPEG" or "WEBP". None keeps the original format.
+
+        quality (int, optional): The quality used for JPEG and WEBP output.
+        Defaults to 85.
+
+        max_cache_entries (int, optional): The number of encoded images to keep.
+        Defaults to 128.
+
+        max_workers (int, optional): The number of threads used by
+        `encode_many()`. Defaults to 8.
+    """
+
+    def __init__(
+        self,
+        detail: Optional[str] = None,
+        max_dimension: Optional[int] = None,
+        output_format: Optional[str] = None,
+        quality: int = 85,
+        max_cache_entries: int = 128,
+        max_workers: int = 8,
+    ):
+        self.detail = detail
+        self.max_dimension = max_dimension
+        self.output_format = output_format.upper() if output_format else None
+        self.quality = quality
+        self.max_cache_entries = max_cache_entries
+        self.max_workers = max_workers
+        self.cache: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.warned_about_pillow = False
+
+    def encode(self, image_path: str, detail: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Returns the MIME type and the base64-encoded content of an image.
+        """
+        detail = detail or self.detail
+        stat = os.stat(image_path)
+        cache_key = (
+            os.path.abspath(image_path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            detail,
+            self.max_dimension,
+            self.output_format,
+            self.quality,
+        )
+        with self.lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                return self.cache[cache_key]
+
+        with open(image_path, "rb") as image_file:
+            data = image_file.read()
+        mime_type = detect_mime_type(data, image_path)
+        mime_type, data = self.preprocess(data, mime_type, detail)
+        encoded = (mime_type, base64.b64encode(data).decode("utf-8"))
+
+        with self.lock:
+            self.cache[cache_key] = encoded
+            self.cache.move_to_end(cache_key)
+            while len(self.cache) > self.max_cache_entries:
+                self.cache.popitem(last=False)
+        return encoded
+
+    def encode_many(
+        self, image_paths: List[str], detail: Optional[str] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Encodes several images in parallel and returns their MIME types and
+        base64 contents in the same order as `image_paths`.
+        """
+        if len(image_paths) < 2:
+            return [self.encode(image_path, detail) for image_path in image_paths]
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="ImageEncoder",
+                )
+        return list(
+            self.executor.map(lambda path: self.encode(path, detail), image_paths)
+        )
+
+    def to_data_url(self, image_path: str, detail: Optional[str] = None) -> str:
+        mime_type, image_base64 = self.encode(image_path, detail)
+        return f"data:{mime_type};base64,{image_base64}"
+
+    def target_size(
+        self, width: int, height: int, detail: Optional[str]
+    ) -> Tuple[int, int]:
+        """
+        Returns the size an image of `width` x `height` is scaled down to for
+        the given detail level and `max_dimension`.
+        """
+        scale = 1.0
+        if detail == "low":
+            scale = min(scale, LOW_DETAIL_MAX_SIDE / max(width, height))
+        elif detail in ("high", "auto"):
+            scale = min(scale, HIGH_DETAIL_MAX_SIDE / max(width, height))
+            scale = min(scale, HIGH_DETAIL_MAX_SHORT_SIDE / min(width, height))
+        if self.max_dimension:
+            scale = min(scale, self.max_dimension / max(width, height))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def preprocess(
+        self, data: bytes, mime_type: str, detail: Optional[str]
+    ) -> Tuple[str, bytes]:
+        if detail is None and self.max_dimension is None and self.output_format is None:
+            return mime_type, data
+        if Image is None:
+            if self.warned_about_pillow:
+                return mime_type, data
+            self.warned_about_pillow = True
+            log.warning(
+                "Pillow is not installed, so images are sent at their original size. Install it with 'pip install pillow'."
+            )
+            return mime_type, data
+
+        image = Image.open(io.BytesIO(data))
+        size = self.target_size(image.width, image.height, detail)
+        original_format = PIL_FORMATS.get(mime_type)
+        output_format = self.output_format or original_format
+        if output_format is None or (
+            size == image.size and output_format == original_format
+        ):
+            # Already small enough and in the right format
+            return mime_type, data
+
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        if output_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        save_options = {"optimize": True}
+        if output_format in ("JPEG", "WEBP"):
+            save_options["quality"] = self.quality
+        image.save(buffer, format=output_format, **save_options)
+        log.debug(
+            f"ImageEncoder: {len(data)} bytes -> {len(buffer.getvalue())} bytes ({image.width}x{image.height} {output_format})"
+        )
+        return f"image/{output_format.lower()}", buffer.getvalue()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,97 @@
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON object or array while it is still being generated.
+
+    Text is passed in with `feed()` as it arrives. Every top-level member is
+    returned as soon as it is complete: `(key, value)` for the members of an
+    object and `(index, item)` for the items of an array. This lets the next
+    stage start on the first members before the model has finished the rest.
+
+    Example:
+        >>> parser = IncrementalJSONParser()
+        >>> parser.feed('{"title": "Example", "ta')
+        [('title', 'Example')]
+        >>> parser.feed('gs": ["a", "b"]}')
+        [('tags', ['a', 'b'])]
+    """
+
+    def __init__(self):
+        # "{" or "[" once the top-level value has started
+        self.container: Optional[str] = None
+        self.member: List[str] = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.index = 0
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[Union[str, int], Any]]:
+        """
+        Adds the next piece of text and returns the top-level members that were
+        completed by it.
+        """
+        members = []
+        for char in text:
+            if self.done:
+                if not char.isspace():
+                    raise ValueError(f"Unexpected data after the JSON value: {char!r}")
+                continue
+            if self.container is None:
+                if char.isspace():
+                    continue
+                if char not in "{[":
+                    raise ValueError(
+                        f"Incremental parsing needs a JSON object or array, got {char!r}"
+                    )
+                self.container = char
+                continue
+            if self.in_string:
+                self.member.append(char)
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                if self.depth == 0:
+                    # End of the top-level value
+                    self.finish_member(members)
+                    self.done = True
+                    continue
+                self.depth -= 1
+            elif char == "," and self.depth == 0:
+                self.finish_member(members)
+                continue
+            self.member.append(char)
+        return members
+
+    def finish_member(self, members: List[Tuple[Union[str, int], Any]]):
+        text = "".join(self.member).strip()
+        self.member = []
+        if not text:
+            # An empty object or array
+            return
+        if self.container == "{":
+            key, value = next(iter(json.loads("{" + text + "}").items()))
+            members.append((key, value))
+        else:
+            members.append((self.index, json.loads(text)))
+            self.index += 1
+
+    def close(self):
+        """
+        Raises a ValueError if the text fed so far isn't a complete JSON value,
+        e.g. because the generation was cut off by `max_tokens`.
+        """
+        if not self.done:
+            raise ValueError("The JSON value is incomplete.")
@@ -23,8 +23,27 @@ if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"
     log.info("Running in test mode.")
 
 import json
-from openai import OpenAI
-from typing import List, Optional, Annotated, Dict, Any, Union, Iterable
+import asyncio
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    APIStatusError,
+    DefaultHttpxClient,
+    DefaultAsyncHttpxClient,
+)
+from typing import (
+    List,
+    Optional,
+    Annotated,
+    Dict,
+    Any,
+    Union,
+    Iterable,
+    Literal,
+    Tuple,
+    Iterator,
+    AsyncIterator,
+)
 import base64
 from openai.types.chat_model import ChatModel
 from openai.types.chat.completion_create_params import ResponseFormat
@@ -51,19 +70,117 @@ from openai.types.chat.chat_completion_content_part_image_param import (
 )
 from openai._types import NotGiven, NOT_GIVEN
 
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache, CACHE_MODES
+from .json_stream import IncrementalJSONParser
+from .image_encoder import ImageEncoder
+from .token_counter import (
+    TokenCounter,
+    TRUNCATION_STRATEGIES,
+    REPLY_PRIMING_TOKENS,
+)
+from .request_policy import RequestPolicy
+from .conversation import Conversation
+from .client_registry import (
+    get_openai_client,
+    get_async_openai_client,
+    close_async_clients,
+    resolve_http_options,
+    build_http_client_kwargs,
+)
+
 OPENAI_VERSION = "1.25.1"
 
+# The dependency check only has to run once per process
+dependency_versions_checked = False
+
+SUMMARIZE_SYSTEM_MESSAGE = (
+    "Summarize the following conversation for the assistant that continues it. "
+    "Keep every fact, decision, open question and instruction that later turns "
+    "may depend on. Be concise."
+)
+
+
 class OpenAIHelper:
 
     def __init__(
         self,
         api_key: Annotated[str, "The OpenAI API Key you wish to use"],
         organization: str,
+        rate_limiter: Optional[
+            Annotated[
+                RateLimiter,
+                "A limiter that can be shared by every helper in the process",
+            ]
+        ] = None,
+        cache: Optional[
+            Annotated[
+                ResponseCache,
+                "An opt-in cache that answers repeated identical requests",
+            ]
+        ] = None,
+        image_encoder: Optional[
+            Annotated[
+                ImageEncoder,
+                "Controls how images are resized, recompressed and cached",
+            ]
+        ] = None,
+        token_counter: Optional[
+            Annotated[
+                TokenCounter,
+                "Counts prompt tokens locally before requests are sent",
+            ]
+        ] = None,
+        base_url: Optional[str] = None,
+        http_options: Optional[
+            Annotated[
+                Dict[str, Any],
+                "max_connections, max_keepalive_connections, keepalive_expiry and http2",
+            ]
+        ] = None,
+        share_client: Annotated[
+            bool, "Whether to reuse the process-wide client for these credentials"
+        ] = True,
+        request_policy: Optional[
+            Annotated[
+                RequestPolicy,
+                "Timeouts, deadline, retries and hedging for every request",
+            ]
+        ] = None,
     ):
-        self.client = OpenAI(api_key=api_key, organization=organization)
+        self.api_key = api_key
+        self.organization = organization
+        self.base_url = base_url
+        self.http_options = http_options
+        self.share_client = share_client
+        if share_client:
+            self.client = get_openai_client(
+                api_key, organization, base_url, http_options
+            )
+        else:
+            self.client = OpenAI(
+                api_key=api_key,
+                organization=organization,
+                base_url=base_url,
+                http_client=DefaultHttpxClient(
+                    **build_http_client_kwargs(resolve_http_options(http_options))
+                ),
+            )
+        # Only used without share_client. Created on first use by the async
+        # methods.
+        self.async_client: Optional[AsyncOpenAI] = None
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.image_encoder = image_encoder or ImageEncoder()
+        self.token_counter = token_counter or TokenCounter()
+        self.request_policy = request_policy
         self.check_dependency_versions()
 
     def check_dependency_versions(self):
+        global dependency_versions_checked
+        if dependency_versions_checked:
+            return
+        dependency_versions_checked = True
         current_openai_version = version("openai")
         # Check if the warning should be muted
         mute_warning = os.getenv("MUTE_OPENAI_HELPER_WARNING", "False").lower() in (
@@ -86,6 +203,7 @@ class OpenAIHelper:
         images: Optional[
             Annotated[List[str], "The list of image paths you want to pass in"]
         ] = None,
+        image_detail: Optional[Literal["auto", "low", "high"]] = None,
         system_message: Optional[
             Annotated[
                 str,
@@ -110,6 +228,9 @@ class OpenAIHelper:
         top_logprobs: Optional[int] | NotGiven = NOT_GIVEN,
         top_p: Optional[float] | NotGiven = NOT_GIVEN,
         user: str | NotGiven = NOT_GIVEN,
+        truncation: Optional[Literal["start", "end", "middle"]] = None,
+        cache: Optional[Literal["read", "write", "off"]] = None,
+        request_policy: Optional[RequestPolicy] = None,
     ) -> Union[Dict[str, Any], str]:
         """
         Creates a chat completion using the specified parameters and returns the
@@ -127,6 +248,11 @@ class OpenAIHelper:
          - images : A list of local image paths. These images will be encoded to
            base64 and included in the chat completion request.
 
+         - image_detail: The detail level ("low", "high" or "auto") the model
+           uses for the images. It is sent with each image, and the helper's
+           `ImageEncoder` scales the images down to the largest size the API
+           uses at that level. Defaults to the encoder's setting.
+
          - system_message: An optional system message to include in the chat
            completion request. Defaults to None.
 
@@ -143,6 +269,8 @@ class OpenAIHelper:
            as they become available, with the stream terminated by a `data:
            [DONE]` message. [Example Python
            code](https://cookbook.openai.com/examples/how_to_stream_completions).
+           This method collects the deltas and returns the complete response;
+           use `stream_chat_completion()` to receive them as they arrive.
 
          - frequency_penalty: Number between -2.0 and 2.0. Positive values
            penalize new tokens based on their existing frequency in the text so
@@ -243,6 +371,22 @@ class OpenAIHelper:
          - timeout: Override the client-level default timeout for this request,
            in seconds
 
+         - truncation: What to do with a prompt that doesn't fit into the
+           model's context window together with `max_tokens`. "end" cuts the
+           end of the prompt, "start" cuts its beginning and "middle" keeps
+           both ends. If None, `max_tokens` is lowered to the space that is
+           left, and a ValueError is raised before anything is sent if the
+           prompt alone is too long.
+
+         - cache: How this call uses the helper's `ResponseCache`. "read" returns
+           a cached response if there is one and stores new responses, "write"
+           always calls the API and stores (refreshes) the response, and "off"
+           bypasses the cache. Defaults to "read" when the helper has a cache.
+           Streaming requests are never cached.
+
+         - request_policy: Overrides the helper's `RequestPolicy` (timeouts,
+           deadline, retries and hedging) for this call.
+
         Returns
         -------
         dict or str
@@ -250,27 +394,754 @@ class OpenAIHelper:
             is True, otherwise returns a string.
         """
         log.fine("OpenAIHelper.create_chat_completion")
-        completion_params = {
-            "messages": None,
-            "model": model,
-            "stream": stream,
-            "frequency_penalty": frequency_penalty,
-            "logit_bias": logit_bias,
-            "logprobs": logprobs,
-            "max_tokens": max_tokens,
-            "n": n,
-            "presence_penalty": presence_penalty,
-            "response_format": response_format,
-            "seed": seed,
-            "stop": stop,
-            "temperature": temperature,
-            "tool_choice": tool_choice,
-            "tools": tools,
-            "top_logprobs": top_logprobs,
-            "top_p": top_p,
-            "user": user,
-        }
-        # Create the messages
+        completion_params = self.build_completion_params(
+            prompt=prompt,
+            images=images,
+            image_detail=image_detail,
+            system_message=system_message,
+            model=model,
+            stream=stream,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+            frequency_penalty=frequency_penalty,
+            logit_bias=logit_bias,
+            logprobs=logprobs,
+            presence_penalty=presence_penalty,
+            response_format=response_format,
+            seed=seed,
+            stop=stop,
+            tool_choice=tool_choice,
+            tools=tools,
+            top_logprobs=top_logprobs,
+            top_p=top_p,
+            user=user,
+            truncation=truncation,
+        )
+
+        cache_mode = self.resolve_cache_mode(cache, completion_params)
+        if cache_mode == "read":
+            cached_content = self.cache.get(completion_params)
+            if cached_content is not None:
+                return self.parse_content(cached_content, json_mode)
+
+        response = self.send_completion_request(completion_params, request_policy)
+
+        if stream:
+            content = "".join(self.iter_stream_deltas(response))
+            return self.parse_content(content, json_mode)
+        if cache_mode != "off":
+            self.store_in_cache(completion_params, response)
+        return self.parse_response_content(response, json_mode)
+
+    async def acreate_chat_completion(
+        self,
+        prompt: str,
+        images: Optional[
+            Annotated[List[str], "The list of image paths you want to pass in"]
+        ] = None,
+        image_detail: Optional[Literal["auto", "low", "high"]] = None,
+        system_message: Optional[
+            Annotated[
+                str,
+                "The system message you want to pass in.",
+            ]
+        ] = None,
+        model: Union[str, ChatModel] = "gpt-4-turbo",
+        stream: bool = False,
+        json_mode: bool = False,
+        max_tokens: Optional[int] | None = 4000,
+        temperature: Optional[float] | None = 0,
+        n: Optional[int] | None = 1,
+        frequency_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        logit_bias: Optional[Dict[str, int]] | NotGiven = NOT_GIVEN,
+        logprobs: Optional[bool] | NotGiven = NOT_GIVEN,
+        presence_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        response_format: ResponseFormat | NotGiven = NOT_GIVEN,
+        seed: Optional[int] | NotGiven = NOT_GIVEN,
+        stop: Union[Optional[str], List[str]] | NotGiven = NOT_GIVEN,
+        tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
+        tools: Iterable[ChatCompletionToolParam] | NotGiven = NOT_GIVEN,
+        top_logprobs: Optional[int] | NotGiven = NOT_GIVEN,
+        top_p: Optional[float] | NotGiven = NOT_GIVEN,
+        user: str | NotGiven = NOT_GIVEN,
+        truncation: Optional[Literal["start", "end", "middle"]] = None,
+        cache: Optional[Literal["read", "write", "off"]] = None,
+        request_policy: Optional[RequestPolicy] = None,
+    ) -> Union[Dict[str, Any], str]:
+        """
+        The asynchronous version of `create_chat_completion()`. It accepts the
+        same parameters and builds the request the same way, but sends it with
+        an `AsyncOpenAI` client so many completions can be awaited at once.
+
+        Returns
+        -------
+        dict or str
+            The response from the OpenAI API. Returns a dictionary if json_mode
+            is True, otherwise returns a string.
+        """
+        log.fine("OpenAIHelper.acreate_chat_completion")
+        completion_params = self.build_completion_params(
+            prompt=prompt,
+            images=images,
+            image_detail=image_detail,
+            system_message=system_message,
+            model=model,
+            stream=stream,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+            frequency_penalty=frequency_penalty,
+            logit_bias=logit_bias,
+            logprobs=logprobs,
+            presence_penalty=presence_penalty,
+            response_format=response_format,
+            seed=seed,
+            stop=stop,
+            tool_choice=tool_choice,
+            tools=tools,
+            top_logprobs=top_logprobs,
+            top_p=top_p,
+            user=user,
+            truncation=truncation,
+        )
+
+        cache_mode = self.resolve_cache_mode(cache, completion_params)
+        if cache_mode == "read":
+            cached_content = self.cache.get(completion_params)
+            if cached_content is not None:
+                return self.parse_content(cached_content, json_mode)
+
+        response = await self.asend_completion_request(
+            completion_params, request_policy
+        )
+
+        if stream:
+            content = "".join(
+                [delta async for delta in self.aiter_stream_deltas(response)]
+            )
+            return self.parse_content(content, json_mode)
+        if cache_mode != "off":
+            self.store_in_cache(completion_params, response)
+        return self.parse_response_content(response, json_mode)
+
+    async def acreate_chat_completions_batch(
+        self,
+        prompts: Annotated[
+            List[Union[str, Dict[str, Any]]],
+            "A list of prompts, or of dicts of per-item create_chat_completion arguments",
+        ],
+        max_concurrency: int = 10,
+        **kwargs,
+    ) -> List[Union[Dict[str, Any], str, Exception]]:
+        """
+        Runs `acreate_chat_completion()` for every item in `prompts`, with at
+        most `max_concurrency` requests in flight at any time.
+
+        Args:
+            prompts (list): Each item is either a prompt string or a dict of
+            arguments for `acreate_chat_completion()` (e.g. `{"prompt": ...,
+            "images": [...]}`). Per-item arguments override `kwargs`.
+
+            max_concurrency (int, optional): The maximum number of requests
+            that are sent at the same time. Defaults to 10.
+
+            **kwargs: Arguments shared by every item, such as `model`,
+            `system_message` or `json_mode`.
+
+        Returns:
+            list: The results in the same order as `prompts`. A failed item
+            holds the exception it raised instead of a result; the other items
+            are not cancelled.
+        """
+        log.fine("OpenAIHelper.acreate_chat_completions_batch")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1.")
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_item(item: Union[str, Dict[str, Any]]):
+            item_kwargs = dict(kwargs)
+            if isinstance(item, dict):
+                item_kwargs.update(item)
+            else:
+                item_kwargs["prompt"] = item
+            async with semaphore:
+                return await self.acreate_chat_completion(**item_kwargs)
+
+        results = await asyncio.gather(
+            *(run_item(item) for item in prompts), return_exceptions=True
+        )
+        failures = sum(1 for result in results if isinstance(result, Exception))
+        if failures:
+            log.warning(
+                f"{failures} of {len(results)} chat completions in the batch failed."
+            )
+        return results
+
+    def create_chat_completions_batch(
+        self,
+        prompts: Annotated[
+            List[Union[str, Dict[str, Any]]],
+            "A list of prompts, or of dicts of per-item create_chat_completion arguments",
+        ],
+        max_concurrency: int = 10,
+        **kwargs,
+    ) -> List[Union[Dict[str, Any], str, Exception]]:
+        """
+        Synchronous entry point for `acreate_chat_completions_batch()`. It runs
+        the batch on a new event loop and blocks until every item is done, so
+        it can't be called from code that is already running inside an event
+        loop. Use `await acreate_chat_completions_batch()` there instead.
+
+        Returns:
+            list: The results in the same order as `prompts`. A failed item
+            holds the exception it raised instead of a result.
+        """
+        log.fine("OpenAIHelper.create_chat_completions_batch")
+
+        async def run_batch():
+            try:
+                return await self.acreate_chat_completions_batch(
+                    prompts, max_concurrency=max_concurrency, **kwargs
+                )
+            finally:
+                # The async client's connections belong to this event loop, so
+                # they can't be reused once asyncio.run() closes it.
+                if self.share_client:
+                    await close_async_clients()
+                elif self.async_client is not None:
+                    await self.async_client.close()
+                    self.async_client = None
+
+        return asyncio.run(run_batch())
+
+    def continue_conversation(
+        self,
+        conversation: Annotated[
+            Conversation, "The conversation to continue. It is updated in place."
+        ],
+        prompt: Optional[str] = None,
+        images: Optional[List[str]] = None,
+        image_detail: Optional[Literal["low", "high", "auto"]] = None,
+        model: Optional[Union[str, ChatModel]] = None,
+        json_mode: bool = False,
+        max_tokens: Optional[int] | None = 4000,
+        temperature: Optional[float] | None = 0,
+        seed: Optional[int] | NotGiven = NOT_GIVEN,
+        stop: Union[Optional[str], List[str]] | NotGiven = NOT_GIVEN,
+        tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
+        tools: Iterable[ChatCompletionToolParam] | NotGiven = NOT_GIVEN,
+        top_p: Optional[float] | NotGiven = NOT_GIVEN,
+        user: str | NotGiven = NOT_GIVEN,
+        cache: Optional[Literal["read", "write", "off"]] = None,
+        request_policy: Optional[RequestPolicy] = None,
+    ):
+        """
+        Adds `prompt` (and `images`) to `conversation` as a user message, sends
+        the conversation and adds the reply as an assistant message. Returns the
+        reply like `create_chat_completion()` does.
+
+        The history is trimmed first if the request wouldn't fit the model's
+        context window. Without a prompt, the conversation is sent as it is,
+        e.g. after adding tool results with `conversation.add_tool_message()`.
+
+        Args:
+            model (str, optional): Defaults to the conversation's model.
+
+            The other parameters are the same as `create_chat_completion()`.
+        """
+        log.fine("OpenAIHelper.continue_conversation")
+        model = model or conversation.model
+        if prompt is not None:
+            conversation.add_user_message(
+                self.build_user_content(prompt, images, image_detail)
+            )
+        conversation.trim(
+            self.conversation_token_budget(conversation, model, max_tokens)
+        )
+        completion_params = self.build_completion_params(
+            prompt=None,
+            model=model,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            seed=seed,
+            stop=stop,
+            tool_choice=tool_choice,
+            tools=tools,
+            top_p=top_p,
+            user=user,
+            messages=conversation.messages(),
+            prompt_tokens=conversation.prompt_tokens(model),
+        )
+
+        cache_mode = self.resolve_cache_mode(cache, completion_params)
+        if cache_mode == "read":
+            cached_content = self.cache.get(completion_params)
+            if cached_content is not None:
+                conversation.add_assistant_message(cached_content)
+                return self.parse_content(cached_content, json_mode)
+
+        response = self.send_completion_request(completion_params, request_policy)
+        if cache_mode != "off":
+            self.store_in_cache(completion_params, response)
+        self.add_reply_to_conversation(conversation, response)
+        return self.parse_response_content(response, json_mode)
+
+    async def acontinue_conversation(
+        self,
+        conversation: Conversation,
+        prompt: Optional[str] = None,
+        images: Optional[List[str]] = None,
+        image_detail: Optional[Literal["low", "high", "auto"]] = None,
+        model: Optional[Union[str, ChatModel]] = None,
+        json_mode: bool = False,
+        max_tokens: Optional[int] | None = 4000,
+        temperature: Optional[float] | None = 0,
+        seed: Optional[int] | NotGiven = NOT_GIVEN,
+        stop: Union[Optional[str], List[str]] | NotGiven = NOT_GIVEN,
+        tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
+        tools: Iterable[ChatCompletionToolParam] | NotGiven = NOT_GIVEN,
+        top_p: Optional[float] | NotGiven = NOT_GIVEN,
+        user: str | NotGiven = NOT_GIVEN,
+        cache: Optional[Literal["read", "write", "off"]] = None,
+        request_policy: Optional[RequestPolicy] = None,
+    ):
+        """
+        The asynchronous version of `continue_conversation()`. Adding and
+        trimming messages runs in a worker thread, so a summarizer that calls
+        the API doesn't block the event loop.
+        """
+        log.fine("OpenAIHelper.acontinue_conversation")
+        model = model or conversation.model
+        if prompt is not None:
+            await asyncio.to_thread(
+                conversation.add_user_message,
+                self.build_user_content(prompt, images, image_detail),
+            )
+        await asyncio.to_thread(
+            conversation.trim,
+            self.conversation_token_budget(conversation, model, max_tokens),
+        )
+        completion_params = self.build_completion_params(
+            prompt=None,
+            model=model,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            seed=seed,
+            stop=stop,
+            tool_choice=tool_choice,
+            tools=tools,
+            top_p=top_p,
+            user=user,
+            messages=conversation.messages(),
+            prompt_tokens=conversation.prompt_tokens(model),
+        )
+
+        cache_mode = self.resolve_cache_mode(cache, completion_params)
+        if cache_mode == "read":
+            cached_content = self.cache.get(completion_params)
+            if cached_content is not None:
+                await asyncio.to_thread(
+                    conversation.add_assistant_message, cached_content
+                )
+                return self.parse_content(cached_content, json_mode)
+
+        response = await self.asend_completion_request(
+            completion_params, request_policy
+        )
+        if cache_mode != "off":
+            self.store_in_cache(completion_params, response)
+        await asyncio.to_thread(self.add_reply_to_conversation, conversation, response)
+        return self.parse_response_content(response, json_mode)
+
+    def conversation_token_budget(
+        self, conversation: Conversation, model: str, max_tokens: Optional[int]
+    ) -> int:
+        """
+        Returns the number of tokens the history of `conversation` may use so
+        the request still fits the context window of `model`.
+        """
+        return (
+            self.token_counter.context_window(model)
+            - REPLY_PRIMING_TOKENS
+            - conversation.prefix_tokens
+            - (max_tokens or 0)
+        )
+
+    @staticmethod
+    def add_reply_to_conversation(conversation: Conversation, response: Any):
+        message = response.choices[0].message
+        tool_calls = None
+        if message.tool_calls:
+            tool_calls = [tool_call.model_dump() for tool_call in message.tool_calls]
+        conversation.add_assistant_message(message.content, tool_calls)
+
+    def summarize_messages(
+        self,
+        messages: List[Dict[str, Any]],
+        model: Union[str, ChatModel] = "gpt-3.5-turbo",
+        max_tokens: int = 500,
+    ) -> str:
+        """
+        Condenses a list of chat messages into a short summary. Pass it as the
+        `summarizer` of a `Conversation` that uses the "summarize" trimming
+        strategy.
+        """
+        log.fine("OpenAIHelper.summarize_messages")
+        lines = []
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, list):
+                content = " ".join(
+                    part["text"] for part in content if part.get("type") == "text"
+                )
+            for tool_call in message.get("tool_calls") or []:
+                function = tool_call.get("function") or {}
+                content = f"{content or ''} [called {function.get('name')}({function.get('arguments')})]"
+            lines.append(f"{message['role']}: {content}")
+        return self.create_chat_completion(
+            prompt="\n\n".join(lines),
+            system_message=SUMMARIZE_SYSTEM_MESSAGE,
+            model=model,
+            max_tokens=max_tokens,
+            truncation="middle",
+            cache="off",
+        )
+
+    def stream_chat_completion(
+        self,
+        prompt: str,
+        images: Optional[
+            Annotated[List[str], "The list of image paths you want to pass in"]
+        ] = None,
+        image_detail: Optional[Literal["auto", "low", "high"]] = None,
+        system_message: Optional[
+            Annotated[
+                str,
+                "The system message you want to pass in.",
+            ]
+        ] = None,
+        model: Union[str, ChatModel] = "gpt-4-turbo",
+        json_mode: bool = False,
+        max_tokens: Optional[int] | None = 4000,
+        temperature: Optional[float] | None = 0,
+        n: Optional[int] | None = 1,
+        frequency_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        logit_bias: Optional[Dict[str, int]] | NotGiven = NOT_GIVEN,
+        logprobs: Optional[bool] | NotGiven = NOT_GIVEN,
+        presence_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        response_format: ResponseFormat | NotGiven = NOT_GIVEN,
+        seed: Optional[int] | NotGiven = NOT_GIVEN,
+        stop: Union[Optional[str], List[str]] | NotGiven = NOT_GIVEN,
+        tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
+        tools: Iterable[ChatCompletionToolParam] | NotGiven = NOT_GIVEN,
+        top_logprobs: Optional[int] | NotGiven = NOT_GIVEN,
+        top_p: Optional[float] | NotGiven = NOT_GIVEN,
+        user: str | NotGiven = NOT_GIVEN,
+        truncation: Optional[Literal["start", "end", "middle"]] = None,
+        request_policy: Optional[RequestPolicy] = None,
+    ) -> Iterator[Union[str, Tuple[Union[str, int], Any]]]:
+        """
+        Streams a chat completion and yields the response while it is being
+        generated, so the first words can be shown (or processed) long before
+        the whole response is done. The parameters are the same as
+        `create_chat_completion()`.
+
+        If json_mode is False, the text deltas of the first choice are yielded
+        as they arrive. If json_mode is True, the response is parsed
+        incrementally and each top-level member is yielded as soon as it is
+        complete: `(key, value)` for a JSON object and `(index, item)` for a
+        JSON array.
+
+        Raises:
+            ValueError: If json_mode is True and the streamed JSON is cut off
+            or isn't an object or array.
+        """
+        log.fine("OpenAIHelper.stream_chat_completion")
+        completion_params = self.build_completion_params(
+            prompt=prompt,
+            images=images,
+            image_detail=image_detail,
+            system_message=system_message,
+            model=model,
+            stream=True,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+            frequency_penalty=frequency_penalty,
+            logit_bias=logit_bias,
+            logprobs=logprobs,
+            presence_penalty=presence_penalty,
+            response_format=response_format,
+            seed=seed,
+            stop=stop,
+            tool_choice=tool_choice,
+            tools=tools,
+            top_logprobs=top_logprobs,
+            top_p=top_p,
+            user=user,
+            truncation=truncation,
+        )
+
+        stream = self.send_completion_request(completion_params, request_policy)
+        parser = IncrementalJSONParser() if json_mode else None
+        try:
+            for delta in self.iter_stream_deltas(stream):
+                if parser is None:
+                    yield delta
+                else:
+                    yield from parser.feed(delta)
+        finally:
+            # Stops the download if the caller breaks out early
+            stream.response.close()
+        if parser is not None:
+            parser.close()
+
+    async def astream_chat_completion(
+        self,
+        prompt: str,
+        images: Optional[
+            Annotated[List[str], "The list of image paths you want to pass in"]
+        ] = None,
+        image_detail: Optional[Literal["auto", "low", "high"]] = None,
+        system_message: Optional[
+            Annotated[
+                str,
+                "The system message you want to pass in.",
+            ]
+        ] = None,
+        model: Union[str, ChatModel] = "gpt-4-turbo",
+        json_mode: bool = False,
+        max_tokens: Optional[int] | None = 4000,
+        temperature: Optional[float] | None = 0,
+        n: Optional[int] | None = 1,
+        frequency_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        logit_bias: Optional[Dict[str, int]] | NotGiven = NOT_GIVEN,
+        logprobs: Optional[bool] | NotGiven = NOT_GIVEN,
+        presence_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        response_format: ResponseFormat | NotGiven = NOT_GIVEN,
+        seed: Optional[int] | NotGiven = NOT_GIVEN,
+        stop: Union[Optional[str], List[str]] | NotGiven = NOT_GIVEN,
+        tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
+        tools: Iterable[ChatCompletionToolParam] | NotGiven = NOT_GIVEN,
+        top_logprobs: Optional[int] | NotGiven = NOT_GIVEN,
+        top_p: Optional[float] | NotGiven = NOT_GIVEN,
+        user: str | NotGiven = NOT_GIVEN,
+        truncation: Optional[Literal["start", "end", "middle"]] = None,
+        request_policy: Optional[RequestPolicy] = None,
+    ) -> AsyncIterator[Union[str, Tuple[Union[str, int], Any]]]:
+        """
+        The asynchronous version of `stream_chat_completion()`. Use it with
+        `async for`.
+        """
+        log.fine("OpenAIHelper.astream_chat_completion")
+        completion_params = self.build_completion_params(
+            prompt=prompt,
+            images=images,
+            image_detail=image_detail,
+            system_message=system_message,
+            model=model,
+            stream=True,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            n=n,
+            frequency_penalty=frequency_penalty,
+            logit_bias=logit_bias,
+            logprobs=logprobs,
+            presence_penalty=presence_penalty,
+            response_format=response_format,
+            seed=seed,
+            stop=stop,
+            tool_choice=tool_choice,
+            tools=tools,
+            top_logprobs=top_logprobs,
+            top_p=top_p,
+            user=user,
+            truncation=truncation,
+        )
+
+        stream = await self.asend_completion_request(completion_params, request_policy)
+        parser = IncrementalJSONParser() if json_mode else None
+        try:
+            async for delta in self.aiter_stream_deltas(stream):
+                if parser is None:
+                    yield delta
+                else:
+                    for member in parser.feed(delta):
+                        yield member
+        finally:
+            await stream.response.aclose()
+        if parser is not None:
+            parser.close()
+
+    @staticmethod
+    def iter_stream_deltas(stream: Any) -> Iterator[str]:
+        """
+        Yields the text deltas of the first choice of a streamed response.
+        """
+        for chunk in stream:
+            for choice in chunk.choices:
+                if choice.index == 0 and choice.delta.content:
+                    yield choice.delta.content
+
+    @staticmethod
+    async def aiter_stream_deltas(stream: Any) -> AsyncIterator[str]:
+        async for chunk in stream:
+            for choice in chunk.choices:
+                if choice.index == 0 and choice.delta.content:
+                    yield choice.delta.content
+
+    def resolve_cache_mode(
+        self, cache: Optional[str], completion_params: Dict[str, Any]
+    ) -> str:
+        """
+        Returns the cache mode ("read", "write" or "off") for a request from the
+        per-call override and the helper's cache.
+        """
+        if cache is not None and cache not in CACHE_MODES:
+            raise ValueError(f"cache must be one of {CACHE_MODES}, got {cache!r}.")
+        if self.cache is None or completion_params.get("stream"):
+            return "off"
+        return cache or "read"
+
+    def store_in_cache(self, completion_params: Dict[str, Any], response: Any):
+        content = response.choices[0].message.content
+        # Tool calls have no content to replay
+        if content is not None:
+            self.cache.set(completion_params, content)
+
+    def send_completion_request(
+        self,
+        completion_params: Dict[str, Any],
+        request_policy: Optional[RequestPolicy] = None,
+    ) -> Any:
+        """
+        Sends a prepared request to the chat completions endpoint and returns the
+        parsed response. With a `RequestPolicy` (the given one or the helper's),
+        the policy makes the attempts with the SDK's own retries turned off.
+        """
+        policy = request_policy or self.request_policy
+        if policy is None:
+            return self.send_completion_attempt(self.client, completion_params)
+        return policy.call(
+            lambda timeout: self.send_completion_attempt(
+                self.client.with_options(
+                    max_retries=0, timeout=NOT_GIVEN if timeout is None else timeout
+                ),
+                completion_params,
+            ),
+            hedgeable=not completion_params.get("stream"),
+        )
+
+    def send_completion_attempt(
+        self, client: OpenAI, completion_params: Dict[str, Any]
+    ) -> Any:
+        """
+        Sends one request. If the helper has a rate limiter, the request waits
+        for its budget first and the limiter is updated from the response.
+        """
+        if self.rate_limiter is None:
+            return client.chat.completions.create(**completion_params)
+
+        reserved_tokens = self.rate_limiter.acquire(
+            self.token_counter.estimate_request_tokens(completion_params)
+        )
+        try:
+            raw_response = client.chat.completions.with_raw_response.create(
+                **completion_params
+            )
+        except APIStatusError as e:
+            self.rate_limiter.update_from_response(reserved_tokens, e.response.headers)
+            raise
+        response: Any = raw_response.parse()
+        self.rate_limiter.update_from_response(
+            reserved_tokens, raw_response.headers, getattr(response, "usage", None)
+        )
+        return response
+
+    async def asend_completion_request(
+        self,
+        completion_params: Dict[str, Any],
+        request_policy: Optional[RequestPolicy] = None,
+    ) -> Any:
+        """
+        The asynchronous version of `send_completion_request()`.
+        """
+        client = self.get_async_client()
+        policy = request_policy or self.request_policy
+        if policy is None:
+            return await self.asend_completion_attempt(client, completion_params)
+        return await policy.acall(
+            lambda timeout: self.asend_completion_attempt(
+                client.with_options(
+                    max_retries=0, timeout=NOT_GIVEN if timeout is None else timeout
+                ),
+                completion_params,
+            ),
+            hedgeable=not completion_params.get("stream"),
+        )
+
+    async def asend_completion_attempt(
+        self, client: AsyncOpenAI, completion_params: Dict[str, Any]
+    ) -> Any:
+        if self.rate_limiter is None:
+            return await client.chat.completions.create(**completion_params)
+
+        reserved_tokens = await self.rate_limiter.acquire_async(
+            self.token_counter.estimate_request_tokens(completion_params)
+        )
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(
+                **completion_params
+            )
+        except APIStatusError as e:
+            self.rate_limiter.update_from_response(reserved_tokens, e.response.headers)
+            raise
+        response: Any = raw_response.parse()
+        self.rate_limiter.update_from_response(
+            reserved_tokens, raw_response.headers, getattr(response, "usage", None)
+        )
+        return response
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """
+        Returns the `AsyncOpenAI` client used by the async methods. With
+        share_client, this is the client shared by everything on the current
+        event loop; otherwise the helper creates its own on first use.
+        """
+        if self.share_client:
+            return get_async_openai_client(
+                self.api_key, self.organization, self.base_url, self.http_options
+            )
+        if self.async_client is None:
+            self.async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                organization=self.organization,
+                base_url=self.base_url,
+                http_client=DefaultAsyncHttpxClient(
+                    **build_http_client_kwargs(resolve_http_options(self.http_options))
+                ),
+            )
+        return self.async_client
+
+    def build_messages(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        system_message: Optional[str] = None,
+        image_detail: Optional[str] = None,
+    ) -> List[ChatCompletionMessageParam]:
+        """
+        Builds the message list for a chat completion from a prompt, an optional
+        system message and optional local image paths. The images are encoded
+        by the helper's `ImageEncoder` and added to the user message.
+        """
         messages: List[ChatCompletionMessageParam] = []
         if system_message:
             system_message_param = ChatCompletionSystemMessageParam(
@@ -278,6 +1149,25 @@ class OpenAIHelper:
             )
             messages.append(system_message_param)
 
+        # Create the user message
+        user_message_param: ChatCompletionUserMessageParam = {
+            "role": "user",
+            "content": self.build_user_content(prompt, images, image_detail),
+        }
+
+        messages.append(user_message_param)
+        return messages
+
+    def build_user_content(
+        self,
+        prompt: str,
+        images: Optional[List[str]] = None,
+        image_detail: Optional[str] = None,
+    ) -> List[ChatCompletionContentPartParam]:
+        """
+        Builds the content parts of a user message: the prompt text followed by
+        the encoded images.
+        """
         user_message_content: List[ChatCompletionContentPartParam] = []
 
         text_param: ChatCompletionContentPartTextParam = {
@@ -288,27 +1178,85 @@ class OpenAIHelper:
         user_message_content.append(text_param)
 
         if images:
-            for image in images:
-                image_base64 = self.encode_image(image)
+            encoded_images = self.image_encoder.encode_many(images, image_detail)
+            detail = image_detail or self.image_encoder.detail
+            for mime_type, image_base64 in encoded_images:
                 image_url: ImageURL = {
-                    "url": f"data:image/jpeg;base64,{image_base64}",
-                    # Optionally specify "detail" if needed, e.g., "detail": "high"
+                    "url": f"data:{mime_type};base64,{image_base64}",
                 }
+                if detail:
+                    image_url["detail"] = detail
                 image_param: ChatCompletionContentPartImageParam = {
                     "type": "image_url",
                     "image_url": image_url,
                 }
                 user_message_content.append(image_param)
+        return user_message_content
 
-        # Create the user message
-        user_message_param: ChatCompletionUserMessageParam = {
-            "role": "user",
-            "content": user_message_content,
-        }
-
-        messages.append(user_message_param)
+    def build_completion_params(
+        self,
+        prompt: Optional[str],
+        images: Optional[List[str]] = None,
+        image_detail: Optional[str] = None,
+        system_message: Optional[str] = None,
+        model: Union[str, ChatModel] = "gpt-4-turbo",
+        stream: bool = False,
+        json_mode: bool = False,
+        max_tokens: Optional[int] | None = 4000,
+        temperature: Optional[float] | None = 0,
+        n: Optional[int] | None = 1,
+        frequency_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        logit_bias: Optional[Dict[str, int]] | NotGiven = NOT_GIVEN,
+        logprobs: Optional[bool] | NotGiven = NOT_GIVEN,
+        presence_penalty: Optional[float] | NotGiven = NOT_GIVEN,
+        response_format: ResponseFormat | NotGiven = NOT_GIVEN,
+        seed: Optional[int] | NotGiven = NOT_GIVEN,
+        stop: Union[Optional[str], List[str]] | NotGiven = NOT_GIVEN,
+        tool_choice: ChatCompletionToolChoiceOptionParam | NotGiven = NOT_GIVEN,
+        tools: Iterable[ChatCompletionToolParam] | NotGiven = NOT_GIVEN,
+        top_logprobs: Optional[int] | NotGiven = NOT_GIVEN,
+        top_p: Optional[float] | NotGiven = NOT_GIVEN,
+        user: str | NotGiven = NOT_GIVEN,
+        truncation: Optional[str] = None,
+        messages: Optional[List[ChatCompletionMessageParam]] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Builds the keyword arguments for `client.chat.completions.create()`.
+        The parameters are the same as `create_chat_completion()`. Values that
+        are None or NOT_GIVEN are left out of the returned dict. If `messages`
+        is given, it is sent instead of the messages built from `prompt`,
+        `images` and `system_message`. `prompt_tokens` is their token count if
+        it is already known, e.g. from `Conversation.prompt_tokens()`.
 
-        completion_params["messages"] = messages
+        The prompt is checked against the model's context window here, so an
+        oversized prompt is truncated or rejected without a network round trip.
+        """
+        if messages is None:
+            messages = self.build_messages(prompt, images, system_message, image_detail)
+        max_tokens = self.fit_to_context_window(
+            messages, model, max_tokens, truncation, prompt_tokens
+        )
+        completion_params = {
+            "messages": messages,
+            "model": model,
+            "stream": stream,
+            "frequency_penalty": frequency_penalty,
+            "logit_bias": logit_bias,
+            "logprobs": logprobs,
+            "max_tokens": max_tokens,
+            "n": n,
+            "presence_penalty": presence_penalty,
+            "response_format": response_format,
+            "seed": seed,
+            "stop": stop,
+            "temperature": temperature,
+            "tool_choice": tool_choice,
+            "tools": tools,
+            "top_logprobs": top_logprobs,
+            "top_p": top_p,
+            "user": user,
+        }
 
         # If json_mode is enabled, adjust the response_format accordingly
         if json_mode:
@@ -323,10 +1271,118 @@ class OpenAIHelper:
         completion_params = {
             k: v for k, v in completion_params.items() if v is not NOT_GIVEN
         }
+        return completion_params
 
-        response: Any = self.client.chat.completions.create(**completion_params)
+    def fit_to_context_window(
+        self,
+        messages: List[ChatCompletionMessageParam],
+        model: str,
+        max_tokens: Optional[int],
+        truncation: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+    ) -> Optional[int]:
+        """
+        Makes sure the prompt and `max_tokens` fit into the model's context
+        window. Every one of the `n` choices gets its own `max_tokens`, so `n`
+        doesn't change the check. With a truncation strategy, the text of the
+        last message (a string or its first text part) is shortened in place;
+        otherwise `max_tokens` is lowered. Returns the
+        `max_tokens` to send. The messages are only counted if `prompt_tokens`
+        isn't given.
 
-        content = response.choices[0].message.content
+        Raises:
+            ValueError: If the prompt alone doesn't fit and no truncation
+            strategy is given.
+        """
+        if truncation is not None and truncation not in TRUNCATION_STRATEGIES:
+            raise ValueError(
+                f"truncation must be one of {TRUNCATION_STRATEGIES}, got {truncation!r}."
+            )
+        context_window = self.token_counter.context_window(model)
+        if prompt_tokens is None:
+            prompt_tokens = self.token_counter.count_messages(messages, model)
+        reserved_tokens = max_tokens or 0
+        if prompt_tokens + reserved_tokens <= context_window:
+            return max_tokens
+
+        message = messages[-1] if messages else {}
+        content = message.get("content")
+        # The text part of list content, e.g. after images
+        text_part = None
+        if isinstance(content, list):
+            text_part = next(
+                (part for part in content if part.get("type") == "text"), None
+            )
+        text = text_part["text"] if text_part is not None else content
+        if truncation is not None and isinstance(text, str):
+            text_tokens = self.token_counter.count_text(text, model)
+            available_tokens = (
+                context_window - reserved_tokens - (prompt_tokens - text_tokens)
+            )
+            if available_tokens > 0:
+                text = self.token_counter.truncate(
+                    text, available_tokens, model, truncation
+                )
+                if text_part is not None:
+                    text_part["text"] = text
+                else:
+                    message["content"] = text
+                log.info(
+                    f"The prompt was truncated from {text_tokens} to {available_tokens} tokens to fit the context window of {model}."
+                )
+                return max_tokens
+
+        if prompt_tokens < context_window:
+            log.warning(
+                f"The prompt ({prompt_tokens} tokens) and max_tokens ({max_tokens}) don't fit the context window of {model} ({context_window} tokens). max_tokens was lowered to {context_window - prompt_tokens}."
+            )
+            return context_window - prompt_tokens
+        raise ValueError(
+            f"The prompt has {prompt_tokens} tokens, which is more than the context window of {model} ({context_window} tokens). Shorten it, pass a `truncation` strategy or split it with `split_prompt()`."
+        )
+
+    def split_prompt(
+        self,
+        prompt: str,
+        model: Union[str, ChatModel] = "gpt-4-turbo",
+        system_message: Optional[str] = None,
+        max_tokens: int = 4000,
+        max_prompt_tokens: Optional[int] = None,
+        overlap: int = 0,
+    ) -> List[str]:
+        """
+        Splits a long prompt into parts that each fit into the model's context
+        window together with the system message and `max_tokens`. The parts
+        can be sent with `create_chat_completions_batch()`.
+
+        Args:
+            max_prompt_tokens (int, optional): A smaller limit for each part,
+            e.g. to keep requests fast. Defaults to all the space that is left.
+
+            overlap (int, optional): The number of tokens consecutive parts
+            share. Defaults to 0.
+
+        Returns:
+            list: The parts of the prompt in order.
+        """
+        overhead_tokens = self.token_counter.count_messages(
+            self.build_messages("", system_message=system_message), model
+        )
+        available_tokens = (
+            self.token_counter.context_window(model) - max_tokens - overhead_tokens
+        )
+        if max_prompt_tokens is not None:
+            available_tokens = min(available_tokens, max_prompt_tokens)
+        return self.token_counter.split(prompt, available_tokens, model, overlap)
+
+    @staticmethod
+    def parse_response_content(response: Any, json_mode: bool = False):
+        return OpenAIHelper.parse_content(
+            response.choices[0].message.content, json_mode
+        )
+
+    @staticmethod
+    def parse_content(content: Optional[str], json_mode: bool = False):
         if json_mode:
             content = json.loads(content)
 
@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from typing import Any, Mapping, Optional
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+
+# Matches the durations OpenAI sends in the x-ratelimit-reset-* headers, e.g.
+# "1s", "6m0s", "20ms" or "1h2m3.5s".
+RESET_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+RESET_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Converts an x-ratelimit-reset-* header value into seconds. Returns None if
+    the value is missing or can't be parsed.
+    """
+    if not value:
+        return None
+    matches = RESET_DURATION_PATTERN.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * RESET_DURATION_UNITS[unit] for amount, unit in matches)
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously up to `capacity`.
+
+    Callers reserve an amount up front and the level is allowed to go below
+    zero. The returned wait is how long the caller has to sleep before its
+    reservation is covered by the refill, so callers are served in the order
+    they asked and one large request can't be starved by many small ones.
+    Not thread-safe on its own; `RateLimiter` guards it with a lock.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.level = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.level = min(
+                self.capacity, self.level + elapsed * self.refill_per_second
+            )
+        self.updated_at = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self.refill(now)
+        self.level -= amount
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.refill_per_second
+
+    def give_back(self, amount: float, now: float):
+        self.refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def set_capacity(self, capacity: float, now: float):
+        self.refill(now)
+        self.capacity = float(capacity)
+        self.refill_per_second = self.capacity / 60.0
+        self.level = min(self.level, self.capacity)
+
+
+class RateLimiter:
+    """
+    A client-side limiter for OpenAI requests-per-minute and tokens-per-minute
+    limits.
+
+    Every request reserves one request and its estimated token cost (the prompt
+    tokens counted by the helper's `TokenCounter` plus `max_tokens * n`) before
+    it is sent, and waits locally until both budgets allow it. This keeps many
+    workers under the account limits instead of letting them hit 429s and back
+    off. One instance can be shared by any number of `OpenAIHelper` objects,
+    threads and asyncio tasks in the same process.
+
+    Args:
+        requests_per_minute (int, optional): The RPM limit of your account for
+        the model. None disables the request budget.
+
+        tokens_per_minute (int, optional): The TPM limit of your account for the
+        model. None disables the token budget.
+
+        use_response_headers (bool, optional): If True, the `x-ratelimit-*`
+        headers of each response are used to correct the budgets, e.g. when
+        other processes share the same API key. Defaults to True.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        use_response_headers: bool = True,
+    ):
+        self.use_response_headers = use_response_headers
+        self.lock = threading.Lock()
+        self.request_bucket = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+            if requests_per_minute
+            else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+            if tokens_per_minute
+            else None
+        )
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserves one request and `tokens` tokens and returns the number of
+        seconds the caller has to wait before sending the request.
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self.request_bucket is not None:
+                wait = max(wait, self.request_bucket.reserve(1, now))
+            if self.token_bucket is not None:
+                wait = max(wait, self.token_bucket.reserve(tokens, now))
+        if wait > 0:
+            log.debug(f"RateLimiter: waiting {wait:.2f}s for {tokens} tokens")
+        return wait
+
+    def acquire(self, tokens: int) -> int:
+        """
+        Blocks the calling thread until the request can be sent. Returns the
+        number of tokens that were reserved so they can be reconciled later with
+        `update_from_response()`.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return tokens
+
+    async def acquire_async(self, tokens: int) -> int:
+        """
+        The asyncio version of `acquire()`. It waits without blocking the event
+        loop.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return tokens
+
+    def update_from_response(
+        self,
+        reserved_tokens: int,
+        headers: Optional[Mapping[str, str]] = None,
+        usage: Any = None,
+    ):
+        """
+        Reconciles a finished request with the budgets.
+
+        Args:
+            reserved_tokens (int): The number of tokens returned by `acquire()`.
+
+            headers (Mapping, optional): The HTTP response headers. Used when
+            `use_response_headers` is True.
+
+            usage (CompletionUsage, optional): The `usage` of the response. The
+            difference between the reserved and the actually used tokens is
+            given back to the token budget.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.token_bucket is not None and usage is not None:
+                used_tokens = getattr(usage, "total_tokens", None)
+                if used_tokens is not None and used_tokens < reserved_tokens:
+                    self.token_bucket.give_back(reserved_tokens - used_tokens, now)
+            if headers is not None and self.use_response_headers:
+                self.apply_headers(headers, now)
+
+    def apply_headers(self, headers: Mapping[str, str], now: float):
+        # The server sees every client using the key, so its numbers win when
+        # they are stricter than ours.
+        for bucket_name, kind in (
+            ("request_bucket", "requests"),
+            ("token_bucket", "tokens"),
+        ):
+            limit = self.header_number(headers, f"x-ratelimit-limit-{kind}")
+            remaining = self.header_number(headers, f"x-ratelimit-remaining-{kind}")
+            bucket: Optional[TokenBucket] = getattr(self, bucket_name)
+            if bucket is None:
+                if limit is None:
+                    continue
+                # Start tracking a budget the caller didn't configure
+                bucket = TokenBucket(limit, limit / 60.0)
+                setattr(self, bucket_name, bucket)
+                log.fine(
+                    f"RateLimiter: using the {kind} limit of {limit}/min from the API"
+                )
+            elif limit is not None and limit != bucket.capacity:
+                bucket.set_capacity(limit, now)
+            reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            if reset is not None:
+                # The time until the server-side budget is full again tells us
+                # how much of it is currently used up.
+                implied_remaining = bucket.capacity - reset * bucket.refill_per_second
+                remaining = (
+                    implied_remaining
+                    if remaining is None
+                    else min(remaining, implied_remaining)
+                )
+            if remaining is not None:
+                bucket.refill(now)
+                bucket.level = min(bucket.level, remaining)
+
+    @staticmethod
+    def header_number(headers: Mapping[str, str], name: str) -> Optional[float]:
+        value = headers.get(name)
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
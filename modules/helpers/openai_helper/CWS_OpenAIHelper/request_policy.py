@@ -0,0 +1,456 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Awaitable, Callable, Dict, Iterable, Mapping, Optional
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from openai import APIConnectionError, APIStatusError
+
+# The status codes the OpenAI SDK retries by default
+RETRY_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Returns the number of seconds the server asked the client to wait from the
+    `retry-after-ms` or `retry-after` header, or None if there is no usable
+    value. `retry-after` can be a number of seconds or an HTTP date.
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestPolicy:
+    """
+    Controls how `OpenAIHelper` sends each request: per-attempt timeouts, an
+    overall deadline, retries with exponential backoff and jitter, and hedging.
+
+    The SDK's own retries are turned off for requests sent with a policy so the
+    policy is the only place attempts are made. Failed attempts are retried if
+    they are connection errors, timeouts or one of `retry_status_codes`. The
+    wait before a retry is the server's `Retry-After` when it sends one and
+    otherwise a random ("full jitter") delay of up to
+    `initial_backoff * 2 ** (attempt - 1)`, capped at `max_backoff`. Retries
+    stop once the deadline would be passed.
+
+    With `hedge=True`, a second identical request is sent when the first one
+    hasn't answered after the policy's observed p95 latency (or after
+    `hedge_after` seconds), and whichever succeeds first is returned. This
+    trades some extra requests for a shorter latency tail. In the async
+    methods the slower request is cancelled; in the sync methods it runs to
+    completion on a background thread and its result is dropped. Streaming
+    requests are never hedged.
+
+    Args:
+        max_retries (int, optional): The number of retries after the first
+        attempt. Defaults to 3.
+
+        initial_backoff (float, optional): The upper bound of the first backoff
+        delay in seconds. Defaults to 0.5.
+
+        max_backoff (float, optional): The largest backoff delay in seconds.
+        Defaults to 30.
+
+        timeout (float, optional): The timeout of each attempt in seconds. None
+        uses the client's timeout.
+
+        deadline (float, optional): The total number of seconds a request may
+        take, including retries and backoff. None disables the deadline. The
+        async methods cancel an attempt that runs past it; the sync methods
+        enforce it through the attempt's timeout.
+
+        retry_status_codes (Iterable[int], optional): The HTTP status codes that
+        are retried. Defaults to RETRY_STATUS_CODES.
+
+        hedge (bool, optional): Enables hedged requests. Defaults to False.
+
+        hedge_after (float, optional): A fixed number of seconds after which the
+        hedged request is sent. None uses the `hedge_percentile` of the
+        latencies this policy has observed.
+
+        hedge_percentile (float, optional): The latency percentile used when
+        `hedge_after` is None. Defaults to 0.95.
+
+        hedge_min_samples (int, optional): The number of observed latencies
+        needed before requests are hedged by percentile. Defaults to 20.
+
+        latency_window (int, optional): The number of recent latencies the
+        percentile is computed from. Defaults to 500.
+
+        on_attempt (Callable, optional): Called after every attempt with a dict
+        of `attempt` (1 for the first try), `hedge` (whether it was the hedged
+        request), `latency` (seconds), `status_code`, `error` (the exception or
+        None) and `outcome` ("success", "error" or "cancelled"). Exceptions
+        raised by the hook are logged and ignored.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        initial_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        retry_status_codes: Iterable[int] = RETRY_STATUS_CODES,
+        hedge: bool = False,
+        hedge_after: Optional[float] = None,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        latency_window: int = 500,
+        on_attempt: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ):
+        if not 0 < hedge_percentile < 1:
+            raise ValueError("hedge_percentile must be between 0 and 1.")
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retry_status_codes = frozenset(retry_status_codes)
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.on_attempt = on_attempt
+        self.latencies: deque = deque(maxlen=latency_window)
+        self.lock = threading.Lock()
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def is_retryable(self, error: BaseException) -> bool:
+        if isinstance(error, APIStatusError):
+            # The API can say explicitly whether a request should be retried
+            should_retry = error.response.headers.get("x-should-retry")
+            if should_retry in ("true", "false"):
+                return should_retry == "true"
+            return error.status_code in self.retry_status_codes
+        # APITimeoutError is a subclass of APIConnectionError
+        return isinstance(error, (APIConnectionError, asyncio.TimeoutError))
+
+    def backoff_delay(self, attempt: int, error: BaseException) -> float:
+        """
+        Returns how many seconds to wait before retrying after the `attempt`-th
+        attempt failed with `error`.
+        """
+        if isinstance(error, APIStatusError):
+            retry_after = parse_retry_after(error.response.headers)
+            if retry_after is not None:
+                return retry_after
+        return random.uniform(
+            0, min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Returns the number of seconds after which a hedged request is sent, or
+        None if requests aren't hedged yet.
+        """
+        if not self.hedge:
+            return None
+        if self.hedge_after is not None:
+            return self.hedge_after
+        with self.lock:
+            if len(self.latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self.latencies)
+        return latencies[
+            min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile))
+        ]
+
+    def record_attempt(
+        self,
+        attempt: int,
+        hedge: bool,
+        started_at: float,
+        error: Optional[BaseException] = None,
+        cancelled: bool = False,
+    ):
+        latency = time.monotonic() - started_at
+        if error is None and not cancelled:
+            with self.lock:
+                self.latencies.append(latency)
+        if self.on_attempt is None:
+            return
+        status_code = getattr(error, "status_code", None)
+        record = {
+            "attempt": attempt,
+            "hedge": hedge,
+            "latency": latency,
+            "status_code": 200 if error is None and not cancelled else status_code,
+            "error": error,
+            "outcome": (
+                "cancelled" if cancelled else "success" if error is None else "error"
+            ),
+        }
+        try:
+            self.on_attempt(record)
+        except Exception as e:
+            log.warning(f"RequestPolicy: on_attempt hook failed: {e}")
+
+    def remaining_time(self, started_at: float) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - (time.monotonic() - started_at)
+
+    def attempt_timeout(self, remaining: Optional[float]) -> Optional[float]:
+        if remaining is None:
+            return self.timeout
+        if self.timeout is None:
+            return remaining
+        return min(self.timeout, remaining)
+
+    def next_delay(
+        self, attempt: int, error: BaseException, started_at: float
+    ) -> Optional[float]:
+        """
+        Returns the delay before the next attempt, or None if the request
+        shouldn't be retried.
+        """
+        if attempt > self.max_retries or not self.is_retryable(error):
+            return None
+        delay = self.backoff_delay(attempt, error)
+        remaining = self.remaining_time(started_at)
+        if remaining is not None and delay >= remaining:
+            log.debug(
+                f"RequestPolicy: not retrying, the {delay:.2f}s backoff would pass the deadline"
+            )
+            return None
+        log.debug(
+            f"RequestPolicy: attempt {attempt} failed ({type(error).__name__}), retrying in {delay:.2f}s"
+        )
+        return delay
+
+    def deadline_error(self) -> TimeoutError:
+        return TimeoutError(
+            f"The request did not finish within its {self.deadline}s deadline."
+        )
+
+    def call(
+        self, send: Callable[[Optional[float]], Any], hedgeable: bool = True
+    ) -> Any:
+        """
+        Sends a request according to the policy and returns its result.
+
+        Args:
+            send (Callable): Sends one attempt. It is called with the attempt's
+            timeout in seconds (or None) and returns the response.
+
+            hedgeable (bool, optional): Whether the request may be hedged.
+            Defaults to True.
+        """
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = self.remaining_time(started_at)
+            if remaining is not None and remaining <= 0:
+                raise self.deadline_error()
+            timeout = self.attempt_timeout(remaining)
+            try:
+                hedge_delay = self.hedge_delay() if hedgeable else None
+                if hedge_delay is None or (
+                    timeout is not None and hedge_delay >= timeout
+                ):
+                    return self.run_attempt(send, timeout, attempt, False)
+                return self.run_hedged_attempt(send, timeout, attempt, hedge_delay)
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started_at)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    def run_attempt(
+        self,
+        send: Callable[[Optional[float]], Any],
+        timeout: Optional[float],
+        attempt: int,
+        hedge: bool,
+    ) -> Any:
+        attempt_started_at = time.monotonic()
+        try:
+            response = send(timeout)
+        except Exception as e:
+            self.record_attempt(attempt, hedge, attempt_started_at, error=e)
+            raise
+        self.record_attempt(attempt, hedge, attempt_started_at)
+        return response
+
+    def run_hedged_attempt(
+        self,
+        send: Callable[[Optional[float]], Any],
+        timeout: Optional[float],
+        attempt: int,
+        hedge_delay: float,
+    ) -> Any:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(thread_name_prefix="RequestPolicy")
+        futures = {
+            self.executor.submit(self.run_attempt, send, timeout, attempt, False)
+        }
+        done, _ = wait(futures, timeout=hedge_delay)
+        if not done:
+            log.debug(
+                f"RequestPolicy: no response after {hedge_delay:.2f}s, sending a hedged request"
+            )
+            futures.add(
+                self.executor.submit(
+                    self.run_attempt,
+                    send,
+                    None if timeout is None else timeout - hedge_delay,
+                    attempt,
+                    True,
+                )
+            )
+        error: Optional[BaseException] = None
+        pending = futures - done
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    async def acall(
+        self,
+        send: Callable[[Optional[float]], Awaitable[Any]],
+        hedgeable: bool = True,
+    ) -> Any:
+        """
+        The asynchronous version of `call()`. `send` is a coroutine function.
+        """
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = self.remaining_time(started_at)
+            if remaining is not None and remaining <= 0:
+                raise self.deadline_error()
+            timeout = self.attempt_timeout(remaining)
+            try:
+                hedge_delay = self.hedge_delay() if hedgeable else None
+                if hedge_delay is None or (
+                    timeout is not None and hedge_delay >= timeout
+                ):
+                    attempt_coroutine = self.arun_attempt(send, timeout, attempt, False)
+                else:
+                    attempt_coroutine = self.arun_hedged_attempt(
+                        send, timeout, attempt, hedge_delay
+                    )
+                if remaining is None:
+                    return await attempt_coroutine
+                return await asyncio.wait_for(attempt_coroutine, remaining)
+            except Exception as e:
+                delay = self.next_delay(attempt, e, started_at)
+                if delay is None:
+                    if isinstance(e, asyncio.TimeoutError) and self.deadline:
+                        raise self.deadline_error() from e
+                    raise
+            await asyncio.sleep(delay)
+
+    async def arun_attempt(
+        self,
+        send: Callable[[Optional[float]], Awaitable[Any]],
+        timeout: Optional[float],
+        attempt: int,
+        hedge: bool,
+    ) -> Any:
+        attempt_started_at = time.monotonic()
+        try:
+            response = await send(timeout)
+        except asyncio.CancelledError:
+            self.record_attempt(attempt, hedge, attempt_started_at, cancelled=True)
+            raise
+        except Exception as e:
+            self.record_attempt(attempt, hedge, attempt_started_at, error=e)
+            raise
+        self.record_attempt(attempt, hedge, attempt_started_at)
+        return response
+
+    async def arun_hedged_attempt(
+        self,
+        send: Callable[[Optional[float]], Awaitable[Any]],
+        timeout: Optional[float],
+        attempt: int,
+        hedge_delay: float,
+    ) -> Any:
+        tasks = {
+            asyncio.ensure_future(self.arun_attempt(send, timeout, attempt, False))
+        }
+        pending = tasks
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done:
+                log.debug(
+                    f"RequestPolicy: no response after {hedge_delay:.2f}s, sending a hedged request"
+                )
+                pending.add(
+                    asyncio.ensure_future(
+                        self.arun_attempt(
+                            send,
+                            None if timeout is None else timeout - hedge_delay,
+                            attempt,
+                            True,
+                        )
+                    )
+                )
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            # The slower request isn't needed anymore
+            for task in pending:
+                task.cancel()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+
+CACHE_MODES = ("read", "write", "off")
+
+# Base64 data URLs of encoded images. They are replaced by a digest of their
+# content before hashing so the cache key stays small.
+DATA_URL_PATTERN = re.compile(r"^data:([\w/+.-]+);base64,(.*)$", re.DOTALL)
+
+
+class ResponseCache:
+    """
+    A persistent, content-addressed cache of chat completion results stored in
+    a local SQLite database.
+
+    Entries are keyed by a hash of the complete request (model, messages
+    including image contents, sampling parameters, seed, ...), so only an
+    identical request can be answered from the cache. This is meant for
+    deterministic requests, e.g. `temperature=0` with a fixed `seed`, that get
+    sent again when a pipeline is re-run.
+
+    Args:
+        path (str, optional): The SQLite database file. Defaults to
+        "openai_helper_cache.sqlite3" in the working directory.
+
+        ttl (float, optional): The number of seconds an entry stays valid. None
+        keeps entries until they are evicted.
+
+        max_entries (int, optional): The maximum number of entries. The least
+        recently used entries are evicted first.
+
+        max_bytes (int, optional): The maximum total size of the cached
+        responses. The least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self,
+        path: str = "openai_helper_cache.sqlite3",
+        ttl: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+            self.connection.commit()
+
+    @staticmethod
+    def make_key(completion_params: Dict[str, Any]) -> str:
+        """
+        Returns the SHA-256 hex digest of the canonical JSON form of the
+        request. Image data URLs are replaced by the digest of their content.
+        """
+
+        def canonical(value):
+            if isinstance(value, dict):
+                return {str(k): canonical(v) for k, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [canonical(v) for v in value]
+            if isinstance(value, str):
+                match = DATA_URL_PATTERN.match(value)
+                if match:
+                    digest = hashlib.sha256(match.group(2).encode("utf-8")).hexdigest()
+                    return f"data:{match.group(1)};sha256,{digest}"
+                return value
+            if value is None or isinstance(value, (bool, int, float)):
+                return value
+            if hasattr(value, "model_dump"):
+                return canonical(value.model_dump())
+            # Other iterables such as generators of tools
+            if hasattr(value, "__iter__"):
+                return [canonical(v) for v in value]
+            return repr(value)
+
+        serialized = json.dumps(
+            canonical(completion_params),
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def get(self, completion_params: Dict[str, Any]) -> Optional[str]:
+        """
+        Returns the cached response content for the request, or None if there
+        is no valid entry.
+        """
+        key = self.make_key(completion_params)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.connection.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.connection.commit()
+            self.hits += 1
+        log.debug(f"ResponseCache hit for {key[:12]}")
+        return row[0]
+
+    def set(self, completion_params: Dict[str, Any], content: str):
+        """
+        Stores the response content for the request and evicts entries if the
+        cache is over its limits.
+        """
+        key = self.make_key(completion_params)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, content, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, content, len(content.encode("utf-8")), now, now),
+            )
+            self.writes += 1
+            self.evict(now)
+            self.connection.commit()
+
+    def evict(self, now: float):
+        # Called with the lock held
+        if self.ttl is not None:
+            self.connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+            )
+        if self.max_entries is not None:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        if self.max_bytes is not None:
+            total_size = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+            if total_size > self.max_bytes:
+                rows = self.connection.execute(
+                    "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+                ).fetchall()
+                evicted_keys = []
+                for key, size in rows:
+                    if total_size <= self.max_bytes:
+                        break
+                    evicted_keys.append((key,))
+                    total_size -= size
+                self.connection.executemany(
+                    "DELETE FROM responses WHERE key = ?", evicted_keys
+                )
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.hits = self.misses = self.writes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the hit, miss and write counters of this instance together
+        with the number of stored entries and their total size in bytes.
+        """
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
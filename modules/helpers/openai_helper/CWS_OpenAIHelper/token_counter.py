@@ -0,0 +1,340 @@
+import os
+import io
+import math
+import base64
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("OPENAI_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ModuleNotFoundError:
+    # Without tiktoken, token counts are estimated from the text length
+    tiktoken = None
+
+try:
+    from PIL import Image
+except ModuleNotFoundError:
+    Image = None
+
+from .image_encoder import HIGH_DETAIL_MAX_SIDE, HIGH_DETAIL_MAX_SHORT_SIDE
+
+# Context window sizes by model name prefix. The longest matching prefix wins.
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4-turbo": 128_000,
+    "gpt-4-1106": 128_000,
+    "gpt-4-0125": 128_000,
+    "gpt-4-vision": 128_000,
+    "gpt-4-32k": 32_768,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo-instruct": 4_096,
+    "gpt-3.5-turbo": 16_385,
+}
+DEFAULT_CONTEXT_WINDOW = 128_000
+
+# Tokens added for every message and for priming the assistant's reply, see
+# https://cookbook.openai.com/examples/how_to_count_tokens_with_tiktoken
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+REPLY_PRIMING_TOKENS = 3
+
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+IMAGE_TILE_SIZE = 512
+# Used when the size of an image can't be read: the largest image the API
+# processes in high detail (768x2048) is 8 tiles
+MAX_IMAGE_TOKENS = IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * 8
+
+# The rough number of characters per token when tiktoken isn't available
+CHARS_PER_TOKEN = 4
+
+# Image sizes read with Pillow, by the digest of the encoded image, so the
+# memo doesn't keep the images themselves alive
+IMAGE_SIZE_MEMO_SIZE = 1024
+image_sizes: "OrderedDict[bytes, Optional[Tuple[int, int]]]" = OrderedDict()
+image_sizes_lock = threading.Lock()
+
+# Longer texts are counted every time instead of being kept in the memo
+MEMOIZE_MAX_CHARS = 20_000
+
+TRUNCATION_STRATEGIES = ("start", "end", "middle")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Any:
+    """
+    Returns the tiktoken encoding for a model, or None if tiktoken isn't
+    installed or the encoding can't be loaded.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # A model tiktoken doesn't know yet
+            return tiktoken.get_encoding(
+                "o200k_base" if model.startswith("gpt-4o") else "cl100k_base"
+            )
+    except Exception as e:
+        # tiktoken downloads the encoding files on first use
+        log.warning(
+            f"Could not load the tiktoken encoding for {model} ({e}). Token counts are estimated from the text length."
+        )
+        return None
+
+
+def count_text_tokens(text: str, model: str) -> int:
+    """
+    Returns the number of tokens in `text` for `model`. Counts of texts up to
+    MEMOIZE_MAX_CHARS are memoized, so repeated texts such as system messages
+    are only tokenized once.
+    """
+    if len(text) <= MEMOIZE_MAX_CHARS:
+        return memoized_count_text_tokens(text, model)
+    return tokenize_and_count(text, model)
+
+
+def tokenize_and_count(text: str, model: str) -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+memoized_count_text_tokens = lru_cache(maxsize=8192)(tokenize_and_count)
+
+
+def image_tile_tokens(width: int, height: int, detail: Optional[str] = None) -> int:
+    """
+    Returns the tokens an image of `width` x `height` costs. Low detail images
+    cost a flat amount. Otherwise the image is scaled the way the API does it
+    and every 512px tile is counted. "auto" is counted as high detail.
+    """
+    if detail == "low":
+        return IMAGE_BASE_TOKENS
+    scale = min(1.0, HIGH_DETAIL_MAX_SIDE / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, HIGH_DETAIL_MAX_SHORT_SIDE / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = math.ceil(width / IMAGE_TILE_SIZE) * math.ceil(height / IMAGE_TILE_SIZE)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+
+def image_size_from_data_url(url: str) -> Optional[Tuple[int, int]]:
+    """
+    Reads the width and height of a base64 data URL image. PNG and GIF sizes
+    are read from the first bytes; other formats need Pillow.
+    """
+    if not url.startswith("data:"):
+        return None
+    encoded = url.partition(",")[2]
+    header = base64.b64decode(encoded[:64])
+    if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+        return struct.unpack(">II", header[16:24])
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", header[6:10])
+    if Image is not None:
+        return decoded_image_size(encoded)
+    return None
+
+
+def decoded_image_size(encoded: str) -> Optional[Tuple[int, int]]:
+    """
+    Decodes a base64 image with Pillow and returns its size. Sizes are
+    memoized by the digest of `encoded`.
+    """
+    digest = hashlib.sha256(encoded.encode("ascii", "replace")).digest()
+    with image_sizes_lock:
+        if digest in image_sizes:
+            image_sizes.move_to_end(digest)
+            return image_sizes[digest]
+    try:
+        size = Image.open(io.BytesIO(base64.b64decode(encoded))).size
+    except Exception:
+        size = None
+    with image_sizes_lock:
+        image_sizes[digest] = size
+        if len(image_sizes) > IMAGE_SIZE_MEMO_SIZE:
+            image_sizes.popitem(last=False)
+    return size
+
+
+def count_image_url_tokens(url: str, detail: Optional[str] = None) -> int:
+    if detail == "low":
+        return IMAGE_BASE_TOKENS
+    size = image_size_from_data_url(url)
+    if size is None:
+        return MAX_IMAGE_TOKENS
+    return image_tile_tokens(size[0], size[1], detail)
+
+
+class TokenCounter:
+    """
+    Counts prompt tokens locally, before a request is sent.
+
+    Text is counted with tiktoken when it is installed and estimated at about
+    four characters per token otherwise. Images are counted by their tiles the
+    way the API bills them. Counts of repeated texts and images are memoized.
+    `OpenAIHelper` uses the counter to check prompts against the model's
+    context window, to truncate prompts and to estimate request costs for the
+    rate limiter and for batch chunks.
+    """
+
+    def context_window(self, model: str) -> int:
+        """
+        Returns the context window of a model in tokens.
+        """
+        matches = [prefix for prefix in CONTEXT_WINDOWS if model.startswith(prefix)]
+        if not matches:
+            return DEFAULT_CONTEXT_WINDOW
+        return CONTEXT_WINDOWS[max(matches, key=len)]
+
+    def count_text(self, text: str, model: str = "gpt-4-turbo") -> int:
+        return count_text_tokens(text, model)
+
+    def count_messages(
+        self, messages: List[Dict[str, Any]], model: str = "gpt-4-turbo"
+    ) -> int:
+        """
+        Returns the number of prompt tokens of a message list, including the
+        per-message overhead and the images.
+        """
+        return REPLY_PRIMING_TOKENS + sum(
+            self.count_message(message, model) for message in messages
+        )
+
+    def count_message(self, message: Dict[str, Any], model: str = "gpt-4-turbo") -> int:
+        """
+        Returns the number of tokens one message adds to a prompt, including
+        its per-message overhead.
+        """
+        tokens = TOKENS_PER_MESSAGE
+        if message.get("name"):
+            tokens += TOKENS_PER_NAME + count_text_tokens(message["name"], model)
+        # The function calls of assistant messages in a multi-turn conversation
+        for tool_call in message.get("tool_calls") or []:
+            function = tool_call.get("function") or {}
+            tokens += count_text_tokens(function.get("name", ""), model)
+            tokens += count_text_tokens(function.get("arguments", ""), model)
+        content = message.get("content")
+        if isinstance(content, str):
+            return tokens + count_text_tokens(content, model)
+        for part in content or []:
+            if part.get("type") == "text":
+                tokens += count_text_tokens(part["text"], model)
+            elif part.get("type") == "image_url":
+                image_url = part["image_url"]
+                tokens += count_image_url_tokens(
+                    image_url["url"], image_url.get("detail")
+                )
+        return tokens
+
+    def estimate_request_tokens(self, completion_params: Dict[str, Any]) -> int:
+        """
+        Returns the tokens a request counts against a tokens-per-minute limit:
+        the prompt plus `max_tokens` for every requested choice.
+        """
+        prompt_tokens = self.count_messages(
+            completion_params.get("messages", []),
+            completion_params.get("model", "gpt-4-turbo"),
+        )
+        max_tokens = completion_params.get("max_tokens") or 0
+        n = completion_params.get("n") or 1
+        return prompt_tokens + max_tokens * n
+
+    def truncate(
+        self,
+        text: str,
+        max_tokens: int,
+        model: str = "gpt-4-turbo",
+        strategy: str = "end",
+    ) -> str:
+        """
+        Shortens `text` to at most `max_tokens` tokens.
+
+        Args:
+            strategy (str, optional): Which part of the text is cut: "end" keeps
+            the beginning, "start" keeps the end and "middle" keeps both ends.
+            Defaults to "end".
+        """
+        if strategy not in TRUNCATION_STRATEGIES:
+            raise ValueError(
+                f"strategy must be one of {TRUNCATION_STRATEGIES}, got {strategy!r}."
+            )
+        if max_tokens <= 0:
+            return ""
+        if count_text_tokens(text, model) <= max_tokens:
+            return text
+        encoding = get_encoding(model)
+        if encoding is None:
+            units: Any = text
+            limit = max_tokens * CHARS_PER_TOKEN
+        else:
+            units = encoding.encode(text, disallowed_special=())
+            limit = max_tokens
+        if strategy == "end":
+            kept = [units[:limit]]
+        elif strategy == "start":
+            kept = [units[len(units) - limit :]]
+        else:
+            # Leave room for the newline that joins the two ends
+            limit -= 1
+            head = limit // 2
+            kept = [units[:head], units[len(units) - (limit - head) :]]
+        if encoding is None:
+            return "\n".join(kept)
+        return "\n".join(encoding.decode(part) for part in kept)
+
+    def split(
+        self,
+        text: str,
+        max_tokens: int,
+        model: str = "gpt-4-turbo",
+        overlap: int = 0,
+    ) -> List[str]:
+        """
+        Splits `text` into chunks of at most `max_tokens` tokens. Consecutive
+        chunks share `overlap` tokens so content at the boundaries isn't lost.
+        """
+        if max_tokens <= overlap:
+            raise ValueError("max_tokens must be larger than overlap.")
+        encoding = get_encoding(model)
+        if encoding is None:
+            units: Any = text
+            size, step = (
+                max_tokens * CHARS_PER_TOKEN,
+                (max_tokens - overlap) * CHARS_PER_TOKEN,
+            )
+        else:
+            units = encoding.encode(text, disallowed_special=())
+            size, step = max_tokens, max_tokens - overlap
+        chunks = []
+        for start in range(0, max(len(units), 1), step):
+            chunk = units[start : start + size]
+            chunks.append(chunk if encoding is None else encoding.decode(chunk))
+            if start + size >= len(units):
+                break
+        return chunks
@@ -0,0 +1,92 @@
+"""
+Measures the throughput of `create_chat_completions_batch()` and
+`acreate_chat_completions_batch()` at different concurrency limits.
+
+The requests go to a local stand-in for the chat completions endpoint that
+delays every answer to stand in for the model. Run it from the root of the
+repository:
+
+    python modules/helpers/openai_helper/benchmarks/bench_batch.py
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("OPENAI_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_OPENAI_HELPER_WARNING", "true")
+# Keeps the log line of every request out of the results
+os.environ.setdefault("LOG_LEVEL", "20")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.openai_helper.CWS_OpenAIHelper.client_registry import (
+    close_async_clients,
+)
+from modules.helpers.openai_helper.CWS_OpenAIHelper.openai_helper import OpenAIHelper
+from fake_chat_api import serve
+
+
+def run_sync(helper, prompts, concurrency):
+    started = time.perf_counter()
+    results = helper.create_chat_completions_batch(
+        prompts, max_concurrency=concurrency, model="gpt-4o"
+    )
+    return time.perf_counter() - started, results
+
+
+def run_async(helper, prompts, concurrency):
+    async def run_batch():
+        try:
+            started = time.perf_counter()
+            results = await helper.acreate_chat_completions_batch(
+                prompts, max_concurrency=concurrency, model="gpt-4o"
+            )
+            return time.perf_counter() - started, results
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(run_batch())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    prompts = [f"prompt {i}" for i in range(args.requests)]
+    rows = []
+    with serve(args.latency) as base_url:
+        helper = OpenAIHelper("benchmark-key", None, base_url=base_url)
+        # Warms up the token counter and the imports
+        run_sync(helper, prompts[:2], 2)
+        for concurrency in args.concurrency:
+            timings = []
+            failures = 0
+            for run in (run_sync, run_async):
+                seconds, results = run(helper, prompts, concurrency)
+                timings.append(seconds)
+                failures += sum(isinstance(result, Exception) for result in results)
+            rows.append((concurrency, timings, failures))
+
+    print(
+        f"{'concurrency':>12}{'sync s':>10}{'sync req/s':>12}"
+        f"{'async s':>10}{'async req/s':>13}"
+    )
+    for concurrency, (sync_seconds, async_seconds), failures in rows:
+        print(
+            f"{concurrency:>12}{sync_seconds:>10.2f}"
+            f"{args.requests / sync_seconds:>12.1f}{async_seconds:>10.2f}"
+            f"{args.requests / async_seconds:>13.1f}"
+            + (f"  {failures} failed" if failures else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
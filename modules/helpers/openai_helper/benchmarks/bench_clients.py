@@ -0,0 +1,89 @@
+"""
+Compares creating a helper per task with the shared client against giving
+every helper its own client (`share_client=False`).
+
+Measures what it costs to create a helper and the p50 / p99 latency of one
+request made with each new helper. The requests go to a local stand-in for the
+chat completions endpoint. Run it from the root of the repository:
+
+    python modules/helpers/openai_helper/benchmarks/bench_clients.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("OPENAI_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_OPENAI_HELPER_WARNING", "true")
+# Keeps the log line of every request out of the results
+os.environ.setdefault("LOG_LEVEL", "20")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.openai_helper.CWS_OpenAIHelper.client_registry import (
+    close_clients,
+)
+from modules.helpers.openai_helper.CWS_OpenAIHelper.openai_helper import OpenAIHelper
+from fake_chat_api import serve
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[round(fraction * (len(ordered) - 1))]
+
+
+def run_tasks(base_url, tasks, share_client):
+    """
+    Creates a helper for every task and sends one request with it. Returns the
+    seconds each helper took to create and each request took.
+    """
+    close_clients()
+    construction = []
+    latency = []
+    for i in range(tasks):
+        started = time.perf_counter()
+        helper = OpenAIHelper(
+            "benchmark-key", None, base_url=base_url, share_client=share_client
+        )
+        created = time.perf_counter()
+        helper.create_chat_completion(f"prompt {i}", model="gpt-4o")
+        latency.append(time.perf_counter() - created)
+        construction.append(created - started)
+        if not share_client:
+            helper.client.close()
+    close_clients()
+    return construction, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    with serve(args.latency) as base_url:
+        # Warms up the token counter and the imports
+        run_tasks(base_url, 2, True)
+        results = (
+            ("shared client", run_tasks(base_url, args.tasks, True)),
+            ("own client", run_tasks(base_url, args.tasks, False)),
+        )
+
+    print(
+        f"{'':>14}{'create p50':>12}{'create p99':>12}"
+        f"{'request p50':>13}{'request p99':>13}"
+    )
+    for name, (construction, latency) in results:
+        print(
+            f"{name:>14}{percentile(construction, 0.5) * 1000:>12.2f}"
+            f"{percentile(construction, 0.99) * 1000:>12.2f}"
+            f"{percentile(latency, 0.5) * 1000:>13.2f}"
+            f"{percentile(latency, 0.99) * 1000:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
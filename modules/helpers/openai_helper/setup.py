@@ -2,7 +2,7 @@ from setuptools import setup, find_packages
 
 setup(
     name="CWS_OpenAIHelper",
-    version="0.0.1",
+    version="0.0.13",
     packages=find_packages(),
     author="Casey Schmid",
     author_email="caseywschmid@gmail.com",
@@ -10,5 +10,13 @@ setup(
     install_requires=[
         "openai",
     ],
+    extras_require={
+        # Resizing and recompressing images with ImageEncoder
+        "images": ["pillow"],
+        # Exact token counts with TokenCounter
+        "tokens": ["tiktoken"],
+        # HTTP/2 connections for the shared clients
+        "http2": ["httpx[http2]"],
+    },
     # Add other metadata as needed
 )
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("OPENAI_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_OPENAI_HELPER_WARNING", "true")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+sys.path.insert(0, os.path.dirname(__file__))
@@ -0,0 +1,174 @@
+import json
+import re
+import threading
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeBatchAPI:
+    """
+    A local stand-in for the files and batches endpoints of the OpenAI API.
+
+    Uploaded files are kept in memory. A batch is "in_progress" until it has
+    been retrieved `polls_until_complete` times and then "completed". Its
+    output file answers every request with "echo: <prompt>", or
+    `{"echo": "<prompt>"}` in JSON mode, except prompts containing "fail",
+    which get a 400 response. The output lines are written
+    in reverse order, so clients have to put the results back in order.
+    """
+
+    def __init__(self, polls_until_complete=2):
+        self.polls_until_complete = polls_until_complete
+        self.files = {}
+        self.batches = {}
+        self.uploads = 0
+        self.retrievals = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_file(self, data):
+        with self.lock:
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = data
+        return file_id
+
+    def upload(self, content_type, body):
+        message = BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        for part in message.get_payload():
+            if part.get_param("name", header="content-disposition") == "file":
+                with self.lock:
+                    self.uploads += 1
+                return self.add_file(part.get_payload(decode=True))
+        raise ValueError("The upload has no file.")
+
+    def create_batch(self, params):
+        with self.lock:
+            batch_id = f"batch-{len(self.batches)}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": params["endpoint"],
+                "input_file_id": params["input_file_id"],
+                "completion_window": params["completion_window"],
+                "status": "in_progress",
+                "created_at": 0,
+                "output_file_id": None,
+                "error_file_id": None,
+                "metadata": params.get("metadata"),
+                "polls": 0,
+            }
+        return self.public_batch(batch_id)
+
+    def retrieve_batch(self, batch_id):
+        with self.lock:
+            self.retrievals += 1
+            batch = self.batches[batch_id]
+            batch["polls"] += 1
+            complete = (
+                batch["status"] == "in_progress"
+                and batch["polls"] >= self.polls_until_complete
+            )
+        if complete:
+            output = self.answer(self.files[batch["input_file_id"]])
+            batch["output_file_id"] = self.add_file(output)
+            batch["status"] = "completed"
+        return self.public_batch(batch_id)
+
+    def public_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        return {key: value for key, value in batch.items() if key != "polls"}
+
+    @staticmethod
+    def answer(input_file):
+        lines = []
+        for line in input_file.decode("utf-8").splitlines():
+            request = json.loads(line)
+            content = request["body"]["messages"][-1]["content"]
+            prompt = content if isinstance(content, str) else content[0]["text"]
+            if request["body"].get("response_format") == {"type": "json_object"}:
+                answer = json.dumps({"echo": prompt})
+            else:
+                answer = "echo: " + prompt
+            if "fail" in prompt:
+                response = {"status_code": 400, "body": {"error": "bad request"}}
+            else:
+                response = {
+                    "status_code": 200,
+                    "body": {"choices": [{"message": {"content": answer}}]},
+                }
+            lines.append(
+                {
+                    "id": "response",
+                    "custom_id": request["custom_id"],
+                    "response": response,
+                    "error": None,
+                }
+            )
+        lines.reverse()
+        return "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, data, content_type="application/json"):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_json(self, value):
+                self.send_body(json.dumps(value).encode("utf-8"))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.path.endswith("/files"):
+                    file_id = api.upload(self.headers["Content-Type"], body)
+                    return self.send_json(
+                        {
+                            "id": file_id,
+                            "object": "file",
+                            "bytes": len(api.files[file_id]),
+                            "created_at": 0,
+                            "filename": "requests.jsonl",
+                            "purpose": "batch",
+                            "status": "processed",
+                        }
+                    )
+                if self.path.endswith("/batches"):
+                    return self.send_json(api.create_batch(json.loads(body)))
+                self.send_error(404)
+
+            def do_GET(self):
+                match = re.search(r"/batches/([\w-]+)$", self.path)
+                if match:
+                    return self.send_json(api.retrieve_batch(match.group(1)))
+                match = re.search(r"/files/([\w-]+)/content$", self.path)
+                if match:
+                    return self.send_body(
+                        api.files[match.group(1)], "application/octet-stream"
+                    )
+                self.send_error(404)
+
+        return Handler
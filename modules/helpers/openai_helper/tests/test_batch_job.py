@@ -0,0 +1,158 @@
+import json
+import os
+
+import pytest
+
+from fake_batch_api import FakeBatchAPI
+from modules.helpers.openai_helper.CWS_OpenAIHelper.batch_job import (
+    BatchJob,
+    BatchJobError,
+)
+from modules.helpers.openai_helper.CWS_OpenAIHelper.openai_helper import OpenAIHelper
+
+
+@pytest.fixture
+def api():
+    api = FakeBatchAPI().start()
+    yield api
+    api.stop()
+
+
+@pytest.fixture
+def helper(api):
+    return OpenAIHelper("test-key", None, base_url=api.url, share_client=False)
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_write_requests_splits_prompts_into_chunks(helper, tmp_path):
+    job = BatchJob(helper, str(tmp_path), chunk_size=3)
+
+    written = job.write_requests(
+        (f"prompt {i}" for i in range(7)), model="gpt-4o", system_message="Be brief."
+    )
+
+    assert written == 7
+    chunks = job.state["chunks"]
+    assert [chunk["count"] for chunk in chunks] == [3, 3, 1]
+    assert [chunk["first_index"] for chunk in chunks] == [0, 3, 6]
+    lines = [line for chunk in chunks for line in read_lines(chunk["path"])]
+    assert [line["custom_id"] for line in lines] == [f"request-{i}" for i in range(7)]
+    assert lines[4]["url"] == "/v1/chat/completions"
+    assert lines[4]["body"] == helper.build_completion_params(
+        prompt="prompt 4", model="gpt-4o", system_message="Be brief."
+    )
+
+
+def test_write_requests_respects_the_byte_limit(helper, tmp_path):
+    job = BatchJob(helper, str(tmp_path))
+    line_bytes = len(job.build_request_line(0, {"prompt": "prompt 0"})[0])
+    job.max_chunk_bytes = 2 * line_bytes
+
+    job.write_requests([f"prompt {i}" for i in range(5)])
+
+    assert [chunk["count"] for chunk in job.state["chunks"]] == [2, 2, 1]
+    assert all(chunk["bytes"] <= job.max_chunk_bytes for chunk in job.state["chunks"])
+
+
+def test_submit_uploads_every_chunk_and_poll_waits_for_completion(
+    api, helper, tmp_path
+):
+    job = BatchJob(helper, str(tmp_path), chunk_size=2, metadata={"job": "test"})
+    job.write_requests([f"prompt {i}" for i in range(5)])
+
+    batch_ids = job.submit()
+
+    assert len(batch_ids) == 3
+    assert api.uploads == 3
+    assert all(
+        api.batches[batch_id]["metadata"] == {"job": "test"} for batch_id in batch_ids
+    )
+    statuses = job.poll(interval=0.01, timeout=5)
+    assert statuses == {batch_id: "completed" for batch_id in batch_ids}
+    assert all(chunk["output_file_id"] for chunk in job.state["chunks"])
+
+
+def test_results_are_yielded_in_prompt_order(helper, tmp_path):
+    job = BatchJob(helper, str(tmp_path), chunk_size=3)
+    prompts = [f"prompt {i}" for i in range(5)] + ["please fail", "prompt 6"]
+
+    results = list(job.run(prompts, poll_interval=0.01))
+
+    assert [index for index, _ in results] == list(range(7))
+    assert results[2] == (2, "echo: prompt 2")
+    assert results[6] == (6, "echo: prompt 6")
+    assert isinstance(results[5][1], BatchJobError)
+    assert "400" in str(results[5][1])
+
+
+def test_json_mode_is_applied_per_request(helper, tmp_path):
+    job = BatchJob(helper, str(tmp_path), chunk_size=2)
+    prompts = [
+        "prompt 0",
+        {"prompt": "prompt 1", "json_mode": False},
+        "prompt 2",
+        {"prompt": "prompt 3", "json_mode": False},
+    ]
+
+    results = list(job.run(prompts, poll_interval=0.01, json_mode=True))
+
+    assert results == [
+        (0, {"echo": "prompt 0"}),
+        (1, "echo: prompt 1"),
+        (2, {"echo": "prompt 2"}),
+        (3, "echo: prompt 3"),
+    ]
+    # A new job reading the checkpoint parses the results the same way
+    resumed_job = BatchJob(helper, str(tmp_path))
+    resumed_job.state["next_result_index"] = 0
+    assert list(resumed_job.results(poll_interval=0.01)) == results
+    mixed_job = BatchJob(helper, str(tmp_path / "mixed"))
+    assert list(
+        mixed_job.run(
+            ["prompt 0", {"prompt": "prompt 1", "json_mode": True}],
+            poll_interval=0.01,
+        )
+    ) == [(0, "echo: prompt 0"), (1, {"echo": "prompt 1"})]
+
+
+def test_a_new_job_resumes_from_the_checkpoint(api, helper, tmp_path):
+    prompts = [f"prompt {i}" for i in range(8)]
+    job = BatchJob(helper, str(tmp_path), chunk_size=3, checkpoint_every=2)
+    results = job.run(prompts, poll_interval=0.01)
+    first_results = [next(results) for _ in range(4)]
+    # Stops the first run as a crash would, after the fourth result
+    results.close()
+    uploads, batches = api.uploads, len(api.batches)
+
+    resumed_job = BatchJob(helper, str(tmp_path))
+    resumed_results = list(resumed_job.run(prompts, poll_interval=0.01))
+
+    assert [index for index, _ in first_results] == [0, 1, 2, 3]
+    # The checkpoint was written after the third result, so only the fourth is
+    # delivered again
+    assert [index for index, _ in resumed_results] == list(range(3, 8))
+    assert resumed_results[-1] == (7, "echo: prompt 7")
+    assert (api.uploads, len(api.batches)) == (uploads, batches)
+
+
+def test_submit_after_an_interruption_only_submits_missing_chunks(
+    api, helper, tmp_path
+):
+    job = BatchJob(helper, str(tmp_path), chunk_size=2)
+    job.write_requests([f"prompt {i}" for i in range(4)])
+    job.submit()
+    # The second batch was never created before the interruption
+    job.state["chunks"][1]["batch_id"] = None
+    job.save_state()
+
+    resumed_job = BatchJob(helper, str(tmp_path))
+    batch_ids = resumed_job.submit()
+
+    assert api.uploads == 2
+    assert len(api.batches) == 3
+    assert batch_ids[0] == job.state["chunks"][0]["batch_id"]
+    assert os.path.exists(resumed_job.state_path)
@@ -0,0 +1,447 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import psutil
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.timeouts import Timeouts
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("SELENIUM_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+from .selenium_helper import DEFAULT_BLOCKED_RESOURCES, create_driver
+
+# Clears what a page may have left behind in the browser when the WebDriver
+# can't send DevTools commands (e.g. on a Selenium Grid)
+CLEAR_STORAGE_SCRIPT = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+
+
+class PooledDriver:
+    """
+    A driver of a `DriverPool` together with its usage counters.
+    """
+
+    def __init__(self, driver: WebDriver):
+        self.driver = driver
+        # The timeouts the driver started with, restored by DriverPool.reset()
+        self.timeouts = None
+        self.pages = 0
+        self.created_at = time.monotonic()
+
+
+class DriverPool:
+    """
+    Keeps warm Chrome sessions and lends them out, so pages don't pay the
+    seconds it takes to start a browser.
+
+    `size` drivers are started in parallel when the pool is created. Borrow one
+    with `with pool.driver() as driver:`. When it is given back, its extra tabs
+    are closed, its cookies and storage are cleared, its timeouts are set back
+    to the ones it started with and it is sent to about:blank, so the next user starts from a clean browser. A driver is
+    replaced with a fresh one after `max_pages` uses, when its browser uses
+    more than `max_memory_mb`, when the code using it raised a
+    `WebDriverException` or when it fails the health check before it is lent
+    out.
+
+    Args:
+        size (int, optional): The number of drivers. Defaults to 2.
+
+        use_remote (bool, optional): Start the drivers on the Selenium Grid at
+        HOSTED_SELENIUM_URL instead of locally. Defaults to False.
+
+        max_pages (int, optional): The number of uses after which a driver is
+        replaced. None never replaces it for that. Defaults to 50.
+
+        max_memory_mb (int, optional): The memory of a local browser, with all
+        its processes, above which it is replaced. Remote drivers can't be
+        measured. None turns the check off. Defaults to 1024.
+
+        lean (bool, optional): Start the drivers with the lean profile, which
+        blocks `blocked_resources` and `blocked_urls`. See
+        `selenium_helper.create_driver()`. Defaults to False.
+
+        page_load_strategy (str, optional): "normal", "eager" or "none".
+
+        log_network (bool, optional): Keep the DevTools Network events for
+        `readiness.wait_for_network_idle()`. Defaults to False.
+
+        driver_factory (Callable, optional): Creates a driver. Overrides the
+        other driver settings, e.g. to start drivers with custom options.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        use_remote: bool = False,
+        max_pages: Optional[int] = 50,
+        max_memory_mb: Optional[int] = 1024,
+        lean: bool = False,
+        page_load_strategy: Optional[str] = None,
+        blocked_resources: Iterable[str] = DEFAULT_BLOCKED_RESOURCES,
+        blocked_urls: Iterable[str] = (),
+        log_network: bool = False,
+        driver_factory: Optional[Callable[[], WebDriver]] = None,
+    ):
+        if size < 1:
+            raise ValueError("A DriverPool needs at least one driver.")
+        self.size = size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.driver_factory = driver_factory or (
+            lambda: create_driver(
+                use_remote,
+                lean,
+                page_load_strategy,
+                blocked_resources,
+                blocked_urls,
+                log_network,
+            )
+        )
+        self.idle = queue.Queue()
+        self.closed = False
+        self.created = 0
+        self.recycled = 0
+        self.lock = threading.Lock()
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            for entry in executor.map(lambda _: self.start_driver(), range(size)):
+                # A driver that failed to start is started again when it is
+                # needed
+                self.idle.put(entry)
+        log.debug(f"DriverPool: started {self.created} of {size} drivers")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start_driver(self) -> Optional[PooledDriver]:
+        try:
+            entry = PooledDriver(self.driver_factory())
+        except Exception as e:
+            log.error(f"DriverPool: failed to start a driver: {e}")
+            return None
+        try:
+            entry.timeouts = entry.driver.timeouts
+        except Exception as e:
+            # The driver is still usable, its timeouts just aren't restored
+            log.warning(f"DriverPool: couldn't read the timeouts of a driver: {e}")
+        with self.lock:
+            self.created += 1
+        return entry
+
+    @contextmanager
+    def driver(self, timeout: Optional[float] = None) -> Iterator[WebDriver]:
+        """
+        Lends out a warm driver for the duration of the `with` block.
+
+        Args:
+            timeout (float, optional): The seconds to wait for a free driver.
+            None waits as long as it takes.
+
+        Raises:
+            TimeoutError: If no driver became free in time.
+        """
+        log.fine("DriverPool.driver")
+        entry = self.acquire(timeout)
+        failed = False
+        try:
+            yield entry.driver
+        except WebDriverException:
+            # The browser may have crashed or be stuck on the page
+            failed = True
+            raise
+        finally:
+            self.release(entry, failed)
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledDriver:
+        """
+        Takes a healthy driver out of the pool. Give it back with `release()`.
+        """
+        if self.closed:
+            raise RuntimeError("The DriverPool is closed.")
+        try:
+            entry = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No driver became free within {timeout} seconds.")
+        if entry is not None and self.is_healthy(entry.driver):
+            return entry
+        if entry is not None:
+            log.warning("DriverPool: replacing a driver that failed its health check")
+            self.quit_driver(entry)
+        entry = self.start_driver()
+        if entry is None:
+            # Keeps the slot so a later call can try again
+            self.idle.put(None)
+            raise RuntimeError("DriverPool: couldn't start a replacement driver.")
+        return entry
+
+    def release(self, entry: PooledDriver, failed: bool = False):
+        """
+        Gives a driver back to the pool, resetting or replacing it first.
+        """
+        entry.pages += 1
+        if self.closed:
+            self.quit_driver(entry)
+            return
+        if not failed and not self.needs_recycling(entry):
+            try:
+                self.reset(entry.driver, entry.timeouts)
+                self.idle.put(entry)
+                return
+            except Exception as e:
+                # A browser that was quit or crashed fails with connection
+                # errors instead of WebDriverExceptions
+                log.debug(f"DriverPool: resetting a driver failed: {e}")
+        self.quit_driver(entry)
+        with self.lock:
+            self.recycled += 1
+        self.idle.put(self.start_driver())
+
+    @staticmethod
+    def is_healthy(driver: WebDriver) -> bool:
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def reset(self, driver: WebDriver, timeouts: Optional[Timeouts] = None):
+        """
+        Closes every tab but the first and clears the cookies of all sites and
+        the storage of every site the tabs visited, see `visited_origins()`.
+        `timeouts`, e.g. the ones the driver started with, replace the page
+        load, script and implicit wait timeouts the last user may have changed.
+        """
+        use_cdp = hasattr(driver, "execute_cdp_cmd")
+        origins = set()
+        handles = driver.window_handles
+        for handle in reversed(handles):
+            driver.switch_to.window(handle)
+            if use_cdp:
+                origins.update(self.visited_origins(driver))
+            elif self.page_origin(driver.current_url):
+                # Only reaches the site the tab is on now
+                driver.execute_script(CLEAR_STORAGE_SCRIPT)
+            if handle != handles[0]:
+                driver.close()
+        if use_cdp:
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            for origin in origins:
+                driver.execute_cdp_cmd(
+                    "Storage.clearDataForOrigin",
+                    {"origin": origin, "storageTypes": "all"},
+                )
+        else:
+            driver.delete_all_cookies()
+        if timeouts is not None:
+            driver.timeouts = timeouts
+        driver.get("about:blank")
+
+    def visited_origins(self, driver: WebDriver) -> set:
+        """
+        Returns the origins of the pages the current tab has been on, from its
+        back/forward history, and of the frames it shows now. Pages that were
+        replaced in the history, e.g. by a redirect, aren't included.
+        """
+        urls = [driver.current_url]
+        history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})
+        urls += [item.get("url") for item in history.get("entries", [])]
+        frames = [driver.execute_cdp_cmd("Page.getFrameTree", {})["frameTree"]]
+        while frames:
+            frame = frames.pop()
+            urls.append(frame["frame"].get("url"))
+            frames.extend(frame.get("childFrames", []))
+        return {origin for origin in map(self.page_origin, urls) if origin}
+
+    @staticmethod
+    def page_origin(url: str) -> Optional[str]:
+        """
+        Returns the origin of a web page's URL, e.g. "https://example.com:8443",
+        or None for pages without one like about:blank.
+        """
+        parts = urlsplit(url or "")
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return None
+        return f"{parts.scheme}://{parts.netloc.rpartition('@')[2]}"
+
+    def needs_recycling(self, entry: PooledDriver) -> bool:
+        if self.max_pages is not None and entry.pages >= self.max_pages:
+            return True
+        if self.max_memory_mb is not None:
+            memory_mb = self.memory_mb(entry.driver)
+            if memory_mb is not None and memory_mb > self.max_memory_mb:
+                log.debug(f"DriverPool: recycling a driver using {memory_mb:.0f} MB")
+                return True
+        return False
+
+    @staticmethod
+    def memory_mb(driver: WebDriver) -> Optional[float]:
+        """
+        Returns the resident memory of a local browser and all its processes
+        in MB, or None if it can't be measured.
+        """
+        service_process = getattr(getattr(driver, "service", None), "process", None)
+        if service_process is None:
+            return None
+        try:
+            process = psutil.Process(service_process.pid)
+            processes = [process] + process.children(recursive=True)
+            total = 0
+            for child in processes:
+                try:
+                    total += child.memory_info().rss
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            return total / (1024 * 1024)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    @staticmethod
+    def quit_driver(entry: PooledDriver):
+        try:
+            entry.driver.quit()
+        except Exception as e:
+            log.debug(f"DriverPool: quitting a driver failed: {e}")
+
+    def render_many(
+        self,
+        urls: Iterable[str],
+        action: Optional[Callable[[WebDriver], Any]] = None,
+        timeout: float = 30,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Renders many URLs in parallel, one per driver of the pool, and yields
+        each result as soon as it is ready.
+
+        Every URL gets `timeout` seconds from the moment it has a driver. The
+        page load is limited to that, and if the page or `action` still hasn't
+        finished when it runs out, the driver is quit, the URL yields a
+        `TimeoutError` and a fresh driver takes the place of the stuck one. A
+        crashed or hung tab therefore never holds up the rest of the batch.
+
+        Args:
+            urls (Iterable[str]): The URLs to render.
+            action (Callable, optional): Called with the driver after the page
+            has loaded. Its return value is yielded instead of the page's HTML.
+            timeout (float, optional): The seconds each URL may take. Defaults
+            to 30.
+
+        Yields:
+            tuple: `(url, html)`, `(url, action result)` or `(url, exception)`,
+            in the order the pages finish.
+        """
+        log.fine("DriverPool.render_many")
+        urls = iter(urls)
+        pending = {}
+        executor = ThreadPoolExecutor(
+            max_workers=self.size, thread_name_prefix="DriverPool"
+        )
+
+        def render(url, task):
+            # The driver's own page load timeout is restored when it is reset
+            with self.driver() as driver:
+                task["driver"] = driver
+                task["started"] = time.monotonic()
+                driver.set_page_load_timeout(timeout)
+                driver.get(url)
+                return driver.page_source if action is None else action(driver)
+
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < self.size:
+                    url = next(urls, None)
+                    if url is None:
+                        exhausted = True
+                        break
+                    task = {"url": url, "driver": None, "started": None}
+                    pending[executor.submit(render, url, task)] = task
+                if not pending:
+                    return
+
+                now = time.monotonic()
+                deadlines = [
+                    task["started"] + timeout
+                    for task in pending.values()
+                    if task["started"] is not None
+                ]
+                done, _ = wait(
+                    pending,
+                    # Checks at least every second for URLs that just got a
+                    # driver
+                    timeout=max(0, min(deadlines + [now + 1]) - now),
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    task = pending.pop(future)
+                    error = future.exception()
+                    yield task["url"], future.result() if error is None else error
+
+                now = time.monotonic()
+                for future, task in list(pending.items()):
+                    if task["started"] is None or now < task["started"] + timeout:
+                        continue
+                    del pending[future]
+                    log.warning(
+                        f"DriverPool: {task['url']} took longer than {timeout} seconds"
+                    )
+                    # Makes the stuck call fail, so the driver is replaced when
+                    # the worker gives it back
+                    threading.Thread(
+                        target=self.quit_driver,
+                        args=(PooledDriver(task["driver"]),),
+                        daemon=True,
+                    ).start()
+                    yield task["url"], TimeoutError(
+                        f"Rendering {task['url']} took longer than {timeout} seconds."
+                    )
+        finally:
+            # Runs when the caller stops iterating early, too
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self.idle.qsize(),
+            "created": self.created,
+            "recycled": self.recycled,
+        }
+
+    def close(self):
+        """
+        Quits the idle drivers. Drivers that are lent out are quit when they
+        are given back.
+        """
+        log.fine("DriverPool.close")
+        self.closed = True
+        while True:
+            try:
+                entry = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                self.quit_driver(entry)
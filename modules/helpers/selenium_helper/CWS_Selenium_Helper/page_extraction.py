@@ -0,0 +1,271 @@
+import os
+import json
+import gzip
+import base64
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("SELENIUM_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+LOCATOR_KEYS = ("selector", "id", "class", "tag")
+FIELD_KEYS = LOCATOR_KEYS + ("attribute", "many", "strip", "default", "transform")
+
+# The bytes of HTML pulled from the browser per WebDriver call
+HTML_CHUNK_SIZE = 1024 * 1024
+
+# Reads every field in one call and returns them as a single JSON string, so
+# no elements or page source cross the wire. Stripped text is the element's
+# stripped text nodes joined with single spaces.
+EXTRACT_SCRIPT = """
+const [fields] = arguments;
+const textOf = (element, strip) => {
+  if (!strip) return element.textContent;
+  const parts = [];
+  const walker = document.createTreeWalker(element, NodeFilter.SHOW_TEXT);
+  while (walker.nextNode()) {
+    const text = walker.currentNode.nodeValue.trim();
+    if (text) parts.push(text);
+  }
+  return parts.join(" ");
+};
+const valueOf = (element, field) =>
+  field.attribute === null ? textOf(element, field.strip) : element.getAttribute(field.attribute);
+const values = {};
+for (const field of fields) {
+  try {
+    if (field.many) {
+      values[field.name] = Array.from(document.querySelectorAll(field.selector), (element) => valueOf(element, field));
+    } else {
+      const element = document.querySelector(field.selector);
+      values[field.name] = element === null ? null : valueOf(element, field);
+    }
+  } catch (error) {
+    throw new Error(`Field ${JSON.stringify(field.name)}: ${error.message}`);
+  }
+}
+return JSON.stringify(values);
+"""
+
+# Serializes the page into a byte buffer in the browser, gzipped with
+# CompressionStream where the browser has it, and returns its size
+SERIALIZE_SCRIPT = """
+const [compress, done] = arguments;
+const doctype = document.doctype ? new XMLSerializer().serializeToString(document.doctype) + "\\n" : "";
+const html = doctype + document.documentElement.outerHTML;
+const store = (buffer, compressed) => {
+  window.__seleniumHelperHtml = new Uint8Array(buffer);
+  done({ size: window.__seleniumHelperHtml.length, compressed: compressed });
+};
+if (compress && window.CompressionStream) {
+  const stream = new Blob([html]).stream().pipeThrough(new CompressionStream("gzip"));
+  new Response(stream).arrayBuffer().then(
+    (buffer) => store(buffer, true),
+    () => store(new TextEncoder().encode(html), false)
+  );
+} else {
+  store(new TextEncoder().encode(html), false);
+}
+"""
+
+# Returns a slice of the serialized page as base64
+READ_CHUNK_SCRIPT = """
+const [start, end] = arguments;
+const bytes = window.__seleniumHelperHtml.subarray(start, end);
+let binary = "";
+for (let i = 0; i < bytes.length; i += 0x8000) {
+  binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+}
+return btoa(binary);
+"""
+
+RELEASE_SCRIPT = "delete window.__seleniumHelperHtml;"
+
+
+def quote_css_string(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class PageField:
+    """
+    One field of a `PageSchema`, with its locator turned into a CSS selector.
+    """
+
+    def __init__(self, name: str, spec):
+        if isinstance(spec, str):
+            spec = {"selector": spec}
+        unknown_keys = set(spec) - set(FIELD_KEYS)
+        if unknown_keys:
+            raise ValueError(
+                f"Unknown keys {sorted(unknown_keys)} in field {name!r}. Supported keys are {FIELD_KEYS}."
+            )
+        locators = [key for key in LOCATOR_KEYS if key in spec]
+        if len(locators) != 1:
+            raise ValueError(
+                f"Field {name!r} needs exactly one of {LOCATOR_KEYS}, got {locators}."
+            )
+        self.name = name
+        self.attribute = spec.get("attribute")
+        self.many = spec.get("many", False)
+        self.strip = spec.get("strip", True)
+        self.default = spec.get("default", [] if self.many else None)
+        self.transform = spec.get("transform")
+        if self.transform is not None and not callable(self.transform):
+            raise ValueError(f"The transform of field {name!r} must be callable.")
+
+        if "selector" in spec:
+            self.selector = spec["selector"]
+        elif "id" in spec:
+            self.selector = f"[id={quote_css_string(spec['id'])}]"
+        elif "class" in spec:
+            self.selector = "".join(
+                f"[class~={quote_css_string(class_name)}]"
+                for class_name in spec["class"].split()
+            )
+        else:
+            self.selector = spec["tag"]
+
+    def script_spec(self) -> dict:
+        """
+        Returns what the extraction script needs to know about the field.
+        """
+        return {
+            "name": self.name,
+            "selector": self.selector,
+            "attribute": self.attribute,
+            "many": self.many,
+            "strip": self.strip,
+        }
+
+    def value(self, raw_value):
+        """
+        Applies the default and the transform to the value read in the browser.
+        """
+        if raw_value is None or (self.many and not raw_value):
+            # A copy, so changing one result doesn't change the next
+            return list(self.default) if self.many else self.default
+        if self.transform is None:
+            return raw_value
+        if self.many:
+            return [
+                value if value is None else self.transform(value) for value in raw_value
+            ]
+        return self.transform(raw_value)
+
+
+class PageSchema:
+    """
+    Reads a handful of fields from the page in the browser, instead of pulling
+    the whole `page_source` over the WebDriver connection and parsing it again
+    in Python.
+
+    All fields are read by a single `execute_script` call that returns only
+    their values, as one compact JSON string. The fields use the same specs
+    as the BS4 Helper's extraction schemas. Each field is a CSS selector
+    string or a dict with exactly one locator:
+
+    - "selector": A CSS selector.
+    - "id": An element id.
+    - "class": A class name. With spaces, the element needs all the classes.
+    - "tag": A tag name.
+
+    and optionally:
+
+    - "attribute": The attribute to read. Defaults to the element's text.
+    - "many": Read every matching element into a list instead of the first
+      one. Defaults to False.
+    - "strip": Strip the whitespace around every piece of text and join the
+      pieces with single spaces. Defaults to True.
+    - "default": The value if nothing matches. Defaults to None, or [] for
+      "many" fields.
+    - "transform": A function applied to every value in Python, e.g. `int`.
+
+    A schema is callable with a driver, so it can be passed as the `action` of
+    `render_many()`.
+
+    Args:
+        fields (dict): The field names and their specs.
+    """
+
+    def __init__(self, fields: dict):
+        if not fields:
+            raise ValueError("A page schema needs at least one field.")
+        self.fields = [PageField(name, spec) for name, spec in fields.items()]
+        self.script_specs = [field.script_spec() for field in self.fields]
+
+    def __call__(self, driver: WebDriver) -> dict:
+        return self.extract(driver)
+
+    def extract(self, driver: WebDriver) -> dict:
+        """
+        Returns a dict with the value of every field on the driver's current
+        page.
+        """
+        raw_values = json.loads(
+            driver.execute_script(EXTRACT_SCRIPT, self.script_specs)
+        )
+        return {
+            field.name: field.value(raw_values[field.name]) for field in self.fields
+        }
+
+
+def save_page_html(
+    driver: WebDriver,
+    file_path: str,
+    compress: bool = True,
+    chunk_size: int = HTML_CHUNK_SIZE,
+) -> int:
+    """
+    Streams the HTML of the driver's current page to a file, `chunk_size`
+    bytes per WebDriver call, so a large page is never held in Python as a
+    whole.
+
+    With `compress=True` the file is gzipped. Chrome compresses the page
+    itself with `CompressionStream`, so only the compressed bytes cross the
+    wire. Browsers without it send the plain HTML, which is gzipped while it
+    is written.
+
+    Returns:
+        int: The number of bytes written to the file.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+    driver.set_script_timeout(60)
+    buffer = driver.execute_async_script(SERIALIZE_SCRIPT, compress)
+    size = buffer["size"]
+    log.debug(
+        f"save_page_html: serialized {size} bytes, compressed by the browser: {buffer['compressed']}"
+    )
+    if compress and not buffer["compressed"]:
+        file = gzip.open(file_path, "wb")
+    else:
+        file = open(file_path, "wb")
+    try:
+        with file:
+            for start in range(0, size, chunk_size):
+                chunk = driver.execute_script(
+                    READ_CHUNK_SCRIPT, start, start + chunk_size
+                )
+                file.write(base64.b64decode(chunk))
+    finally:
+        try:
+            driver.execute_script(RELEASE_SCRIPT)
+        except WebDriverException as e:
+            log.debug(f"save_page_html: couldn't release the buffer: {e.msg}")
+    return os.path.getsize(file_path)
@@ -0,0 +1,386 @@
+import os
+import json
+import time
+import weakref
+from typing import Any, Callable, Optional
+
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchFrameException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.remote.webdriver import WebDriver
+
+# ------ CONFIGURE LOGGING ------
+import logging
+
+try:
+    # if running the code from the package itself
+    if os.getenv("SELENIUM_HELPER_PACKAGE_TEST", "False").lower() in ("true", "1", "t"):
+        from modules.logs.logger.CWS_Logger import logger
+    else:
+        # if running the code as an imported package in another project
+        from CWS_Logger import logger  # type: ignore
+except ModuleNotFoundError:
+    raise ModuleNotFoundError(
+        "The necessary 'Logger' module is not installed. Please install it by running \n'pip install git+https://github.com/caseywschmid/modules.git#subdirectory=modules/logs/logger'"
+    )
+
+logger.configure_logging(__name__)
+log = logging.getLogger(__name__)
+
+# Counts the page's fetch() and XMLHttpRequest calls that are in flight and
+# records the time of the last network activity and DOM mutation. Runs before
+# the page's own scripts when it is installed with install_page_monitor().
+PAGE_MONITOR_SCRIPT = """
+(() => {
+  if (window.__seleniumHelperMonitor) return;
+  const monitor = { inFlight: 0, lastNetwork: performance.now(), lastMutation: performance.now() };
+  window.__seleniumHelperMonitor = monitor;
+  const started = () => { monitor.inFlight += 1; monitor.lastNetwork = performance.now(); };
+  const finished = () => { monitor.inFlight = Math.max(0, monitor.inFlight - 1); monitor.lastNetwork = performance.now(); };
+  if (window.fetch) {
+    const fetch = window.fetch;
+    window.fetch = function () {
+      started();
+      return fetch.apply(this, arguments).finally(finished);
+    };
+  }
+  const send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    started();
+    this.addEventListener("loadend", finished, { once: true });
+    return send.apply(this, arguments);
+  };
+  // Images, scripts and other resources the page loads by itself
+  if (window.PerformanceObserver) {
+    new PerformanceObserver(() => { monitor.lastNetwork = performance.now(); })
+      .observe({ type: "resource", buffered: false });
+  }
+  new MutationObserver(() => { monitor.lastMutation = performance.now(); })
+    .observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+})();
+"""
+
+# Resolves as soon as an element matches the selector, or after the time
+# slice ends, so the browser reports the element without being polled
+WAIT_FOR_SELECTOR_SCRIPT = """
+const [selector, visible, sliceMs, done] = arguments;
+const matches = () => {
+  const element = document.querySelector(selector);
+  if (!element) return false;
+  if (!visible) return true;
+  const rect = element.getBoundingClientRect();
+  const style = getComputedStyle(element);
+  return rect.width > 0 && rect.height > 0 && style.visibility !== "hidden" && style.display !== "none";
+};
+if (matches()) { done(true); return; }
+let timer = null;
+const observer = new MutationObserver(() => {
+  if (matches()) { observer.disconnect(); clearTimeout(timer); done(true); }
+});
+observer.observe(document, { childList: true, subtree: true, attributes: visible });
+timer = setTimeout(() => { observer.disconnect(); done(false); }, sliceMs);
+"""
+
+# Resolves once the page has been quiet for quietMs, or after the time slice
+QUIET_SCRIPT = """
+const [kind, quietMs, maxInFlight, sliceMs, done] = arguments;
+const monitor = window.__seleniumHelperMonitor;
+if (!monitor) { done(null); return; }
+const deadline = performance.now() + sliceMs;
+const check = () => {
+  const now = performance.now();
+  const last = kind === "network" ? monitor.lastNetwork : monitor.lastMutation;
+  const idle = kind !== "network" || monitor.inFlight <= maxInFlight;
+  if (idle && now - last >= quietMs) { done(true); return; }
+  if (now >= deadline) { done(false); return; }
+  setTimeout(check, Math.min(50, Math.max(0, deadline - now)));
+};
+check();
+"""
+
+# The NetworkCounter of every driver, or None for drivers without a
+# performance log
+network_counters = weakref.WeakKeyDictionary()
+
+# Errors a readiness check raises while the page navigates or rebuilds itself
+RETRIED_EXCEPTIONS = (StaleElementReferenceException, NoSuchFrameException)
+
+# Messages of the JavaScript errors Chrome reports when a page unloads while
+# a script runs
+NAVIGATION_ERROR_MESSAGES = (
+    "document unloaded",
+    "navigated or closed",
+    "execution context was destroyed",
+    "cannot find context",
+)
+
+
+def poll(
+    check: Callable[[float], Any],
+    timeout: float = 10,
+    interval: float = 0.05,
+    max_interval: float = 1,
+    backoff: float = 1.5,
+    message: str = "The page wasn't ready",
+) -> Any:
+    """
+    Calls `check(slice)` until it returns a truthy value and returns it.
+
+    `slice` is the number of seconds the check may wait in the browser before
+    it reports back. It starts at `interval` and grows by `backoff` up to
+    `max_interval`, so fast pages are noticed right away and slow pages
+    aren't asked for their state over and over. Stale elements, missing
+    frames and scripts cut off by a navigation count as not ready. Any other
+    error, e.g. an invalid selector or a bug in the script, is raised at once.
+
+    Raises:
+        TimeoutException: If the check didn't succeed within `timeout` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    slice_seconds = interval
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutException(f"{message} after {timeout:.3g} seconds.")
+        started = time.monotonic()
+        try:
+            result = check(min(slice_seconds, remaining))
+            if result:
+                return result
+        except RETRIED_EXCEPTIONS as e:
+            log.debug(f"Readiness check failed, retrying: {e.msg}")
+        except JavascriptException as e:
+            if not is_navigation_error(e):
+                raise
+            log.debug(f"The page navigated during the readiness check: {e.msg}")
+        # Checks that return at once still wait for their slice
+        time.sleep(max(0, min(slice_seconds, remaining) - (time.monotonic() - started)))
+        slice_seconds = min(max_interval, slice_seconds * backoff)
+
+
+def is_navigation_error(error: JavascriptException) -> bool:
+    message = (error.msg or "").lower()
+    return any(fragment in message for fragment in NAVIGATION_ERROR_MESSAGES)
+
+
+def install_page_monitor(driver: WebDriver) -> bool:
+    """
+    Installs the network and DOM monitor used by `wait_for_network_idle()`
+    and `wait_for_dom_quiet()`.
+
+    On a local Chrome driver the monitor is registered with the DevTools
+    `Page.addScriptToEvaluateOnNewDocument` command, so it runs before the
+    scripts of every page the driver opens from then on and sees all their
+    requests. Call it once after creating the driver. Otherwise it is only
+    added to the current page.
+
+    Returns:
+        bool: True if the monitor will run on every new page.
+    """
+    if hasattr(driver, "execute_cdp_cmd"):
+        try:
+            driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument", {"source": PAGE_MONITOR_SCRIPT}
+            )
+            driver.execute_script(PAGE_MONITOR_SCRIPT)
+            return True
+        except WebDriverException as e:
+            log.debug(f"Couldn't register the page monitor: {e.msg}")
+    driver.execute_script(PAGE_MONITOR_SCRIPT)
+    return False
+
+
+class NetworkCounter:
+    """
+    Counts the requests of a driver that are in flight from the DevTools
+    Network events in its performance log. The log is only kept by drivers
+    started with `log_network=True`, see `selenium_helper.build_chrome_options()`.
+    Reading the log empties it, so there is one counter per driver.
+    """
+
+    def __init__(self):
+        self.in_flight = set()
+        self.last_activity = time.monotonic()
+
+    def update(self, driver: WebDriver) -> int:
+        """
+        Reads the new events and returns the number of requests in flight.
+        """
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            method = message.get("method", "")
+            if not method.startswith("Network."):
+                continue
+            request_id = message.get("params", {}).get("requestId")
+            if method == "Network.requestWillBeSent":
+                self.in_flight.add(request_id)
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                self.in_flight.discard(request_id)
+            self.last_activity = time.monotonic()
+        return len(self.in_flight)
+
+
+def network_counter(driver: WebDriver) -> Optional[NetworkCounter]:
+    """
+    Returns the `NetworkCounter` of a driver, or None if it keeps no
+    performance log.
+    """
+    if driver not in network_counters:
+        counter = NetworkCounter()
+        try:
+            counter.update(driver)
+        except WebDriverException:
+            counter = None
+        network_counters[driver] = counter
+    return network_counters[driver]
+
+
+def run_async(driver: WebDriver, script: str, slice_seconds: float, *args) -> Any:
+    # The script timeout has to outlast the slice. The caller's timeout is
+    # put back afterwards.
+    previous_timeout = driver.timeouts.script
+    driver.set_script_timeout(slice_seconds + 5)
+    try:
+        return driver.execute_async_script(script, *args, int(slice_seconds * 1000))
+    finally:
+        driver.set_script_timeout(previous_timeout)
+
+
+def wait_for_selector(
+    driver: WebDriver,
+    selector: str,
+    visible: bool = False,
+    timeout: float = 10,
+    **poll_options,
+) -> bool:
+    """
+    Waits until an element matches the CSS selector. The browser reports the
+    element as soon as it is added, through a MutationObserver, instead of
+    being asked for it at a fixed interval.
+
+    Args:
+        selector (str): The CSS selector.
+        visible (bool, optional): Also wait until the element has a size and
+        isn't hidden. Defaults to False.
+        timeout (float, optional): Defaults to 10 seconds.
+        poll_options: `interval`, `max_interval` and `backoff` of `poll()`.
+    """
+    return poll(
+        lambda slice_seconds: run_async(
+            driver, WAIT_FOR_SELECTOR_SCRIPT, slice_seconds, selector, visible
+        ),
+        timeout,
+        message=f"No element matched {selector!r}",
+        **poll_options,
+    )
+
+
+def wait_for_quiet(
+    driver: WebDriver,
+    kind: str,
+    quiet_time: float,
+    max_in_flight: int,
+    timeout: float,
+    **poll_options,
+) -> bool:
+    def check(slice_seconds):
+        result = run_async(
+            driver,
+            QUIET_SCRIPT,
+            slice_seconds,
+            kind,
+            int(quiet_time * 1000),
+            max_in_flight,
+        )
+        if result is None:
+            # The page was opened before the monitor was installed
+            install_page_monitor(driver)
+            return False
+        return result
+
+    # The page must stay quiet for quiet_time, so a slice shorter than that
+    # could never succeed
+    poll_options.setdefault("interval", quiet_time + 0.25)
+    poll_options.setdefault("max_interval", max(1, quiet_time + 0.25))
+    return poll(
+        check,
+        timeout,
+        message=f"The page's {'network' if kind == 'network' else 'DOM'} didn't settle",
+        **poll_options,
+    )
+
+
+def wait_for_network_idle(
+    driver: WebDriver,
+    idle_time: float = 0.5,
+    max_in_flight: int = 0,
+    timeout: float = 10,
+    **poll_options,
+) -> bool:
+    """
+    Waits until at most `max_in_flight` requests are in flight and there was
+    no network activity for `idle_time` seconds. `max_in_flight` allows for
+    connections that never finish, like long polling.
+
+    Drivers started with `log_network=True` count every request of the browser
+    from the DevTools Network events. Other drivers count the page's fetch and
+    XMLHttpRequest calls and the resources it loads with the monitor of
+    `install_page_monitor()`, which is installed on the current page if it is
+    missing.
+    """
+    counter = network_counter(driver)
+    if counter is not None:
+
+        def check(_):
+            in_flight = counter.update(driver)
+            return (
+                in_flight <= max_in_flight
+                and time.monotonic() - counter.last_activity >= idle_time
+            )
+
+        poll_options.setdefault("max_interval", max(0.1, idle_time / 2))
+        return poll(
+            check, timeout, message="The network didn't become idle", **poll_options
+        )
+    return wait_for_quiet(
+        driver, "network", idle_time, max_in_flight, timeout, **poll_options
+    )
+
+
+def wait_for_dom_quiet(
+    driver: WebDriver,
+    quiet_time: float = 0.5,
+    timeout: float = 10,
+    **poll_options,
+) -> bool:
+    """
+    Waits until the DOM hasn't changed for `quiet_time` seconds, e.g. after a
+    client-side app has finished rendering. See `install_page_monitor()`.
+    """
+    return wait_for_quiet(driver, "dom", quiet_time, 0, timeout, **poll_options)
+
+
+def wait_for_script(
+    driver: WebDriver,
+    script: str,
+    *args,
+    timeout: float = 10,
+    **poll_options,
+) -> Any:
+    """
+    Waits until a JavaScript function body returns a truthy value and returns
+    that value, e.g. `"return window.appReady === true"` or
+    `"return document.querySelectorAll('.row').length >= 20"`. An error
+    thrown by the script is raised, so guard against objects that don't
+    exist yet, e.g. `"return window.app?.ready"`.
+    """
+    return poll(
+        lambda _: driver.execute_script(script, *args),
+        timeout,
+        message="The script didn't return a truthy value",
+        **poll_options,
+    )
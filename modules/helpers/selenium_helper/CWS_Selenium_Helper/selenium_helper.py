@@ -2,7 +2,7 @@ import os
 import signal
 import time
 from importlib.metadata import version
-from typing import Annotated, NoReturn
+from typing import Annotated, Any, Callable, Iterable, Iterator, NoReturn, Optional
 
 import psutil
 import pyautogui
@@ -30,19 +30,260 @@ except ModuleNotFoundError:
 logger.configure_logging(__name__)
 log = logging.getLogger(__name__)
 
+from .page_extraction import HTML_CHUNK_SIZE, PageSchema, save_page_html
+from .readiness import (
+    install_page_monitor,
+    wait_for_dom_quiet,
+    wait_for_network_idle,
+    wait_for_script,
+    wait_for_selector,
+)
 
 SELENIUM_VERSION = "4.20.0"
 PYAUTOGUI_VERSION = "0.9.54"
 PSUTIL_VERSION = "5.9.8"
 
+# Chrome flags of the lean profile: no extensions, GPU or background services
+LEAN_CHROME_ARGUMENTS = (
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-background-timer-throttling",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-first-run",
+)
+
+
+def file_patterns(*extensions: str) -> tuple[str, ...]:
+    """
+    Returns the URL patterns of files with the given extensions, with and
+    without a query string, e.g. "*.css" and "*.css?*" for "app.css?v=3".
+    """
+    return tuple(
+        pattern
+        for extension in extensions
+        for pattern in (f"*.{extension}", f"*.{extension}?*")
+    )
+
+
+# URL patterns of the resource types the lean profile can block
+RESOURCE_URL_PATTERNS = {
+    "image": file_patterns("png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico"),
+    "font": file_patterns("woff", "woff2", "ttf", "otf", "eot"),
+    "media": file_patterns("mp4", "webm", "ogg", "mp3", "wav", "m3u8"),
+    "stylesheet": file_patterns("css"),
+    "tracker": (
+        "*google-analytics.com*",
+        "*googletagmanager.com*",
+        "*doubleclick.net*",
+        "*googlesyndication.com*",
+        "*facebook.net*",
+        "*hotjar.com*",
+        "*segment.io*",
+        "*segment.com/analytics*",
+        "*newrelic.com*",
+        "*nr-data.net*",
+    ),
+}
+DEFAULT_BLOCKED_RESOURCES = ("image", "font", "media", "tracker")
+
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+
+def build_chrome_options(
+    headless: bool = True,
+    lean: bool = False,
+    page_load_strategy: Optional[str] = None,
+    log_network: bool = False,
+) -> Options:
+    """
+    Returns the Chrome options used for automated sessions: headless Chrome
+    that works inside containers.
+
+    Args:
+        headless (bool, optional): Run Chrome without a window. Defaults to
+        True.
+
+        lean (bool, optional): Use the lean profile: `LEAN_CHROME_ARGUMENTS`,
+        images turned off in the preferences and the "eager" page load
+        strategy. Defaults to
+        False.
+
+        page_load_strategy (str, optional): "normal" waits for the `load`
+        event, "eager" only for the DOM and "none" for nothing. Defaults to
+        "eager" for the lean profile and "normal" otherwise.
+
+        log_network (bool, optional): Keep the DevTools Network events in the
+        performance log, so `readiness.wait_for_network_idle()` can count every
+        request of the browser. Defaults to False.
+    """
+    page_load_strategy = page_load_strategy or ("eager" if lean else "normal")
+    if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+        raise ValueError(
+            f"page_load_strategy must be one of {PAGE_LOAD_STRATEGIES}, got {page_load_strategy!r}."
+        )
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    if lean:
+        for argument in LEAN_CHROME_ARGUMENTS:
+            options.add_argument(argument)
+        options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2}
+        )
+    if log_network:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        options.add_experimental_option(
+            "perfLoggingPrefs", {"enableNetwork": True, "enablePage": False}
+        )
+    options.page_load_strategy = page_load_strategy
+    return options
+
+
+def block_resources(
+    driver: webdriver.Remote,
+    resources: Iterable[str] = DEFAULT_BLOCKED_RESOURCES,
+    url_patterns: Iterable[str] = (),
+) -> bool:
+    """
+    Stops the browser from downloading the given resource types and URL
+    patterns with the DevTools `Network.setBlockedURLs` command. The blocking
+    lasts for the whole session.
+
+    Args:
+        driver (WebDriver): A local Chrome driver.
+
+        resources (Iterable[str], optional): Keys of `RESOURCE_URL_PATTERNS`.
+        Defaults to images, fonts, media and trackers.
+
+        url_patterns (Iterable[str], optional): More URL patterns to block,
+        with `*` as the wildcard.
+
+    Returns:
+        bool: False if the driver can't send DevTools commands (e.g. on a
+        Selenium Grid), in which case nothing is blocked.
+    """
+    unknown_resources = set(resources) - set(RESOURCE_URL_PATTERNS)
+    if unknown_resources:
+        raise ValueError(
+            f"Unknown resources {sorted(unknown_resources)}. Supported resources are {tuple(RESOURCE_URL_PATTERNS)}."
+        )
+    if not hasattr(driver, "execute_cdp_cmd"):
+        log.warning(
+            "This driver can't send DevTools commands, so only the lean Chrome flags apply."
+        )
+        return False
+    patterns = [
+        pattern for resource in resources for pattern in RESOURCE_URL_PATTERNS[resource]
+    ]
+    patterns.extend(url_patterns)
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    log.debug(f"Blocking {len(patterns)} URL patterns")
+    return True
+
+
+def create_driver(
+    use_remote: bool = False,
+    lean: bool = False,
+    page_load_strategy: Optional[str] = None,
+    blocked_resources: Iterable[str] = DEFAULT_BLOCKED_RESOURCES,
+    blocked_urls: Iterable[str] = (),
+    log_network: bool = False,
+    headless: bool = True,
+) -> webdriver.Remote:
+    """
+    Starts a Chrome session, locally or on the Selenium Grid, with the page
+    monitor of the readiness waits installed. With `lean=True` it uses the
+    lean profile and blocks `blocked_resources` and `blocked_urls`. See
+    `build_chrome_options()`, `block_resources()` and
+    `readiness.install_page_monitor()`.
+    """
+    options = build_chrome_options(
+        headless=headless,
+        lean=lean,
+        page_load_strategy=page_load_strategy,
+        log_network=log_network,
+    )
+    if use_remote:
+        driver = create_remote_driver(options)
+    else:
+        driver = create_local_driver(options)
+    try:
+        if lean:
+            block_resources(driver, blocked_resources, blocked_urls)
+        install_page_monitor(driver)
+    except Exception:
+        driver.quit()
+        raise
+    return driver
+
+
+def create_local_driver(options: Options = None) -> webdriver.Chrome:
+    """
+    Starts a Chrome session on this machine. Defaults to
+    `build_chrome_options()`.
+    """
+    log.debug("Starting a local Chrome WebDriver")
+    return webdriver.Chrome(options=options or build_chrome_options())
+
+
+def create_remote_driver(
+    options: Options = None, selenium_url: str = None
+) -> webdriver.Remote:
+    """
+    Starts a Chrome session on the Selenium Grid at `selenium_url`, which
+    defaults to the HOSTED_SELENIUM_URL environment variable.
+    """
+    selenium_url = selenium_url or os.getenv(
+        "HOSTED_SELENIUM_URL", "HOSTED_SELENIUM_URL_NOT_SET"
+    )
+    if selenium_url == "HOSTED_SELENIUM_URL_NOT_SET":
+        log.error("You must set the HOSTED_SELENIUM_URL environment variable.")
+        raise ValueError("HOSTED_SELENIUM_URL environment variable not set.")
+
+    log.debug(f"Attempting to connect to Selenium Grid at {selenium_url}")
+
+    options = options or build_chrome_options()
+    options.set_capability("browserName", "chrome")
+    options.set_capability("browserVersion", "124.0")
+    options.set_capability("platformName", "linux")
+
+    log.fine(f"Chrome options and capabilities set: {options.to_capabilities()}")
+
+    return webdriver.Remote(command_executor=selenium_url, options=options)
+
 
 class SeleniumHelper:
-    def __init__(self, use_remote=False):
+    def __init__(
+        self,
+        use_remote=False,
+        lean=False,
+        page_load_strategy=None,
+        blocked_resources=DEFAULT_BLOCKED_RESOURCES,
+        blocked_urls=(),
+        log_network=False,
+    ):
         self.driver = None
         self.wait = None
         # Global flag to control the logging loop
         self.is_logging_active = False
         self.use_remote = use_remote
+        # The launch profile of the helper's drivers, see create_driver()
+        self.driver_settings = {
+            "lean": lean,
+            "page_load_strategy": page_load_strategy,
+            "blocked_resources": tuple(blocked_resources),
+            "blocked_urls": tuple(blocked_urls),
+            "log_network": log_network,
+        }
 
         if self.use_remote:
             self.setup_remote_selenium()
@@ -87,37 +328,65 @@ class SeleniumHelper:
 
     def setup_remote_selenium(self) -> NoReturn:
         log.fine("SeleniumHelper.setup_remote_selenium")
-        # This url is for the Selenium Grid running on AWS Kubernetes
-        # See HostedSelenium project for more details
-        selenium_url = os.getenv("HOSTED_SELENIUM_URL", "HOSTED_SELENIUM_URL_NOT_SET")
-        if selenium_url == "HOSTED_SELENIUM_URL_NOT_SET":
-            log.error("You must set the HOSTED_SELENIUM_URL environment variable.")
-            raise ValueError("HOSTED_SELENIUM_URL environment variable not set.")
-
-        log.debug(f"Attempting to connect to Selenium Grid at {selenium_url}")
-
-        options = Options()
-        options.add_argument("--headless=new")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-
-        options.set_capability("browserName", "chrome")
-        options.set_capability("browserVersion", "124.0")
-        options.set_capability("platformName", "linux")
-
-        log.fine(f"Chrome options and capabilities set: {options.to_capabilities()}")
-
+        # The url of the Selenium Grid running on AWS Kubernetes is read from
+        # HOSTED_SELENIUM_URL. See HostedSelenium project for more details
         try:
-            self.driver = webdriver.Remote(
-                command_executor=selenium_url,
-                options=options,
-            )
+            self.driver = create_driver(use_remote=True, **self.driver_settings)
             self.wait = WebDriverWait(self.driver, 30)
             log.debug("Remote WebDriver created successfully")
         except Exception as e:
             log.error(f"Failed to create remote WebDriver: {str(e)}")
             raise
 
+    def setup_local_selenium(self) -> NoReturn:
+        log.fine("SeleniumHelper.setup_local_selenium")
+        try:
+            self.driver = create_driver(**self.driver_settings)
+            self.wait = WebDriverWait(self.driver, 30)
+            log.debug("Local WebDriver created successfully")
+        except Exception as e:
+            log.error(f"Failed to create local WebDriver: {str(e)}")
+            raise
+
+    def render_many(
+        self,
+        urls: Iterable[str],
+        workers: int = 4,
+        action: Optional[Callable[[webdriver.Remote], Any]] = None,
+        timeout: float = 30,
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Renders many URLs in parallel on `workers` separate drivers and yields
+        each page's HTML, or the result of `action`, as soon as it is ready.
+        The drivers are started like the helper's own driver, which is not
+        used.
+
+        Args:
+            urls (Iterable[str]): The URLs to render.
+
+            workers (int, optional): The number of browsers rendering at the
+            same time. Defaults to 4.
+
+            action (Callable, optional): Called with the driver once the page
+            has loaded. Its return value is yielded instead of the HTML.
+
+            timeout (float, optional): The seconds each URL may take. A page
+            that takes longer yields a `TimeoutError` and its browser is
+            replaced. Defaults to 30.
+
+        Yields:
+            tuple: `(url, result)` or `(url, exception)` in the order the pages
+            finish.
+        """
+        log.fine("Selenium_Helper.render_many")
+        # Imported here because driver_pool imports this module
+        from .driver_pool import DriverPool
+
+        with DriverPool(
+            size=workers, use_remote=self.use_remote, **self.driver_settings
+        ) as pool:
+            yield from pool.render_many(urls, action, timeout)
+
     def start_coordinate_logging(
         self, logging_interval: float = 0.5, duration: int = 30
     ) -> NoReturn:
@@ -166,10 +435,14 @@ class SeleniumHelper:
         debug: Annotated[bool, "whether to open the browser in debug mode"] = False,
         window_size: tuple[int, int] = (1300, 2100),
         window_position: tuple[int, int] = (100, 0),
+        wait_until: Optional[dict] = None,
     ) -> tuple[webdriver.Chrome, WebDriverWait]:
         """
         Opens the specified URL in a new Chrome incognito window with optional
-        debug mode, zoom level, window size, and window position.
+        debug mode, zoom level, window size, and window position. The new
+        browser replaces the helper's current one, which is quit. Outside
+        debug mode it is started with the helper's launch profile in a visible
+        window.
 
         Args:
             url (str): The URL to be opened.
@@ -186,6 +459,10 @@ class SeleniumHelper:
             window_position (tuple[int, int], optional): The position of the browser
             window as a tuple (x, y). Defaults to (100, 0).
 
+            wait_until (dict, optional): Keyword arguments of
+            `wait_until_ready()`, e.g. `{"selector": "#results"}`, to return
+            only once the page is ready.
+
         Returns:
             tuple: A tuple containing the WebDriver instance and the
             WebDriverWait instance for the opened browser window.
@@ -193,21 +470,109 @@ class SeleniumHelper:
         log.fine(
             f"Selenium_Helper.open_url_in_new_chrome_incognito_window - DEBUG {debug}"
         )
+        if self.driver:
+            # Replaces the helper's current browser instead of leaving it running
+            try:
+                self.driver.quit()
+            except Exception as e:
+                log.debug(f"Quitting the previous WebDriver failed: {e}")
         if debug:
             self.open_chrome_in_debug()
             options = webdriver.ChromeOptions()
             options.add_experimental_option("debuggerAddress", "127.0.0.1:9222")
             self.driver = webdriver.Chrome(options=options)
+            install_page_monitor(self.driver)
         else:
-            self.driver = webdriver.Chrome()
+            # A visible window with the helper's launch profile
+            self.driver = create_driver(headless=False, **self.driver_settings)
         self.driver.set_window_size(*window_size)
         self.driver.set_window_position(*window_position)
         self.driver.get(url)
         log.info(f"Zoom level: {zoom}%")
         self.driver.execute_script(f"document.body.style.zoom='{zoom}%'")
         self.wait = WebDriverWait(self.driver, 5)
+        if wait_until:
+            self.wait_until_ready(**wait_until)
         return self.driver, self.wait
 
+    def wait_until_ready(
+        self,
+        selector: Optional[str] = None,
+        visible: bool = False,
+        network_idle: bool = False,
+        dom_quiet: bool = False,
+        script: Optional[str] = None,
+        timeout: float = 10,
+        idle_time: float = 0.5,
+        max_in_flight: int = 0,
+        **poll_options,
+    ) -> NoReturn:
+        """
+        Waits until the current page is ready, and not a moment longer, instead
+        of a fixed `time.sleep()`. The given conditions are awaited in the
+        order below and share the timeout.
+
+        Args:
+            selector (str, optional): Wait until an element matches this CSS
+            selector.
+
+            visible (bool, optional): Also wait until that element is visible.
+            Defaults to False.
+
+            network_idle (bool, optional): Wait until no requests have been
+            made for `idle_time` seconds. Start the helper with
+            `log_network=True` to count every request of the browser.
+            Defaults to False.
+
+            dom_quiet (bool, optional): Wait until the DOM hasn't changed for
+            `idle_time` seconds. Defaults to False.
+
+            script (str, optional): Wait until this JavaScript function body
+            returns a truthy value, e.g. "return window.appReady === true".
+
+            timeout (float, optional): Defaults to 10 seconds.
+
+            idle_time (float, optional): Defaults to 0.5 seconds.
+
+            max_in_flight (int, optional): The requests that may still be in
+            flight when the network counts as idle. Defaults to 0.
+
+            poll_options: `interval`, `max_interval` and `backoff` of
+            `readiness.poll()`.
+
+        Raises:
+            TimeoutException: If the page wasn't ready in time.
+        """
+        log.fine("Selenium_Helper.wait_until_ready")
+        deadline = time.monotonic() + timeout
+        waits = []
+        if selector is not None:
+            waits.append(
+                lambda remaining: wait_for_selector(
+                    self.driver, selector, visible, remaining, **poll_options
+                )
+            )
+        if network_idle:
+            waits.append(
+                lambda remaining: wait_for_network_idle(
+                    self.driver, idle_time, max_in_flight, remaining, **poll_options
+                )
+            )
+        if dom_quiet:
+            waits.append(
+                lambda remaining: wait_for_dom_quiet(
+                    self.driver, idle_time, remaining, **poll_options
+                )
+            )
+        if script is not None:
+            waits.append(
+                lambda remaining: wait_for_script(
+                    self.driver, script, timeout=remaining, **poll_options
+                )
+            )
+        for wait in waits:
+            wait(max(0, deadline - time.monotonic()))
+
     def close_browser(self) -> NoReturn:
         log.fine("Selenium_Helper.close_browser")
         if self.driver:
@@ -276,6 +641,59 @@ class SeleniumHelper:
                 f.write(html)
         return html
 
+    def extract(self, fields) -> dict:
+        """
+        Reads only the given fields from the current page, in one
+        `execute_script` call, instead of transferring the whole page source
+        and parsing it again. Much faster and lighter than `capture_html()`
+        when you need a handful of values.
+
+        Args:
+            fields (dict or PageSchema): The field names and their specs, e.g.
+            `{"title": "h1", "links": {"selector": "a", "attribute": "href",
+            "many": True}}`. See `page_extraction.PageSchema`.
+
+        Returns:
+            dict: The value of every field.
+        """
+        log.fine("Selenium_Helper.extract")
+        if self.driver is None:
+            raise ValueError(
+                "Driver not initialized. Please open a browser window first."
+            )
+        if not isinstance(fields, PageSchema):
+            fields = PageSchema(fields)
+        return fields.extract(self.driver)
+
+    def save_html(
+        self,
+        file_path: str,
+        compress: bool = True,
+        chunk_size: int = HTML_CHUNK_SIZE,
+    ) -> int:
+        """
+        Streams the HTML of the current page to a file in chunks, gzipped by
+        default, without holding the whole page in memory like
+        `capture_html()`. Chrome compresses the page before it is transferred.
+
+        Args:
+            file_path (str): The file to write, e.g. "page.html.gz".
+
+            compress (bool, optional): Gzip the file. Defaults to True.
+
+            chunk_size (int, optional): The bytes transferred per WebDriver
+            call. Defaults to 1 MB.
+
+        Returns:
+            int: The size of the file in bytes.
+        """
+        log.fine("Selenium_Helper.save_html")
+        if self.driver is None:
+            raise ValueError(
+                "Driver not initialized. Please open a browser window first."
+            )
+        return save_page_html(self.driver, file_path, compress, chunk_size)
+
     def open_local_html_file(self, file_path: str) -> NoReturn:
         log.fine("Selenium_Helper.open_local_html_file")
         if self.driver is None:
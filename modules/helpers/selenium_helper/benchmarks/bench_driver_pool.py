@@ -0,0 +1,76 @@
+"""
+Compares rendering the pages of a local static site with a new browser for
+every page against borrowing warm browsers from a `DriverPool`.
+
+Needs Chrome. Run it from the root of the repository:
+
+    python modules/helpers/selenium_helper/benchmarks/bench_driver_pool.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("SELENIUM_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_SELENIUM_HELPER_WARNING", "true")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.selenium_helper.CWS_Selenium_Helper.driver_pool import DriverPool
+from modules.helpers.selenium_helper.CWS_Selenium_Helper.selenium_helper import (
+    create_driver,
+)
+from static_site import build_site, serve
+
+
+def render_cold(urls):
+    for url in urls:
+        driver = create_driver()
+        try:
+            driver.get(url)
+            driver.page_source
+        finally:
+            driver.quit()
+
+
+def render_pooled(urls, size):
+    with DriverPool(size=size) as pool:
+        # Only the rendering is timed, like a long-running pool
+        started = time.perf_counter()
+        for url in urls:
+            with pool.driver() as driver:
+                driver.get(url)
+                driver.page_source
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--size", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_site(directory, pages=args.pages)
+        with serve(directory) as base_url:
+            urls = [base_url + path for path in paths]
+
+            started = time.perf_counter()
+            render_cold(urls)
+            cold = time.perf_counter() - started
+            pooled = render_pooled(urls, args.size)
+
+    print(f"{'':>22}{'total s':>10}{'per page s':>12}")
+    for name, seconds in (
+        ("new browser per page", cold),
+        (f"DriverPool(size={args.size})", pooled),
+    ):
+        print(f"{name:>22}{seconds:>10.2f}{seconds / len(urls):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
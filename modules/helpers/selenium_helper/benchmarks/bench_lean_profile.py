@@ -0,0 +1,89 @@
+"""
+Compares loading the pages of a local static site with the default Chrome
+profile against the lean profile, which blocks images, fonts, media and
+trackers.
+
+The site links its static files with query strings, e.g. "style.css?v=3", like
+most real sites. Needs Chrome. Run it from the root of the repository:
+
+    python modules/helpers/selenium_helper/benchmarks/bench_lean_profile.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Import the helper from this repository instead of an installed package
+os.environ.setdefault("SELENIUM_HELPER_PACKAGE_TEST", "true")
+os.environ.setdefault("MUTE_SELENIUM_HELPER_WARNING", "true")
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+)
+
+from modules.helpers.selenium_helper.CWS_Selenium_Helper.selenium_helper import (
+    create_driver,
+)
+from static_site import build_site, serve
+
+# The bytes of the resources a page downloaded, from the Resource Timing API
+TRANSFERRED_BYTES_SCRIPT = """
+return performance.getEntriesByType("resource")
+    .reduce((total, entry) => total + entry.transferSize, 0);
+"""
+
+
+def load_pages(urls, **driver_settings):
+    driver = create_driver(**driver_settings)
+    try:
+        transferred = 0
+        started = time.perf_counter()
+        for url in urls:
+            driver.get(url)
+            driver.find_element("id", "results")
+            transferred += driver.execute_script(TRANSFERRED_BYTES_SCRIPT)
+        return time.perf_counter() - started, transferred
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_site(directory, pages=args.pages)
+        with serve(directory, latency=args.latency) as base_url:
+            urls = [base_url + path for path in paths]
+            results = (
+                ("default", load_pages(urls)),
+                ("lean", load_pages(urls, lean=True)),
+                (
+                    "lean + stylesheet",
+                    load_pages(
+                        urls,
+                        lean=True,
+                        blocked_resources=(
+                            "image",
+                            "font",
+                            "media",
+                            "tracker",
+                            "stylesheet",
+                        ),
+                    ),
+                ),
+            )
+
+    print(f"{'':>18}{'per page s':>12}{'KB per page':>13}")
+    for name, (seconds, transferred) in results:
+        print(
+            f"{name:>18}{seconds / len(urls):>12.3f}"
+            f"{transferred / len(urls) / 1024:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE_TEMPLATE = """<!doctype html>
+<html>
+<head>
+<title>Page {index}</title>
+<link rel="stylesheet" href="/static/style.css?v=3">
+<script src="/static/app.js?v=3"></script>
+</head>
+<body>
+<h1 id="title">Page {index}</h1>
+<div id="results">{items}</div>
+{images}
+</body>
+</html>
+"""
+
+STYLE = """@font-face { font-family: Bench; src: url("/static/bench.woff2?v=3"); }
+body { font-family: Bench, sans-serif; }
+"""
+
+SCRIPT = """document.addEventListener("DOMContentLoaded", function () {
+  document.body.setAttribute("data-ready", "true");
+});
+"""
+
+
+def build_site(directory: str, pages: int = 20, images: int = 8) -> list:
+    """
+    Writes a static site of `pages` pages, each with a stylesheet, a script, a
+    web font and `images` images of 100 KB, and returns the page paths. The
+    static files are linked with query strings, like most real sites.
+    """
+    static = os.path.join(directory, "static")
+    os.makedirs(static, exist_ok=True)
+    with open(os.path.join(static, "style.css"), "w") as f:
+        f.write(STYLE)
+    with open(os.path.join(static, "app.js"), "w") as f:
+        f.write(SCRIPT)
+    with open(os.path.join(static, "bench.woff2"), "wb") as f:
+        f.write(os.urandom(50 * 1024))
+    for image in range(images):
+        with open(os.path.join(static, f"image-{image}.png"), "wb") as f:
+            f.write(os.urandom(100 * 1024))
+
+    paths = []
+    for index in range(pages):
+        path = f"/page-{index}.html"
+        items = "".join(f"<p class='item'>Item {i}</p>" for i in range(50))
+        image_tags = "".join(
+            f"<img src='/static/image-{image}.png?v=3&page={index}'>"
+            for image in range(images)
+        )
+        with open(os.path.join(directory, path.lstrip("/")), "w") as f:
+            f.write(PAGE_TEMPLATE.format(index=index, items=items, images=image_tags))
+        paths.append(path)
+    return paths
+
+
+@contextmanager
+def serve(directory: str, latency: float = 0.02):
+    """
+    Serves `directory` on a free local port and yields its base URL. Every
+    response is delayed by `latency` seconds to stand in for the network.
+    """
+
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(latency)
+            super().do_GET()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(Handler, directory=directory)
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()